@@ -1,39 +1,536 @@
+import glob
+import io
+import json
+import os
+import re
+import tempfile
 import pandas as pd
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataset_cache import file_digest
+from derived_columns import with_columns
+from schemas import normalize_header
+from metrics import instrumented, stage
+from sqlite_dataset import SQLiteDataset
+
+# Default number of rows per batch in streaming mode
+DEFAULT_CHUNK_SIZE = 100_000
+# Files larger than this are loaded into SQLite rather than memory by DataIngestionContext.for_file
+OUT_OF_CORE_BYTES = 1 << 30
+# File extensions read by JSONDataIngestion
+JSON_EXTENSIONS = ('.json', '.ndjson', '.jsonl')
+# Characters read at a time when streaming a JSON array
+JSON_BLOCK_SIZE = 1 << 20
+# File extensions picked up when a directory of partitions is ingested
+PARTITION_EXTENSIONS = ('.csv',) + JSON_EXTENSIONS
 
 # Interface
 class DataIngestionStrategy(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Ingestion calls are timed while metrics.RECORDER is enabled
+        method = cls.__dict__.get('ingest_data')
+        if method is not None and not getattr(method, '__instrumented__', False):
+            cls.ingest_data = instrumented(method)
+
     @abstractmethod
     def ingest_data(self, file_path):
         """Ingest data from a file and return a DataFrame."""
         pass
 
+    def iter_chunks(self, file_path, chunksize=DEFAULT_CHUNK_SIZE):
+        """Yield the ingested data as DataFrame batches of at most chunksize rows."""
+        # Fallback for strategies without a native streaming reader
+        data = self.ingest_data(file_path)
+        if data is None:
+            return
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize]
+
 # Concrete class for CSV files
 class CSVDataIngestion(DataIngestionStrategy):
-    def ingest_data(self, file_path):
-        """Read data from a CSV file into a DataFrame."""
+    def __init__(self, schema=None, cache=None):
+        # Optional schemas.DataSchema applied while parsing
+        self.schema = schema
+        # Optional dataset_cache.DatasetCache holding earlier parses of identical files
+        self.cache = cache
+
+    def read_header(self, file_path):
+        """Return the raw column names of a CSV file without parsing its rows."""
+        if hasattr(file_path, 'seek'):
+            # Uploaded files are buffers that may have been read before
+            file_path.seek(0)
+        header = pd.read_csv(file_path, nrows=0).columns.tolist()
+        if hasattr(file_path, 'seek'):
+            # Rewind again after peeking at the header
+            file_path.seek(0)
+        return header
+
+    def _read_options(self, file_path, columns=None):
+        """Return the read_csv keyword arguments implied by the schema and a column projection."""
+        if self.schema is None and columns is None:
+            return {}
+        header = self.read_header(file_path)
+        if columns is not None:
+            # Columns are given by normalized name; the file may pad its headers
+            wanted = set(columns)
+            header = [raw for raw in header if normalize_header(raw) in wanted]
+        options = self.schema.read_options(header) if self.schema is not None else {}
+        if columns is not None:
+            options['usecols'] = header
+        return options
+
+    def _apply_schema(self, data):
+        return data if self.schema is None else self.schema.apply(data)
+
+    def ingest_data(self, file_path, chunksize=None, columns=None):
+        """Read data from a CSV file into a DataFrame.
+
+        If chunksize is given, an iterator of DataFrame batches is returned instead,
+        so peak memory is bounded by the chunk size rather than the file size.
+        If columns is given, only those (normalized) columns are parsed.
+        """
+        if chunksize is not None:
+            return self.iter_chunks(file_path, chunksize, columns)
         try:
-            data = pd.read_csv(file_path)
+            cache_key = None
+            if self.cache is not None and self.cache.enabled:
+                with stage(self, 'cache_lookup') as metrics:
+                    salt = self.schema.cache_token() if self.schema is not None else ''
+                    if columns is not None:
+                        salt += repr(sorted(columns))
+                    cache_key = file_digest(file_path, salt)
+                    data = self.cache.get(cache_key)
+                    metrics.rows_out = None if data is None else len(data)
+                if data is not None:
+                    print("Data ingestion successful.")
+                    return data
+            data = self._read(file_path, columns)
+            if cache_key is not None:
+                self._store(cache_key, data)
             print("Data ingestion successful.")
             return data
         except Exception as e:
             print(f"Failed to ingest data: {e}")
             return None
 
-class JSONDataIngestion(DataIngestionStrategy):
+    def _store(self, cache_key, data):
+        # The parse succeeded, so a frame the cache cannot write (e.g. a column read_csv inferred as mixed
+        # int/str, which Arrow rejects) is still returned; DatasetCache.put removes its partial file
+        try:
+            with stage(self, 'cache_store', len(data)):
+                self.cache.put(cache_key, data)
+        except Exception as e:
+            print(f"Could not cache the parsed data: {e}")
+
+    def _read(self, file_path, columns=None):
+        """Parse and type the whole file; errors propagate to the caller."""
+        with stage(self, 'read_csv') as metrics:
+            data = pd.read_csv(file_path, **self._read_options(file_path, columns))
+            metrics.rows_out = len(data)
+        if self.schema is not None:
+            with stage(self, 'apply_schema', len(data)):
+                data = self._apply_schema(data)
+        return data
+
+    def iter_chunks(self, file_path, chunksize=DEFAULT_CHUNK_SIZE, columns=None):
+        """Stream a CSV file as DataFrame batches of at most chunksize rows."""
+        if chunksize <= 0:
+            raise ValueError("chunksize must be a positive integer")
+        with pd.read_csv(file_path, chunksize=chunksize, **self._read_options(file_path, columns)) as reader:
+            for chunk in reader:
+                yield self._apply_schema(chunk)
+
+# Out-of-core backend for CSV files larger than memory
+class SQLiteDataIngestion(DataIngestionStrategy):
+    def __init__(self, schema=None, indexes=(), path=None, chunksize=DEFAULT_CHUNK_SIZE, reader=None):
+        self.schema = schema
+        # Streaming strategy that parses the source; CSV unless given
+        self.reader = reader if reader is not None else CSVDataIngestion(schema=schema)
+        # Columns to index after loading, e.g. sqlite_dataset.SQL_INDEXES['CRM']
+        self.indexes = tuple(indexes)
+        # SQLite file to (re)create; a temporary file removed on close() if not given
+        self.path = path
+        self.chunksize = chunksize
+
     def ingest_data(self, file_path):
-        with open(file_path, 'r') as file:
-            data = json.loads(file)
+        """Stream a CSV file into SQLite in batches and return the sqlite_dataset.SQLiteDataset.
+
+        Unlike the in-memory strategies this returns a queryable store, not a
+        DataFrame; strategies run against it through their process_sql method.
+        """
+        dataset = None
+        try:
+            if self.path is None:
+                handle, path = tempfile.mkstemp(suffix='.sqlite')
+                os.close(handle)
+                dataset = SQLiteDataset(path, temporary=True)
+            else:
+                dataset = SQLiteDataset(self.path)
+            dataset.drop()
+            with stage(self, 'bulk_insert') as metrics:
+                rows = 0
+                for chunk in self.reader.iter_chunks(file_path, self.chunksize):
+                    dataset.append(chunk)
+                    rows += len(chunk)
+                metrics.rows_out = rows
+            # Indexes are built once after the load, which is faster than maintaining them per insert
+            with stage(self, 'create_indexes', rows):
+                dataset.create_indexes(self.indexes)
+            print("Data ingestion successful.")
+            return dataset
+        except Exception as e:
+            if dataset is not None:
+                dataset.close()
+            print(f"Failed to ingest data: {e}")
+            return None
+
+    def iter_chunks(self, file_path, chunksize=DEFAULT_CHUNK_SIZE):
+        """Load the file into SQLite, then stream it back in batches of at most chunksize rows."""
+        dataset = self.ingest_data(file_path)
+        if dataset is None:
+            return
+        try:
+            yield from dataset.iter_chunks(chunksize)
+        finally:
+            dataset.close()
+
+def is_json(file_path):
+    """Whether a path or uploaded file names a JSON / NDJSON document."""
+    return str(getattr(file_path, 'name', file_path)).lower().endswith(JSON_EXTENSIONS)
+
+
+class _TextSource:
+    """Open a path or a (binary or text) buffer as text, leaving buffers open afterwards."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.wrapper = None
+
+    def __enter__(self):
+        if not hasattr(self.file_path, 'read'):
+            self.wrapper = open(self.file_path, encoding='utf-8')
+            return self.wrapper
+        self.file_path.seek(0)
+        if isinstance(self.file_path, io.TextIOBase):
+            return self.file_path
+        self.wrapper = io.TextIOWrapper(self.file_path, encoding='utf-8')
+        return self.wrapper
+
+    def __exit__(self, *exc):
+        if self.wrapper is not None and hasattr(self.file_path, 'read'):
+            # Detach so closing the wrapper doesn't close the caller's buffer
+            self.wrapper.detach()
+            self.file_path.seek(0)
+        elif self.wrapper is not None:
+            self.wrapper.close()
+
+
+_JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def _iter_json_array(file, block_size=JSON_BLOCK_SIZE):
+    """Yield the elements of a top-level JSON array, holding about one block of text at a time."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(block_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Expected a JSON array of records or line-delimited JSON")
+    position, eof = 1, False
+    while True:
+        position = _JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The record continues in the next block
+            more = file.read(block_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield record
+        position = end
+
+
+def _project(batch, columns):
+    if columns is None:
+        return batch
+    wanted = set(columns)
+    return batch[[raw for raw in batch.columns if normalize_header(raw) in wanted]]
+
+
+def _concat(chunks):
+    """Concatenate batches or partitions into one frame with a single copy of the data."""
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+    columns = chunks[0].columns
+    chunks = [chunk if chunk.columns.equals(columns) else chunk[columns] for chunk in chunks]
+    for col in columns:
+        if len(chunks) > 1 and all(isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks):
+            # Recode every batch onto the sorted union of categories (a cheap code remap), as one
+            # read_csv would infer, so concat keeps the column categorical instead of materializing objects
+            categories = chunks[0][col].cat.categories
+            for chunk in chunks[1:]:
+                categories = categories.union(chunk[col].cat.categories)
+            chunks = [chunk if chunk[col].cat.categories.equals(categories)
+                      else with_columns(chunk, {col: chunk[col].cat.set_categories(categories)}) for chunk in chunks]
+    data = pd.concat(chunks, ignore_index=True)
+    for col in columns:
+        # Batches carry their own categories; concat falls back to object when they differ
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype) and not isinstance(data[col].dtype,
+                                                                                 pd.CategoricalDtype):
+            data[col] = data[col].astype('category')
+    return data
+
+
+class JSONDataIngestion(DataIngestionStrategy):
+    def __init__(self, schema=None, lines=None, chunksize=DEFAULT_CHUNK_SIZE):
+        # Optional schemas.DataSchema applied to every batch
+        self.schema = schema
+        # True for NDJSON, False for a JSON array; None decides from the extension or first character
+        self.lines = lines
+        self.chunksize = chunksize
+
+    def _is_lines(self, file_path, file):
+        if self.lines is not None:
+            return self.lines
+        name = str(getattr(file_path, 'name', file_path)).lower()
+        if name.endswith(('.ndjson', '.jsonl')):
+            return True
+        start = file.read(64).lstrip()
+        file.seek(0)
+        return not start.startswith('[')
+
+    def _typed(self, batch):
+        """Apply the schema's dtypes and cleaning rules to one parsed batch."""
+        if self.schema is None:
+            return batch
+        # Currency and numeric columns are converted by apply(), which keeps columns JSON already parsed as numbers
+        parsed_later = set(self.schema.currency + self.schema.decimal_comma + self.schema.numeric)
+        dtype = {raw: kind for raw, kind in self.schema.read_options(batch.columns)['dtype'].items()
+                 if normalize_header(raw) not in parsed_later}
+        return self.schema.apply(batch.astype(dtype))
+
+    def read_header(self, file_path):
+        """Return the field names of the first record."""
+        with _TextSource(file_path) as file:
+            if self._is_lines(file_path, file):
+                return list(json.loads(next((line for line in file if line.strip()), '{}')))
+            return list(next(_iter_json_array(file), {}))
+
+    def ingest_data(self, file_path, chunksize=None, columns=None):
+        """Read a JSON array or NDJSON document into a DataFrame.
+
+        If chunksize is given, an iterator of DataFrame batches is returned instead.
+        The full read is assembled from the same batches, so parsing never holds
+        more than one batch of raw records. If columns is given, only those
+        (normalized) fields are kept and typed.
+        """
+        if chunksize is not None:
+            return self.iter_chunks(file_path, chunksize, columns)
+        try:
+            data = self._read(file_path, columns)
+            print("Data ingestion successful.")
+            return data
+        except Exception as e:
+            print(f"Failed to ingest data: {e}")
+            return None
+
+    def _read(self, file_path, columns=None):
+        """Parse and type the whole document; errors propagate to the caller."""
+        with stage(self, 'parse') as metrics:
+            data = _concat(self.iter_chunks(file_path, self.chunksize, columns))
+            metrics.rows_out = len(data)
         return data
 
+    def iter_chunks(self, file_path, chunksize=DEFAULT_CHUNK_SIZE, columns=None):
+        """Stream JSON records as typed DataFrame batches of at most chunksize rows."""
+        if chunksize <= 0:
+            raise ValueError("chunksize must be a positive integer")
+        with _TextSource(file_path) as file:
+            if self._is_lines(file_path, file):
+                # Values are kept as parsed; dates and decimal commas are left to the schema
+                with pd.read_json(file, lines=True, chunksize=chunksize, dtype=False, convert_dates=False) as reader:
+                    for batch in reader:
+                        yield self._typed(_project(batch, columns))
+                return
+            records = []
+            for record in _iter_json_array(file):
+                records.append(record)
+                if len(records) == chunksize:
+                    yield self._typed(_project(pd.DataFrame.from_records(records), columns))
+                    records = []
+            if records:
+                yield self._typed(_project(pd.DataFrame.from_records(records), columns))
+
+
+# Years in partition names such as sales_2023-01.csv or sales/2023/01.csv
+_PARTITION_YEAR = re.compile(r'(?<!\d)(?:19|20)\d{2}(?!\d)')
+
+
+def partition_year(path):
+    """Year encoded in a partition's file name, else its directory name; None if neither has one."""
+    path = os.fspath(path)
+    for name in (os.path.basename(path), os.path.basename(os.path.dirname(path))):
+        match = _PARTITION_YEAR.search(name)
+        if match:
+            return int(match.group())
+    return None
+
+
+def is_partitioned(source):
+    """True for a list of files, a directory or a glob pattern rather than a single file."""
+    if isinstance(source, (list, tuple)):
+        return True
+    if isinstance(source, (str, os.PathLike)):
+        source = os.fspath(source)
+        return os.path.isdir(source) or any(char in source for char in '*?[')
+    return False
+
+
+def _read_partition(path, schema, columns):
+    # Module level so process pools can pickle it
+    reader = JSONDataIngestion(schema=schema) if is_json(path) else CSVDataIngestion(schema=schema)
+    return reader._read(path, columns)
+
+
+def _dtype_kind(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return 'bool'
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return 'number'
+    return 'text'
+
+
+# Many files (monthly partitions, a directory or a glob) read as one dataset
+class PartitionedDataIngestion(DataIngestionStrategy):
+    def __init__(self, schema=None, workers=None, executor='thread', years=None, columns=None):
+        self.schema = schema
+        # Pool size; defaults to the number of cores
+        self.workers = workers
+        # 'thread' shares memory with the caller; 'process' sidesteps the GIL for pure-Python parsing
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+        self.executor = executor
+        # Only partitions of these years are read; partitions without a year in their name are always read
+        self.years = None if years is None else {int(year) for year in years}
+        # Optional column projection applied to every partition
+        self.columns = columns
+
+    def partitions(self, source):
+        """Resolve a directory, glob pattern or list of files into the partition paths to read."""
+        if isinstance(source, (list, tuple)):
+            paths = [os.fspath(path) for path in source]
+        elif os.path.isdir(source):
+            paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source) for name in names
+                           if name.lower().endswith(PARTITION_EXTENSIONS))
+        else:
+            paths = sorted(glob.glob(os.fspath(source), recursive=True))
+        if not paths:
+            raise ValueError(f"No partitions found for {source!r}")
+        if self.years is not None:
+            paths = [path for path in paths if partition_year(path) in self.years or partition_year(path) is None]
+        return paths
+
+    def _check_partitions(self, paths, frames):
+        """Raise ValueError if a partition's columns or column types differ from the first one's."""
+        reference = None
+        for path, frame in zip(paths, frames):
+            if frame.empty:
+                continue
+            # All-missing columns carry no type information, so they match anything
+            kinds = {col: _dtype_kind(frame[col]) for col in frame.columns if frame[col].notna().any()}
+            if reference is None:
+                reference = (path, list(frame.columns), kinds)
+                continue
+            first, columns, expected = reference
+            if set(frame.columns) != set(columns):
+                missing = [col for col in columns if col not in frame.columns]
+                extra = [col for col in frame.columns if col not in columns]
+                raise ValueError(f"Partition {path} does not match {first}: missing columns {missing}, "
+                                 f"unexpected columns {extra}")
+            for col, kind in kinds.items():
+                if col in expected and expected[col] != kind:
+                    raise ValueError(f"Partition {path}: column '{col}' is {kind}, but {expected[col]} in {first}")
+
+    def ingest_data(self, source, columns=None):
+        """Parse every partition in parallel and return them concatenated into one DataFrame."""
+        columns = self.columns if columns is None else columns
+        try:
+            paths = self.partitions(source)
+            if not paths:
+                print("Data ingestion successful.")
+                return pd.DataFrame(columns=columns)
+            pool = ThreadPoolExecutor if self.executor == 'thread' else ProcessPoolExecutor
+            with stage(self, 'parse') as metrics:
+                with pool(max_workers=min(self.workers or os.cpu_count() or 1, len(paths))) as executor:
+                    frames = list(executor.map(_read_partition, paths, [self.schema] * len(paths),
+                                               [columns] * len(paths)))
+                metrics.rows_out = sum(len(frame) for frame in frames)
+            with stage(self, 'check_schema', metrics.rows_out):
+                self._check_partitions(paths, frames)
+            with stage(self, 'concat', metrics.rows_out):
+                data = _concat(frames)
+            print("Data ingestion successful.")
+            return data
+        except Exception as e:
+            print(f"Failed to ingest data: {e}")
+            return None
+
+    def iter_chunks(self, source, chunksize=DEFAULT_CHUNK_SIZE, columns=None):
+        """Stream the partitions one after another as DataFrame batches."""
+        columns = self.columns if columns is None else columns
+        for path in self.partitions(source):
+            reader = JSONDataIngestion(schema=self.schema) if is_json(path) else CSVDataIngestion(schema=self.schema)
+            yield from reader.iter_chunks(path, chunksize, columns)
 
 # Context class to utilize strategies
 class DataIngestionContext:
-    def _init_(self, strategy: DataIngestionStrategy):
-        self.strategy = strategy
+    def __init__(self, strategy: DataIngestionStrategy):
+        self.set_strategy(strategy)
+
+    @classmethod
+    def for_file(cls, file_path, schema=None, indexes=(), backend=None, max_memory_bytes=OUT_OF_CORE_BYTES,
+                 cache=None, years=None, workers=None):
+        """Choose the strategy for file_path from its format and size.
+
+        A directory, glob pattern or list of files is read by
+        PartitionedDataIngestion, pruned to years if given. JSON / NDJSON files
+        are parsed by JSONDataIngestion and everything else as CSV. Sources above
+        max_memory_bytes go to SQLite ('sqlite' backend) rather than memory
+        ('memory'); backend forces one of the two.
+        """
+        if is_partitioned(file_path):
+            reader = PartitionedDataIngestion(schema=schema, workers=workers, years=years)
+            if backend is None:
+                size = sum(os.path.getsize(path) for path in reader.partitions(file_path))
+                backend = 'sqlite' if size > max_memory_bytes else 'memory'
+        else:
+            if backend is None:
+                size = os.path.getsize(file_path) if isinstance(file_path, (str, os.PathLike)) else None
+                backend = 'sqlite' if size is not None and size > max_memory_bytes else 'memory'
+            reader = JSONDataIngestion(schema=schema) if is_json(file_path) else None
+        if backend == 'sqlite':
+            return cls(SQLiteDataIngestion(schema=schema, indexes=indexes, reader=reader))
+        if backend == 'memory':
+            return cls(reader if reader is not None else CSVDataIngestion(schema=schema, cache=cache))
+        raise ValueError(f"Unknown backend '{backend}', expected 'memory' or 'sqlite'")
 
     def set_strategy(self, strategy: DataIngestionStrategy):
+        """Swap the ingestion strategy; later calls use the new one."""
+        if not isinstance(strategy, DataIngestionStrategy):
+            raise TypeError(f"Expected a DataIngestionStrategy, got {type(strategy).__name__}")
         self.strategy = strategy
 
-    def ingest_data(self, file_path):
-        return self.strategy.ingest_data(file_path)
\ No newline at end of file
+    def ingest_data(self, file_path, **kwargs):
+        return self.strategy.ingest_data(file_path, **kwargs)
+
+    def iter_chunks(self, file_path, chunksize=DEFAULT_CHUNK_SIZE):
+        return self.strategy.iter_chunks(file_path, chunksize)
@@ -0,0 +1,174 @@
+"""Headless batch mode: run strategy jobs from a manifest across a process pool.
+
+Usage:
+    python batch_runner.py manifest.json --workers 4 --output-dir reports
+
+The manifest is a JSON list of jobs (or an object with a "jobs" list). Each job
+names a module, an input file and optional strategy parameters:
+
+    [
+        {"module": "CRM", "input": "Data Set/CRM_data.csv",
+         "params": {"columns": ["year", "country", "quantity", "amount"]}},
+        {"module": "Sales", "input": "Data Set/sales_data.csv", "params": {"period": "monthly"}},
+        {"module": "Finance", "input": "Data Set/finance_data.csv", "output": "finance_report.csv"}
+    ]
+
+A job may set "backend" to "sqlite" or "memory"; by default inputs larger than
+DataIngection.OUT_OF_CORE_BYTES are loaded into a temporary SQLite file and
+processed with SQL instead of in memory.
+
+"input" may also be a directory, a glob pattern such as "Data Set/sales/*.csv"
+or a list of files; the partitions are parsed in parallel and concatenated, and
+a job's "years" list skips partitions whose file or directory name encodes
+another year.
+
+Reports are CSV unless a job sets "format" to "csv.gz", "parquet" or "xlsx" (or
+its "output" ends in that extension); they are written batch by batch.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Workers render charts without a display
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from data_processor import aggregate_sales
+from DataIngection import DataIngestionContext
+from export import EXPORT_FORMATS, export_to_path, format_for
+from schemas import SCHEMAS
+from sqlite_dataset import SQL_INDEXES, SQLiteDataset
+from strategy_registry import STRATEGIES
+
+
+def load_manifest(path):
+    """Read and validate a job manifest."""
+    with open(path) as file:
+        manifest = json.load(file)
+    jobs = manifest['jobs'] if isinstance(manifest, dict) else manifest
+    for number, job in enumerate(jobs):
+        if job.get('module') not in STRATEGIES:
+            raise ValueError(f"Job {number}: unknown module {job.get('module')!r}")
+        if 'input' not in job:
+            raise ValueError(f"Job {number}: missing 'input'")
+        job.setdefault('name', f"{number:03d}-{job['module'].lower().replace(' ', '_')}")
+    return jobs
+
+
+def _report_format(job):
+    if job.get('format'):
+        if job['format'] not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown report format '{job['format']}', expected one of: {', '.join(EXPORT_FORMATS)}")
+        return job['format']
+    try:
+        return format_for(job.get('output') or '')
+    except ValueError:
+        return 'csv'
+
+
+def _report_path(job, output_dir, suffix):
+    if job.get('output'):
+        output = job['output']
+        # Strip the whole extension, so report.csv.gz does not become report.csv.png
+        extension = next((extension for extension, _ in EXPORT_FORMATS.values()
+                          if output.lower().endswith(extension)), os.path.splitext(output)[1])
+        base = output[:len(output) - len(extension)]
+    else:
+        base = job['name'] + '_report'
+    return os.path.join(output_dir, base + suffix)
+
+
+def run_job(job, output_dir):
+    """Ingest, process and write the reports of one job; returns a timing record."""
+    record = {'name': job['name'], 'module': job['module'], 'input': job['input'], 'rows_in': 0, 'rows_out': 0,
+              'outputs': [], 'error': None}
+    started = time.perf_counter()
+    data = None
+    try:
+        context = DataIngestionContext.for_file(job['input'], schema=SCHEMAS.get(job['module']),
+                                                indexes=SQL_INDEXES.get(job['module'], ()), backend=job.get('backend'),
+                                                years=job.get('years'))
+        data = context.ingest_data(job['input'])
+        if data is None:
+            raise ValueError(f"Failed to ingest {job['input']}")
+        record['rows_in'] = len(data)
+        params = job.get('params', {})
+        # Built once per worker process and reused by its later jobs
+        strategy = STRATEGIES.get(job['module'])
+        # Out-of-core inputs are queried in SQLite; only results reach pandas
+        out_of_core = isinstance(data, SQLiteDataset)
+
+        if job['module'] == 'Sales':
+            period = params.get('period', 'monthly')
+            by_product = params.get('by_product', False)
+            if out_of_core:
+                fig, report = strategy.process_sql(data, period=period, by_product=by_product)
+            else:
+                # Aggregated once; the chart is drawn from the report's totals
+                report = aggregate_sales(data, period, by_product=by_product)
+                fig = strategy.plot_totals(report, period)
+            chart_path = _report_path(job, output_dir, '.png')
+            fig.savefig(chart_path)
+            record['outputs'].append(chart_path)
+        elif out_of_core:
+            report = strategy.process_sql(data, **params)
+        else:
+            report = strategy.process_data(data, **params)
+
+        fmt = _report_format(job)
+        report_path = _report_path(job, output_dir, EXPORT_FORMATS[fmt][0])
+        # Written in batches, so a large report is never encoded whole in memory
+        record['rows_out'] = export_to_path(report, report_path, fmt)
+        record['outputs'].insert(0, report_path)
+    except Exception as e:
+        record['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        if isinstance(data, SQLiteDataset):
+            data.close()
+    record['seconds'] = time.perf_counter() - started
+    return record
+
+
+def run_batch(jobs, output_dir='.', workers=None):
+    """Run jobs across a process pool and return their records in manifest order."""
+    os.makedirs(output_dir, exist_ok=True)
+    if workers == 1:
+        return [run_job(job, output_dir) for job in jobs]
+    records = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, output_dir): number for number, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            records[futures[future]] = future.result()
+    return records
+
+
+def format_summary(records, wall_seconds):
+    """Per-job timing table followed by totals."""
+    lines = [f"{'job':<28} {'module':<12} {'rows in':>10} {'rows out':>10} {'seconds':>9}  status"]
+    for record in records:
+        status = 'ok' if record['error'] is None else f"FAILED ({record['error']})"
+        lines.append(f"{record['name']:<28} {record['module']:<12} {record['rows_in']:>10} "
+                     f"{record['rows_out']:>10} {record['seconds']:>9.2f}  {status}")
+    busy = sum(record['seconds'] for record in records)
+    lines.append(f"{len(records)} jobs, {wall_seconds:.2f}s wall, {busy:.2f}s total job time")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run ERP strategy jobs from a manifest without the UI.')
+    parser.add_argument('manifest', help='JSON manifest of (module, input, params) jobs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--output-dir', default='.', help='directory for reports and charts')
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest)
+    started = time.perf_counter()
+    records = run_batch(jobs, args.output_dir, args.workers)
+    print(format_summary(records, time.perf_counter() - started))
+    return 0 if all(record['error'] is None for record in records) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
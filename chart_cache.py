@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# Points drawn per series before a chart is downsampled
+DEFAULT_MAX_POINTS = 400
+# Rendered charts kept in memory
+DEFAULT_MAX_CHARTS = 32
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: positions of threshold points that keep the visual shape of (x, y).
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bucket = (n - 2) / (threshold - 2)
+    positions = np.empty(threshold, dtype='int64')
+    positions[0], positions[-1] = 0, n - 1
+    kept = 0
+    for i in range(threshold - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[kept] - avg_x) * (y[start:end] - y[kept]) - (x[kept] - x[start:end]) * (avg_y - y[kept]))
+        kept = start + int(np.argmax(area))
+        positions[i + 1] = kept
+    return positions
+
+
+def frame_digest(frame):
+    """Content hash of a (small, aggregated) DataFrame, used to key rendered charts."""
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.blake2b(hashes.tobytes() + repr(list(frame.columns)).encode(), digest_size=16).hexdigest()
+
+
+def figure_png(fig, dpi=100):
+    """Encode fig as PNG bytes and release it."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    # Figures built outside pyplot are freed with their last reference; clear() drops the artists now
+    fig.clear()
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """PNG bytes of rendered charts keyed by the hash of the data they plot.
+
+    Rendering runs on a background thread: submit() returns a Future, so the
+    caller can lay out the rest of the page while the PNG is encoded. A chart
+    that is already cached, or already being rendered, is not rendered again.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_CHARTS, workers=1):
+        self.max_entries = max_entries
+        self._charts = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart')
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, key, render):
+        """Return a Future of the PNG bytes for key, calling render() in the background on a miss."""
+        with self._lock:
+            if key in self._charts:
+                self._charts.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(self._charts[key])
+                return future
+            if key in self._pending:
+                self.hits += 1
+                return self._pending[key]
+            self.misses += 1
+            future = self._executor.submit(render)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def get_or_render(self, key, render):
+        return self.submit(key, render).result()
+
+    def _store(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._charts[key] = future.result()
+            while len(self._charts) > self.max_entries:
+                self._charts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._charts.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._charts)
+
+
+# Process-wide chart cache used by SalesStrategy.chart_png
+CHARTS = ChartCache()
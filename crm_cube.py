@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions and measures held by the cube, in storage order
+CUBE_DIMENSIONS = ('country', 'year', 'customerID')
+CUBE_MEASURES = ('quantity', 'amount')
+
+
+class CRMCube:
+    """Pre-aggregated (country x year x customerID) totals of CRM quantity and amount.
+
+    The cube is built once per dataset from integer category codes. Cells are
+    stored sorted by (country, year), so a country filter is a slice found by
+    binary search and a year filter is a precomputed position lookup; neither
+    rescans the source rows. Rollups group the selected cells by their codes and
+    decode labels only for the result.
+    """
+
+    def __init__(self, data):
+        invoice_date = pd.to_datetime(data['invoice_date'])
+        country_codes, countries = pd.factorize(data['country'], sort=True)
+        customer_codes, customers = pd.factorize(data['customerID'], sort=True)
+        self.countries = pd.Index(countries)
+        self.customers = pd.Index(customers)
+        frame = pd.DataFrame({
+            'country': country_codes.astype('int32'),
+            'year': invoice_date.dt.year.to_numpy(dtype='int32', na_value=-1),
+            'customerID': customer_codes.astype('int32'),
+            'quantity': data['quantity'].to_numpy(),
+            'amount': data['amount'].to_numpy(),
+        })
+        # Row positions per country code let callers take raw rows without a boolean mask
+        self._rows = {code: rows for code, rows in frame.groupby('country').indices.items()}
+
+        cells = frame.groupby(list(CUBE_DIMENSIONS), sort=True).sum().reset_index()
+        self._cells = {col: cells[col].to_numpy() for col in cells.columns}
+        country = self._cells['country']
+        self._country_bounds = {
+            code: (np.searchsorted(country, code, 'left'), np.searchsorted(country, code, 'right'))
+            for code in np.unique(country)
+        }
+        self._year_positions = {int(year): np.flatnonzero(self._cells['year'] == year)
+                                for year in np.unique(self._cells['year'])}
+        self.source_rows = len(frame)
+
+    @staticmethod
+    def supports(columns):
+        """Whether a CRMStrategy year aggregation over columns can be answered from the cube."""
+        return 'year' in columns and set(columns) <= set(CUBE_DIMENSIONS + CUBE_MEASURES)
+
+    def __len__(self):
+        return len(self._cells['country'])
+
+    def nbytes(self):
+        """Bytes held by the cells and row positions, not counting the source rows."""
+        arrays = [*self._cells.values(), *self._rows.values(), *self._year_positions.values()]
+        return int(sum(array.nbytes for array in arrays))
+
+    @property
+    def years(self):
+        return sorted(year for year in self._year_positions if year >= 0)
+
+    def _country_code(self, country):
+        code = self.countries.get_indexer([country])[0]
+        return None if code < 0 else code
+
+    def rows_for(self, country):
+        """Positions of the source rows for country (empty if the country is unknown)."""
+        code = self._country_code(country)
+        return self._rows.get(code, np.empty(0, dtype='int64'))
+
+    def _positions(self, country=None, year=None):
+        if country is not None:
+            code = self._country_code(country)
+            if code is None or code not in self._country_bounds:
+                return np.empty(0, dtype='int64')
+            start, stop = self._country_bounds[code]
+            if year is None:
+                return np.arange(start, stop)
+            # Within one country the cells are sorted by year
+            years = self._cells['year'][start:stop]
+            return np.arange(start + np.searchsorted(years, year, 'left'),
+                             start + np.searchsorted(years, year, 'right'))
+        if year is not None:
+            return self._year_positions.get(int(year), np.empty(0, dtype='int64'))
+        return None
+
+    def query(self, by=('year',), country=None, year=None):
+        """Roll the cube up to the dimensions in by, optionally sliced to one country and/or year."""
+        by = [dim for dim in by if dim in CUBE_DIMENSIONS]
+        positions = self._positions(country, year)
+        cells = {col: (values if positions is None else values[positions]) for col, values in self._cells.items()}
+        frame = pd.DataFrame(cells)
+        if by:
+            # Like a groupby on the raw rows, cells missing a grouped key (code -1) are left out
+            frame = frame[np.logical_and.reduce([frame[dim].to_numpy() >= 0 for dim in by])]
+            frame = frame.groupby(by, sort=True)[list(CUBE_MEASURES)].sum().reset_index()
+        else:
+            frame = frame[list(CUBE_MEASURES)].sum().to_frame().T
+
+        # Decode category codes for the (small) result only
+        if 'country' in frame.columns:
+            frame['country'] = pd.Categorical.from_codes(frame['country'], self.countries)
+        if 'customerID' in frame.columns:
+            frame['customerID'] = pd.Categorical.from_codes(frame['customerID'], self.customers)
+        return frame
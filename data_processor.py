@@ -1,12 +1,172 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from chart_cache import CHARTS, DEFAULT_MAX_POINTS, figure_png, frame_digest, lttb
+from derived_columns import derived_column, with_columns
+from hr_rollups import DEFAULT_PERCENTILES, ROLLUPS
+from metrics import instrumented, stage
+from sqlite_dataset import sql_year
+
+# Rows per page when a strategy is asked for a page of its sorted output
+DEFAULT_PAGE_SIZE = 100
+
 class DataProcessor(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Entry points of every strategy are timed while metrics.RECORDER is enabled
+        for name in ('process_data', 'process_chunks', 'process_cube', 'process_store', 'process_sql',
+                     'process_rollups', 'process_index'):
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, '__instrumented__', False):
+                setattr(cls, name, instrumented(method))
+
     @abstractmethod
     def process_data(self, data, **kwargs):
 
         pass
+
+    def process_chunks(self, chunks, **kwargs):
+        """Process an iterable of DataFrame batches, e.g. from CSVDataIngestion.iter_chunks.
+
+        The default implementation combines the batches and delegates to process_data;
+        strategies that can merge partial results override it to keep memory bounded.
+        """
+        return self.process_data(pd.concat(list(chunks), ignore_index=True), **kwargs)
+
+
+def _sort_chunks(chunks, columns=None, sort_by=None, top_n=None):
+    """Sort a stream of batches, merging partial top-N results when top_n is given."""
+    result = None
+    parts = []
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.columns.tolist()
+        if sort_by is None:
+            sort_by = columns[0]
+        part = chunk[columns]
+        if top_n is None:
+            parts.append(part)
+            continue
+        # Only the best top_n rows seen so far survive each batch
+        if result is not None:
+            part = pd.concat([result, part])
+        result = part.sort_values(by=sort_by, ascending=True).head(top_n)
+
+    if top_n is not None:
+        return result if result is not None else pd.DataFrame(columns=columns)
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts).sort_values(by=sort_by, ascending=True)
+
+def _sort_keys(series):
+    """Integer or float keys that order like Series.sort_values, with missing values last."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy().astype('int64')
+        return np.where(codes < 0, len(series.cat.categories), codes)
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype='float64', na_value=np.inf)
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = series.to_numpy(dtype='datetime64[ns]').view('int64')
+        return np.where(pd.isna(series).to_numpy(), np.iinfo('int64').max, values)
+    # Text and mixed columns: rank against the sorted distinct values
+    codes, uniques = pd.factorize(series, sort=True)
+    return np.where(codes < 0, len(uniques), codes)
+
+
+class SortIndex:
+    """Cached ascending sort permutations for the columns of one DataFrame.
+
+    A full permutation is computed at most once per column, so switching the sort
+    column back or paging through results reuses it. Top-N requests on a column
+    that has no permutation yet use a linear-time partial selection instead.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._orders = {}
+
+    def nbytes(self):
+        """Bytes held by the permutations computed so far, not counting data."""
+        return sum(order.nbytes for order in self._orders.values())
+
+    def order(self, column):
+        """Positions of all rows in stable ascending order of column."""
+        if column not in self._orders:
+            keys = _sort_keys(self.data[column])
+            self._orders[column] = np.argsort(keys, kind='stable')
+        return self._orders[column]
+
+    def top_n(self, column, n):
+        """Positions of the first n rows in stable ascending order of column."""
+        if column in self._orders or n >= len(self.data):
+            return self.order(column)[:n]
+        if n <= 0:
+            return np.empty(0, dtype='int64')
+        keys = _sort_keys(self.data[column])
+        kth = keys[np.argpartition(keys, n - 1)[n - 1]]
+        # Everything below the n-th key, then ties in row order, matches a stable sort
+        less = np.flatnonzero(keys < kth)
+        ties = np.flatnonzero(keys == kth)[:n - len(less)]
+        selected = np.concatenate([less, ties])
+        return selected[np.lexsort((selected, keys[selected]))]
+
+    def page(self, column, page, page_size=DEFAULT_PAGE_SIZE):
+        """Positions of one page (0-based) of rows in ascending order of column."""
+        start = page * page_size
+        if page == 0 and column not in self._orders:
+            return self.top_n(column, page_size)
+        return self.order(column)[start:start + page_size]
+
+
+def _select_sorted(data, selected_columns, sort_by, kwargs):
+    """Sort the selected columns, or return only the requested top_n rows or page."""
+    top_n = kwargs.get('top_n')
+    page = kwargs.get('page')
+    if top_n is None and page is None:
+        with stage(None, 'sort', len(data)) as metrics:
+            result = data[selected_columns].sort_values(by=sort_by, ascending=True)
+            metrics.rows_out = len(result)
+        return result
+    sort_index = kwargs.get('sort_index')
+    if sort_index is None:
+        sort_index = SortIndex(data)
+    elif sort_index.data is not data:
+        raise ValueError("sort_index was built for a different DataFrame")
+    with stage(None, 'select', len(data)) as metrics:
+        if page is None:
+            positions = sort_index.top_n(sort_by, top_n)
+        else:
+            positions = sort_index.page(sort_by, page, kwargs.get('page_size', DEFAULT_PAGE_SIZE))
+        # Gather only the rows of the result, then project the columns
+        result = data.take(positions)[selected_columns]
+        metrics.rows_out = len(result)
+    return result
+
+
+def _select_sql(dataset, selected_columns, sort_by, kwargs):
+    """SQL counterpart of _select_sorted for a sqlite_dataset.SQLiteDataset: only the requested rows are read."""
+    page = kwargs.get('page')
+    if page is None:
+        limit, offset = kwargs.get('top_n'), None
+    else:
+        limit = kwargs.get('page_size', DEFAULT_PAGE_SIZE)
+        offset = page * limit
+    with stage(None, 'sql', len(dataset)) as metrics:
+        result = dataset.query(selected_columns, kwargs.get('filters', ()), order_by=sort_by, limit=limit,
+                               offset=offset)
+        metrics.rows_out = len(result)
+    return result
+
 class CRMStrategy(DataProcessor):
+    required_columns = {'invoiceID', 'invoice_date', 'customerID', 'country', 'quantity', 'amount'}
+    # Columns computed by process_data rather than read from the file
+    derived_columns = {'year'}
+    # Aggregation logic for numeric fields
+    aggregation_rules = {
+        'quantity': 'sum',
+        'amount': 'sum'
+    }
+
     def process_data(self, data, **kwargs):
         # Ensure data is a DataFrame or load it from a CSV file path
         if isinstance(data, pd.DataFrame):
@@ -15,26 +175,24 @@ class CRMStrategy(DataProcessor):
             df = pd.read_csv(data)
 
         # Validate required columns
-        required_columns = {'invoiceID', 'invoice_date', 'customerID', 'country', 'quantity', 'amount'}
+        required_columns = self.required_columns
         missing_columns = required_columns - set(df.columns)
         if missing_columns:
             raise ValueError(f"Missing columns: {', '.join(missing_columns)} in DataFrame")
 
-        # Convert 'invoice_date' to datetime and ensure 'year' column
-        df['invoice_date'] = pd.to_datetime(df['invoice_date'])
-
-        # Check if 'year' column already exists to avoid duplicate insertion
-        if 'year' not in df.columns:
-            df['year'] = df['invoice_date'].dt.year
+        # Convert 'invoice_date' to datetime and ensure 'year' column. Both are derived once per
+        # frame and held beside it, so the caller's DataFrame is never modified
+        with stage(self, 'to_datetime', len(df)):
+            invoice_date = derived_column(df, 'invoice_date', lambda: pd.to_datetime(df['invoice_date']))
+            year = df['year'] if 'year' in df.columns else derived_column(df, 'year', lambda: invoice_date.dt.year)
+            df = with_columns(df, {'invoice_date': invoice_date, 'year': year})
 
         # Optional filtering based on given parameters
         if 'country' in kwargs:
-            df = df[df['country'] == kwargs['country']]
-        # Define aggregation logic for numeric fields
-        aggregation_rules = {
-            'quantity': 'sum',
-            'amount': 'sum'
-        }
+            with stage(self, 'filter', len(df)) as metrics:
+                df = df[df['country'] == kwargs['country']]
+                metrics.rows_out = len(df)
+        aggregation_rules = self.aggregation_rules
 
         # Determine which columns to display, default to displaying required columns
         selected_columns = kwargs.get('columns', list(required_columns) + ['year'])
@@ -42,14 +200,59 @@ class CRMStrategy(DataProcessor):
         # Apply aggregation if 'year' is selected, otherwise use raw data
         if 'year' in selected_columns:
             # Group by year and other selected columns, applying aggregation rules
-            df = df.groupby(['year'] + [col for col in selected_columns if col not in aggregation_rules]).agg(
-                aggregation_rules).reset_index()
+            group_keys = ['year'] + [col for col in selected_columns if col not in aggregation_rules and col != 'year']
+            with stage(self, 'groupby', len(df)) as metrics:
+                df = df.groupby(group_keys, observed=True).agg(aggregation_rules).reset_index()
+                metrics.rows_out = len(df)
         else:
             # Display without aggregation if 'year' is not selected
             df = df[selected_columns]
 
         return df
 
+    def process_chunks(self, chunks, **kwargs):
+        """Process CRM batches, merging the per-batch yearly aggregates as they arrive."""
+        selected_columns = kwargs.get('columns', list(self.required_columns) + ['year'])
+        result = None
+        for chunk in chunks:
+            partial = self.process_data(chunk, **kwargs)
+            if result is None:
+                result = partial
+                continue
+            result = pd.concat([result, partial], ignore_index=True)
+            if 'year' in selected_columns:
+                # Re-aggregate so only one row per group is kept between batches
+                group_keys = [col for col in result.columns if col not in self.aggregation_rules]
+                result = result.groupby(group_keys, observed=True).agg(self.aggregation_rules).reset_index()
+        return result
+
+    def process_cube(self, cube, **kwargs):
+        """Answer a yearly aggregation from a crm_cube.CRMCube instead of regrouping the raw rows.
+
+        Only columns held by the cube (year, country, customerID, quantity, amount)
+        can be selected; the optional country and year filters are index lookups.
+        """
+        selected_columns = kwargs.get('columns', ['year', 'country', 'customerID', 'quantity', 'amount'])
+        if not cube.supports(selected_columns):
+            raise ValueError("Cube queries need 'year' and only year, country, customerID, quantity or amount")
+        by = ['year'] + [col for col in selected_columns if col not in self.aggregation_rules and col != 'year']
+        return cube.query(by, country=kwargs.get('country'), year=kwargs.get('year'))
+
+    def process_sql(self, dataset, **kwargs):
+        """Run process_data as SQL against a sqlite_dataset.SQLiteDataset; only the result is loaded."""
+        selected_columns = kwargs.get('columns', list(self.required_columns) + ['year'])
+        filters = [('country', '==', kwargs['country'])] if 'country' in kwargs else []
+        with stage(self, 'sql', len(dataset)) as metrics:
+            if 'year' in selected_columns:
+                group_keys = ['year'] + [col for col in selected_columns
+                                         if col not in self.aggregation_rules and col != 'year']
+                result = dataset.aggregate(group_keys, self.aggregation_rules, filters,
+                                           expressions={'year': sql_year('invoice_date')})
+            else:
+                result = dataset.query(selected_columns, filters)
+            metrics.rows_out = len(result)
+        return result
+
 class FinanceStrategy(DataProcessor):
     def process_data(self, data, **kwargs):
         if isinstance(data, pd.DataFrame):
@@ -60,10 +263,27 @@ class FinanceStrategy(DataProcessor):
         selected_columns = kwargs.get('columns', df.columns.tolist())
         sort_by = kwargs.get('sort_by', selected_columns[0] if selected_columns else 'Brand')
 
-        if selected_columns:
-            df = df[selected_columns]
+        # top_n / page / page_size / sort_index select only part of the sorted output
+        return _select_sorted(df, selected_columns or df.columns.tolist(), sort_by, kwargs)
+
+    def process_sql(self, dataset, **kwargs):
+        selected_columns = kwargs.get('columns') or dataset.columns
+        return _select_sql(dataset, selected_columns, kwargs.get('sort_by', selected_columns[0]), kwargs)
+
+    def process_cube(self, cube, **kwargs):
+        """Answer a rollup, slice or drill-down from a finance_cube.FinanceCube instead of the raw rows.
+
+        by lists the dimensions to group by (Year by default), filters maps a
+        dimension to the label(s) to keep, and drill_down adds one more dimension.
+        """
+        by = list(kwargs.get('by', ['Year']))
+        if kwargs.get('drill_down'):
+            return cube.drill_down(by, kwargs['drill_down'], kwargs.get('filters'))
+        return cube.query(by, kwargs.get('filters'))
 
-        return df.sort_values(by=sort_by, ascending=True)
+    def process_chunks(self, chunks, **kwargs):
+        """Sort finance batches; with top_n only the best rows are kept between batches."""
+        return _sort_chunks(chunks, kwargs.get('columns') or None, kwargs.get('sort_by'), kwargs.get('top_n'))
 
 class HRStrategy(DataProcessor):
     def process_data(self, data, **kwargs):
@@ -71,43 +291,255 @@ class HRStrategy(DataProcessor):
         selected_columns = kwargs.get('columns', data.columns.tolist())
         if 'columns' in kwargs and any(col not in data.columns for col in kwargs['columns']):
             raise ValueError("One or more selected columns are not in the DataFrame")
-        return data[selected_columns].sort_values(by=selected_columns[0], ascending=True)
+        return _select_sorted(data, selected_columns, selected_columns[0], kwargs)
+
+    def process_sql(self, dataset, **kwargs):
+        # Unknown columns raise ValueError from the dataset, as in process_data
+        selected_columns = kwargs.get('columns', dataset.columns)
+        return _select_sql(dataset, selected_columns, selected_columns[0], kwargs)
+
+    def process_rollups(self, rollups, **kwargs):
+        """Answer a workforce rollup from hr_rollups.HRRollups built once per dataset.
+
+        rollup is 'salary_percentiles' (per Department), 'absences' (per ManagerID)
+        or 'terminations' (per EmploymentStatus and year); the optional department
+        and manager filters drill down to one group's rows by index.
+        """
+        name = kwargs.get('rollup', 'salary_percentiles')
+        if name not in ROLLUPS:
+            raise ValueError(f"Unknown rollup '{name}', expected one of: {', '.join(ROLLUPS)}")
+        filters = {'department': kwargs.get('department'), 'manager': kwargs.get('manager')}
+        if name == 'salary_percentiles':
+            filters['percentiles'] = kwargs.get('percentiles', DEFAULT_PERCENTILES)
+        return ROLLUPS[name](rollups, **filters)
+
+    def process_chunks(self, chunks, **kwargs):
+        """Sort HR batches by the first selected column, optionally keeping only the top_n rows."""
+        columns = kwargs.get('columns')
+        return _sort_chunks(self._validated(chunks, columns), columns, None, kwargs.get('top_n'))
+
+    @staticmethod
+    def _validated(chunks, columns):
+        for chunk in chunks:
+            if columns is not None and any(col not in chunk.columns for col in columns):
+                raise ValueError("One or more selected columns are not in the DataFrame")
+            yield chunk
+
+# Group keys for each supported sales period
+SALES_PERIODS = {
+    'daily': ['date'],
+    'weekly': ['year', 'week'],
+    'monthly': ['year', 'month'],
+    'quarterly': ['year', 'quarter'],
+    'yearly': ['year'],
+}
+
+
+def _period_keys(order_date, period):
+    """Build the group-key columns for period from a datetime Series."""
+    if period == 'daily':
+        return {'date': order_date.dt.normalize()}
+    if period == 'weekly':
+        # ISO year, so the last days of December don't land in week 1 of the same year
+        iso = order_date.dt.isocalendar()
+        return {'year': iso['year'].astype('int32'), 'week': iso['week'].astype('int32')}
+    keys = {'year': order_date.dt.year}
+    if period == 'monthly':
+        keys['month'] = order_date.dt.month
+    elif period == 'quarterly':
+        keys['quarter'] = order_date.dt.quarter
+    return keys
+
+
+def aggregate_sales(data, period='monthly', by_product=False):
+    """Aggregate quantity and revenue of order lines per period, optionally per product.
+
+    Revenue is computed once for all rows (Quantity Ordered * Price Each) and the
+    totals come from a single native groupby, so no Python code runs per group.
+    Returns one row per period bucket with 'Quantity Ordered' and 'Revenue' columns.
+    """
+    if period not in SALES_PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of: {', '.join(SALES_PERIODS)}")
+    with stage(None, 'aggregate', len(data)) as metrics:
+        result = _rollup(pd.to_datetime(data['Order Date']), data['Quantity Ordered'],
+                         data['Quantity Ordered'] * data['Price Each'], period,
+                         data['Product'] if by_product else None)
+        metrics.rows_out = len(result)
+    return result
+
+
+def _rollup(order_date, quantity, revenue, period, product=None):
+    """Sum quantity and revenue per period bucket of order_date (and per product, if given)."""
+    # Rows without a date (e.g. repeated header lines, parsed as NaT by SALES_SCHEMA) belong to no bucket;
+    # dropping them first also keeps the integer key dtypes, which NaT would break
+    dated = order_date.notna()
+    if not dated.all():
+        order_date, quantity, revenue = order_date[dated], quantity[dated], revenue[dated]
+        product = None if product is None else product[dated]
+    frame = pd.DataFrame(_period_keys(order_date, period))
+    if product is not None:
+        frame['Product'] = product
+    frame['Quantity Ordered'] = quantity
+    frame['Revenue'] = revenue
+    group_keys = SALES_PERIODS[period] + (['Product'] if product is not None else [])
+    return frame.groupby(group_keys, observed=True).sum().reset_index()
+
+
+def _figure(**kwargs):
+    # matplotlib is imported on the first chart, so modules that never draw one do not pay for it at startup
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+def _set_period_ticks(ax, x, labels, ha='center'):
+    """Label about a dozen evenly spaced buckets, rotated for readability."""
+    step = len(x) // 12 + 1
+    ax.set_xticks(x[::step], labels[::step], rotation=45, ha=ha)
+
+
+def _period_labels(sales, period):
+    """Readable x-axis labels for aggregated sales buckets."""
+    if period == 'daily':
+        return sales['date'].dt.strftime('%Y-%m-%d')
+    year = sales['year'].astype(str)
+    if period == 'weekly':
+        return year + '-W' + sales['week'].astype(str)
+    if period == 'monthly':
+        return year + '-' + sales['month'].astype(str)
+    if period == 'quarterly':
+        return year + '-Q' + sales['quarter'].astype(str)
+    return year
+
 
 class SalesStrategy(DataProcessor):
-    def process_data(self, data, period='monthly'):
+    # Points drawn per series before long charts are downsampled
+    max_points = DEFAULT_MAX_POINTS
+
+    def prepare_data(self, data):
+        """Shallow view of the order lines with a parsed 'Order Date' and week/month/year columns."""
         if 'Order Date' not in data.columns:
             raise ValueError("DataFrame must contain an 'Order Date' column")
-        data['Order Date'] = pd.to_datetime(data['Order Date'])
+        # Derived columns come from the side cache and are added to a shallow view of the input
+        with stage(self, 'to_datetime', len(data)):
+            order_date = derived_column(data, 'Order Date', lambda: pd.to_datetime(data['Order Date']))
+            return with_columns(data, {
+                'Order Date': order_date,
+                'week': derived_column(data, 'week', lambda: order_date.dt.isocalendar().week),
+                'month': derived_column(data, 'month', lambda: order_date.dt.month),
+                'year': derived_column(data, 'year', lambda: order_date.dt.year),
+            })
 
-        data['week'] = data['Order Date'].dt.isocalendar().week
-        data['month'] = data['Order Date'].dt.month
-        data['year'] = data['Order Date'].dt.year
+    def process_data(self, data, period='monthly'):
+        if period not in SALES_PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of: {', '.join(SALES_PERIODS)}")
+        data = self.prepare_data(data)
 
         if period == 'weekly':
             return self.plot_weekly(data), data
         elif period == 'monthly':
             return self.plot_monthly(data), data
+        return self.plot_period(data, period), data
+
+    def process_chunks(self, chunks, period='monthly'):
+        """Aggregate order batches per period and plot the merged totals.
+
+        Returns the figure and the aggregated frame, since the raw order lines
+        are not retained.
+        """
+        group_keys = SALES_PERIODS[period]
+        result = None
+        for chunk in chunks:
+            partial = aggregate_sales(chunk, period)
+            if result is not None:
+                partial = pd.concat([result, partial], ignore_index=True)
+                partial = partial.groupby(group_keys).sum().reset_index()
+            result = partial
+
+        if result is None:
+            result = pd.DataFrame(columns=group_keys + ['Quantity Ordered', 'Revenue'])
+        if period == 'weekly':
+            return self._render_weekly(result), result
+        return self._render_trend(result, period), result
+
+    def process_store(self, store, period='monthly'):
+        """Plot totals read from a sales_store.SalesAggregateStore instead of raw order lines."""
+        sales = store.query(period)
+        if period == 'weekly':
+            return self._render_weekly(sales), sales
+        return self._render_trend(sales, period), sales
+
+    def process_sql(self, dataset, period='monthly', by_product=False):
+        """Plot totals of a sqlite_dataset.SQLiteDataset; SQLite reduces the orders to daily totals first."""
+        if period not in SALES_PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of: {', '.join(SALES_PERIODS)}")
+        group_by = ['date'] + (['Product'] if by_product else [])
+        with stage(self, 'sql', len(dataset)) as metrics:
+            daily = dataset.aggregate(group_by, {'Quantity Ordered': 'sum', 'Revenue': 'sum'}, expressions={
+                'date': 'date("Order Date")',
+                'Revenue': '"Quantity Ordered" * "Price Each"',
+            })
+            metrics.rows_out = len(daily)
+        sales = _rollup(pd.to_datetime(daily['date']), daily['Quantity Ordered'], daily['Revenue'], period,
+                        daily['Product'] if by_product else None)
+        return self.plot_totals(sales, period), sales
 
     def plot_weekly(self, data):
-        # Group data by week and aggregate quantities and revenue
-        weekly_sales = data.groupby(['year', 'week']).agg({
-            'Quantity Ordered': 'sum',
-            'Price Each': lambda x: (x * data.loc[x.index, 'Quantity Ordered']).sum()
-        }).reset_index()
+        weekly_sales = aggregate_sales(data, 'weekly')
+        with stage(self, 'plot', len(weekly_sales)):
+            return self._render_weekly(weekly_sales)
+
+    def plot_monthly(self, data):
+        monthly_sales = aggregate_sales(data, 'monthly')
+        with stage(self, 'plot', len(monthly_sales)):
+            return self._render_trend(monthly_sales, 'monthly')
+
+    def plot_period(self, data, period):
+        """Plot quantity and revenue for any period in SALES_PERIODS."""
+        return self.plot_totals(aggregate_sales(data, period), period)
+
+    def plot_totals(self, sales, period='monthly'):
+        """Plot totals already aggregated per period (e.g. by aggregate_sales); per-product rows are summed."""
+        if 'Product' in sales.columns:
+            sales = sales.groupby(SALES_PERIODS[period])[['Quantity Ordered', 'Revenue']].sum().reset_index()
+        with stage(self, 'plot', len(sales)):
+            return self._render(sales, period)
+
+    def chart_png(self, data, period='monthly', cache=None):
+        """Future of the period chart as PNG bytes, rendered off the calling thread.
+
+        Charts are cached by the hash of the aggregated totals, so reruns and
+        identical uploads reuse the encoded image instead of drawing it again.
+        """
+        if period not in SALES_PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of: {', '.join(SALES_PERIODS)}")
+        sales = aggregate_sales(data, period)
+        key = (frame_digest(sales), period, self.max_points)
+        return (CHARTS if cache is None else cache).submit(key, lambda: figure_png(self._render(sales, period)))
+
+    def _render(self, sales, period):
+        if period == 'weekly':
+            return self._render_weekly(sales)
+        return self._render_trend(sales, period)
 
-        # Creating a period column for better x-axis labeling
-        weekly_sales['period'] = weekly_sales['year'].astype(str) + '-W' + weekly_sales['week'].astype(str)
+    def _render_weekly(self, weekly_sales):
+        # Period labels for better x-axis labeling
+        labels = _period_labels(weekly_sales, 'weekly').to_numpy()
 
-        # Plot configuration
-        fig, ax = plt.subplots(figsize=(12, 6))  # Specify the figure size
+        # Plot configuration; figures are built without pyplot, so reruns leave none registered
+        fig = _figure(figsize=(12, 6))  # Specify the figure size
+        ax = fig.subplots()
 
         # Check if data is not empty
         if not weekly_sales.empty:
+            quantity = weekly_sales['Quantity Ordered'].to_numpy(dtype=float)
+            revenue = weekly_sales['Revenue'].to_numpy(dtype=float)
+            x = np.arange(len(weekly_sales))
+            # Long ranges keep max_points bars, picked by LTTB on the stacked height
+            shown = lttb(x, quantity + revenue, self.max_points)
+            width = 0.4 * len(x) / len(shown)
+
             # Creating bar plots
-            ax.bar(weekly_sales['period'], weekly_sales['Quantity Ordered'], width=0.4, label='Quantity Ordered',
-                   align='center')
-            ax.bar(weekly_sales['period'], weekly_sales['Price Each'], width=0.4, label='Revenue', color='red',
-                   bottom=weekly_sales['Quantity Ordered'])
+            ax.bar(x[shown], quantity[shown], width=width, label='Quantity Ordered', align='center')
+            ax.bar(x[shown], revenue[shown], width=width, label='Revenue', color='red', bottom=quantity[shown])
 
             ax.set_xlabel('Week')
             ax.set_ylabel('Values')
@@ -115,49 +547,50 @@ class SalesStrategy(DataProcessor):
             ax.legend()
 
             # Rotate x-axis labels for better readability
-            plt.xticks(rotation=45, ha='right')
+            _set_period_ticks(ax, x, labels, ha='right')
         else:
             # Display message if no data is available
             ax.text(0.5, 0.5, 'No data available', horizontalalignment='center', verticalalignment='center',
                     transform=ax.transAxes)
 
-        plt.tight_layout()  # Adjust layout to make room for rotated x-axis labels
+        fig.tight_layout()  # Adjust layout to make room for rotated x-axis labels
         return fig
 
-    def plot_monthly(self, data):
-        # Aggregate the data by year and month
-        monthly_sales = data.groupby(['year', 'month']).agg({
-            'Quantity Ordered': 'sum',
-            'Price Each': lambda x: (x * data.loc[x.index, 'Quantity Ordered']).sum()
-        }).reset_index()
-
-        # Create a period column for plotting
-        monthly_sales['period'] = monthly_sales['year'].astype(str) + '-' + monthly_sales['month'].astype(str)
+    def _render_trend(self, sales, period):
+        # Period labels for plotting
+        labels = _period_labels(sales, period).to_numpy()
+        unit = {'daily': 'Day', 'monthly': 'Month', 'quarterly': 'Quarter', 'yearly': 'Year'}[period]
 
         # Initialize the figure and primary axis
-        fig, ax1 = plt.subplots()
+        fig = _figure()
+        ax1 = fig.subplots()
+
+        if not sales.empty:
+            x = np.arange(len(sales))
+            quantity = sales['Quantity Ordered'].to_numpy(dtype=float)
+            revenue = sales['Revenue'].to_numpy(dtype=float)
 
-        if not monthly_sales.empty:
-            # Plot Quantity Ordered on the primary y-axis
+            # Plot Quantity Ordered on the primary y-axis; long series are downsampled with LTTB
             color = 'tab:blue'
-            ax1.set_xlabel('Month')
+            ax1.set_xlabel(unit)
             ax1.set_ylabel('Quantity Ordered', color=color)
-            ax1.plot(monthly_sales['period'], monthly_sales['Quantity Ordered'], label='Quantity Ordered', color=color)
+            shown = lttb(x, quantity, self.max_points)
+            ax1.plot(x[shown], quantity[shown], label='Quantity Ordered', color=color)
             ax1.tick_params(axis='y', labelcolor=color)
 
-            # Adjusting the month ticks
-            ax1.set_xticks(monthly_sales['period'][::len(monthly_sales) // 12 + 1])  # Reduce tick density
-            ax1.tick_params(axis='x', rotation=45)  # Rotate labels for better readability
+            # Adjusting the ticks
+            _set_period_ticks(ax1, x, labels)
 
             # Create a second y-axis for the Revenue
             ax2 = ax1.twinx()
             color = 'tab:red'
             ax2.set_ylabel('Revenue', color=color)
-            ax2.plot(monthly_sales['period'], monthly_sales['Price Each'], label='Revenue', color=color)
+            shown = lttb(x, revenue, self.max_points)
+            ax2.plot(x[shown], revenue[shown], label='Revenue', color=color)
             ax2.tick_params(axis='y', labelcolor=color)
 
             # Add titles and legends
-            ax1.set_title('Monthly Sales Analysis')
+            ax1.set_title(f'{period.capitalize()} Sales Analysis')
             lines, labels = ax1.get_legend_handles_labels()
             lines2, labels2 = ax2.get_legend_handles_labels()
             ax1.legend(lines + lines2, labels + labels2, loc='upper left')
@@ -166,8 +599,7 @@ class SalesStrategy(DataProcessor):
             ax1.text(0.5, 0.5, 'No data available', horizontalalignment='center', verticalalignment='center',
                      transform=ax1.transAxes)
 
-        plt.tight_layout()  # Automatically adjust subplot parameters to give specified padding
-        plt.show()
+        fig.tight_layout()  # Automatically adjust subplot parameters to give specified padding
 
         # Return the figure object for further manipulation if needed
         return fig
@@ -186,5 +618,42 @@ class SupplyChainStrategy(DataProcessor):
         # Sort by the first selected column or a default column if provided
         sort_by = kwargs.get('sort_by', selected_columns[0] if selected_columns else 'Brand')
 
-        # Return the DataFrame sorted by the specified column
-        return df[selected_columns].sort_values(by=sort_by, ascending=True)
+        # Return the DataFrame sorted by the specified column, or just the requested top_n rows or page
+        return _select_sorted(df, selected_columns, sort_by, kwargs)
+
+    def process_sql(self, dataset, **kwargs):
+        selected_columns = kwargs.get('columns', dataset.columns)
+        sort_by = kwargs.get('sort_by', selected_columns[0] if selected_columns else 'Brand')
+        return _select_sql(dataset, selected_columns, sort_by, kwargs)
+
+    def process_index(self, index, **kwargs):
+        """Vendor and brand analytics from a supply_chain_index.SupplyChainIndex built once per dataset.
+
+        analysis 'items' returns items with Margin, MarginPct and Markup, narrowed
+        to one brand and/or vendor by hash lookup; 'vendors' returns the per-vendor
+        rollup; 'join' attaches item or vendor columns to the rows of other (e.g. a
+        purchases file) by probing the index on key 'on'. columns, sort_by, top_n
+        and page work as in process_data.
+        """
+        analysis = kwargs.get('analysis', 'items')
+        if analysis == 'items':
+            result = index.items(brand=kwargs.get('brand'), vendor=kwargs.get('vendor'))
+        elif analysis == 'vendors':
+            result = index.vendor_rollup()
+        elif analysis == 'join':
+            if kwargs.get('other') is None:
+                raise ValueError("A join needs the rows to join in 'other'")
+            result = index.join(kwargs['other'], on=kwargs.get('on', 'Brand'))
+        else:
+            raise ValueError(f"Unknown analysis '{analysis}', expected 'items', 'vendors' or 'join'")
+        selected_columns = kwargs.get('columns', result.columns.tolist())
+        if any(col not in result.columns for col in selected_columns):
+            raise ValueError("One or more selected columns are not in the DataFrame")
+        sort_by = kwargs.get('sort_by', selected_columns[0] if selected_columns else 'Brand')
+        # A sort_index built for the raw data does not apply to this result
+        options = {key: value for key, value in kwargs.items() if key != 'sort_index'}
+        return _select_sorted(result, selected_columns, sort_by, options)
+
+    def process_chunks(self, chunks, **kwargs):
+        """Sort supply chain batches; with top_n only the best rows are kept between batches."""
+        return _sort_chunks(chunks, kwargs.get('columns'), kwargs.get('sort_by'), kwargs.get('top_n'))
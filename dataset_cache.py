@@ -0,0 +1,106 @@
+import hashlib
+import os
+import tempfile
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the cache is simply disabled without pyarrow
+    feather = None
+
+# Default location and size bound for cached datasets
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'erp_system')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path, salt=''):
+    """Return a hex digest of a file's contents; accepts a path or a seekable buffer."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(salt.encode())
+    if hasattr(file_path, 'read'):
+        file_path.seek(0)
+        for block in iter(lambda: file_path.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block if isinstance(block, bytes) else block.encode())
+        file_path.seek(0)
+    else:
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """On-disk cache of parsed DataFrames keyed by content hash.
+
+    Entries are stored as uncompressed Arrow IPC (Feather) files and loaded
+    through a memory map. The total size is bounded by max_bytes; the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return feather is not None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.feather')
+
+    def get(self, key):
+        """Return the cached DataFrame for key, or None on a miss."""
+        path = self._path(key)
+        if not self.enabled or not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            data = feather.read_table(path, memory_map=True).to_pandas()
+        except OSError:
+            # Evicted or truncated between the check and the read
+            self.misses += 1
+            return None
+        # The access time drives LRU eviction
+        os.utime(path)
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store a DataFrame under key and evict old entries beyond the size bound."""
+        if not self.enabled:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            feather.write_feather(data.reset_index(drop=True), tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.feather'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.feather'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
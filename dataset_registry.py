@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - datasets then stay on the heap, still shared once per process
+    feather = None
+
+# Memory budget for datasets no session is using any more
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+
+class DatasetRegistry:
+    """Process-wide store that keeps each ingested dataset once, shared by every session.
+
+    Datasets are keyed by content (e.g. the upload digest and module). The first
+    session to ask loads the data; it is written once as uncompressed Arrow IPC
+    and read back through a memory map, so numeric columns live in shared,
+    read-only file pages rather than the Python heap. Every acquire() returns a
+    new shallow view of the one stored frame: no data is copied. A session may
+    add or replace whole columns of its view (as derived_columns.with_columns
+    does) without affecting other sessions, but must not write into it in place. Each live view holds a reference; when the total
+    size exceeds max_bytes, datasets without references are evicted, least
+    recently used first.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None, memory_map=True):
+        self.max_bytes = max_bytes
+        self.memory_map = memory_map and feather is not None
+        # Where the Arrow files go; a temporary directory, removed by clear(), if not given
+        self.directory = directory
+        self._owns_directory = directory is None
+        self._entries = {}
+        # Finalizers of live views by id, so release() can drop a reference early
+        self._finalizers = {}
+        self._loading = {}
+        # Reentrant: a view collected while the lock is held drops its reference on the same thread
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix='erp_registry_')
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f'{abs(hash(key)):x}-{time.monotonic_ns()}.arrow')
+
+    def _store(self, key, data):
+        """Turn a loaded frame into its shared form: a memory-mapped Arrow file read back without copies."""
+        entry = {'refs': 0, 'last_used': time.monotonic(), 'path': None}
+        if self.memory_map:
+            path = self._path(key)
+            feather.write_feather(data.reset_index(drop=True), path, compression='uncompressed')
+            # split_blocks keeps one block per column, so numeric columns stay zero-copy views of the map
+            data = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+            entry['path'] = path
+        entry['frame'] = data
+        entry['nbytes'] = int(data.memory_usage(index=True, deep=True).sum())
+        return entry
+
+    def acquire(self, key, load):
+        """Return a read-only view of the dataset for key, calling load() once if it is not registered.
+
+        load() returns a DataFrame, or None on failure, in which case None is returned.
+        Concurrent sessions asking for the same missing key wait for one load.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return self._view(entry)
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another session is loading the same dataset
+            pending.wait()
+        try:
+            data = load()
+            entry = None if data is None else self._store(key, data)
+        finally:
+            with self._lock:
+                del self._loading[key]
+                pending.set()
+        if entry is None:
+            return None
+        with self._lock:
+            self._entries[key] = entry
+            view = self._view(entry)
+            self._evict()
+        return view
+
+    def _view(self, entry):
+        # Called with the lock held
+        entry['refs'] += 1
+        entry['last_used'] = time.monotonic()
+        view = entry['frame'].copy(deep=False)
+        self._finalizers[id(view)] = weakref.finalize(view, self._drop_ref, entry, id(view))
+        return view
+
+    def _drop_ref(self, entry, view_id):
+        # Idle datasets are evicted on the next acquire() or evict(), not from the garbage collector
+        with self._lock:
+            entry['refs'] -= 1
+            self._finalizers.pop(view_id, None)
+
+    def release(self, view):
+        """Give up a view's reference before it is garbage collected."""
+        with self._lock:
+            finalizer = self._finalizers.get(id(view))
+        if finalizer is not None:
+            # A finalizer runs at most once, so collecting the view later does not count it twice
+            finalizer()
+
+    def refcount(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return 0 if entry is None else entry['refs']
+
+    def _evict(self):
+        # Called with the lock held; datasets still in use are never evicted
+        total = sum(entry['nbytes'] for entry in self._entries.values())
+        idle = sorted((entry['last_used'], key) for key, entry in self._entries.items() if entry['refs'] <= 0)
+        for _, key in idle:
+            if total <= self.max_bytes:
+                break
+            entry = self._entries.pop(key)
+            total -= entry['nbytes']
+            self.evictions += 1
+            self._remove_file(entry)
+
+    @staticmethod
+    def _remove_file(entry):
+        # The map stays valid for views that are still alive; the name is unlinked now
+        if entry['path'] is not None and os.path.exists(entry['path']):
+            try:
+                os.remove(entry['path'])
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop idle datasets beyond the memory budget."""
+        with self._lock:
+            self._evict()
+
+    def nbytes(self):
+        with self._lock:
+            return sum(entry['nbytes'] for entry in self._entries.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {'datasets': len(self._entries), 'bytes': sum(e['nbytes'] for e in self._entries.values()),
+                    'in_use': sum(1 for e in self._entries.values() if e['refs'] > 0), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def clear(self):
+        """Forget every dataset; views already handed out stay valid."""
+        with self._lock:
+            for entry in self._entries.values():
+                self._remove_file(entry)
+            self._entries.clear()
+        if self._owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
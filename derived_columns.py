@@ -0,0 +1,84 @@
+import threading
+import weakref
+
+import pandas as pd
+
+
+class DerivedColumns:
+    """Side cache of columns computed from a DataFrame, kept off the frame itself.
+
+    Strategies treat their input as read-only: instead of writing a parsed
+    date or a 'year' column back into the caller's frame, they ask this cache,
+    which computes the column once per frame object and drops it when the
+    frame is garbage collected. Entries are keyed by frame identity, so a frame
+    must not be modified in place after columns were derived from it.
+    """
+
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, data):
+        key = id(data)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None and entry[0]() is data:
+                return entry[1]
+            columns = {}
+            self._frames[key] = (weakref.ref(data), columns)
+        weakref.finalize(data, self._forget, key, columns)
+        return columns
+
+    def _forget(self, key, columns):
+        with self._lock:
+            # The id may already belong to a newer frame
+            if key in self._frames and self._frames[key][1] is columns:
+                del self._frames[key]
+
+    def get(self, data, name, compute):
+        """Return the derived column name of data, computing it with compute() on first use."""
+        columns = self._entry(data)
+        if name not in columns:
+            columns[name] = compute()
+        return columns[name]
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frames)
+
+    def nbytes(self, data=None):
+        """Memory held by the derived columns of data, or of every live frame."""
+        with self._lock:
+            if data is not None:
+                entry = self._frames.get(id(data))
+                entries = [entry[1]] if entry is not None and entry[0]() is data else []
+            else:
+                entries = [entry[1] for entry in self._frames.values()]
+            return sum(int(column.memory_usage(index=False)) for columns in entries for column in columns.values()
+                       if isinstance(column, pd.Series))
+
+
+# Process-wide cache shared by the strategies
+DERIVED = DerivedColumns()
+
+
+def derived_column(data, name, compute):
+    """Shortcut for DERIVED.get."""
+    return DERIVED.get(data, name, compute)
+
+
+def with_columns(data, columns):
+    """A view of data with columns (a name -> values mapping) added or replaced; data is left untouched.
+
+    The view is a shallow copy, so its other columns share memory with data
+    whether or not pandas' copy-on-write mode is on. Columns are only ever
+    replaced whole on it, never written in place.
+    """
+    view = data.copy(deep=False)
+    for name, values in columns.items():
+        view[name] = values
+    return view
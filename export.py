@@ -0,0 +1,239 @@
+import gzip
+import io
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - Parquet export is unavailable without pyarrow
+    pa = pq = None
+
+try:
+    import xlsxwriter
+except ImportError:  # pragma: no cover - openpyxl, if installed, writes Excel files instead
+    xlsxwriter = None
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+# Rows encoded per step; memory use is bounded by this, not by the size of the result
+DEFAULT_EXPORT_CHUNK_ROWS = 50_000
+# Rows in an Excel worksheet, including the header
+EXCEL_MAX_ROWS = 1_048_576
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def available_formats():
+    """Export formats whose writer can run with the installed packages."""
+    unavailable = {'parquet'} if pq is None else set()
+    if xlsxwriter is None and openpyxl is None:
+        unavailable.add('xlsx')
+    return [fmt for fmt in EXPORT_FORMATS if fmt not in unavailable]
+
+
+def format_for(path):
+    """Export format implied by a file name, e.g. 'csv.gz' for report.csv.gz."""
+    name = os.fspath(path).lower()
+    for fmt, (extension, _) in sorted(EXPORT_FORMATS.items(), key=lambda item: -len(item[1][0])):
+        if name.endswith(extension):
+            return fmt
+    raise ValueError(f"Cannot tell the export format of {path!r}; expected one of: "
+                     f"{', '.join(extension for extension, _ in EXPORT_FORMATS.values())}")
+
+
+def result_chunks(result, chunksize=DEFAULT_EXPORT_CHUNK_ROWS):
+    """Yield a strategy result as DataFrame batches of at most chunksize rows.
+
+    Accepts a DataFrame, a (figure, DataFrame) tuple as returned by
+    SalesStrategy, a sqlite_dataset.SQLiteDataset, or any iterable of
+    DataFrames such as CSVDataIngestion.iter_chunks. An empty frame is
+    yielded once, so writers can still emit its header or schema.
+    """
+    if isinstance(result, tuple):
+        result = next((item for item in result if isinstance(item, pd.DataFrame)), None)
+        if result is None:
+            raise ValueError("The result holds no DataFrame to export")
+    if isinstance(result, pd.DataFrame):
+        result = [result]
+    elif hasattr(result, 'iter_chunks'):
+        result = result.iter_chunks(chunksize)
+    for frame in result:
+        for start in range(0, max(len(frame), 1), chunksize):
+            yield frame.iloc[start:start + chunksize]
+
+
+# Writers are generators: they encode one batch at a time into file and yield the rows written so far,
+# so iter_export can hand out the bytes of each batch before the next one is encoded
+
+def _write_csv(frames, file):
+    rows = 0
+    for number, frame in enumerate(frames):
+        if number == 0 or len(frame):
+            file.write(frame.to_csv(index=False, header=number == 0).encode())
+        rows += len(frame)
+        yield rows
+
+
+def _write_csv_gz(frames, file):
+    with gzip.GzipFile(fileobj=file, mode='wb') as compressed:
+        yield from _write_csv(frames, compressed)
+
+
+def _parquet_schema(table):
+    # Categories may differ between batches, so columns are stored by value; Parquet dictionary-encodes them anyway
+    return pa.schema([pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type)
+                               else field.type) for field in table.schema])
+
+
+def _parquet_batch(frame, schema):
+    # Batches of an iterable may drift in dtype, e.g. int64 and then float64 once NaN appears;
+    # they are cast to the file's schema, NaN becoming null, as long as no value is lost
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    try:
+        return table.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"A batch does not fit the Parquet schema of the first one: {e}") from e
+
+
+def _write_parquet(frames, file):
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow")
+    writer, schema, rows = None, None, 0
+    try:
+        for frame in frames:
+            if writer is None:
+                schema = _parquet_schema(pa.Table.from_pandas(frame, preserve_index=False))
+                writer = pq.ParquetWriter(file, schema)
+            elif not len(frame):
+                continue
+            # One row group per batch; an empty first batch still writes the schema
+            writer.write_table(_parquet_batch(frame, schema))
+            rows += len(frame)
+            yield rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _excel_rows(frame):
+    # Plain Python values; missing values become empty cells
+    values = frame.astype(object).where(frame.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield [value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row]
+
+
+def _write_xlsx(frames, file):
+    if xlsxwriter is None and openpyxl is None:
+        raise RuntimeError("Excel export needs xlsxwriter or openpyxl")
+    if xlsxwriter is not None:
+        # constant_memory flushes every finished row to a temporary file
+        workbook = xlsxwriter.Workbook(file, {'constant_memory': True})
+        sheet = workbook.add_worksheet()
+        append = lambda line, row: sheet.write_row(line, 0, row)
+    else:
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        append = lambda line, row: sheet.append(row)
+    rows = 0
+    for number, frame in enumerate(frames):
+        if rows + len(frame) + 1 > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel worksheets hold at most {EXCEL_MAX_ROWS - 1:,} rows")
+        if number == 0:
+            append(0, [str(col) for col in frame.columns])
+        for line, row in enumerate(_excel_rows(frame), start=rows + 1):
+            append(line, row)
+        rows += len(frame)
+        yield rows
+    # The archive is only written when the workbook is closed
+    if xlsxwriter is not None:
+        workbook.close()
+    else:
+        workbook.save(file)
+
+
+_WRITERS = {'csv': _write_csv, 'csv.gz': _write_csv_gz, 'parquet': _write_parquet, 'xlsx': _write_xlsx}
+
+
+def _writer(result, file, fmt, chunksize):
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of: {', '.join(EXPORT_FORMATS)}")
+    return _WRITERS[fmt](result_chunks(result, chunksize), file)
+
+
+def write_export(result, file, fmt='csv', chunksize=DEFAULT_EXPORT_CHUNK_ROWS):
+    """Encode result batch by batch into a binary file object; returns the number of rows written."""
+    rows = 0
+    for rows in _writer(result, file, fmt, chunksize):
+        pass
+    return rows
+
+
+def export_to_path(result, path, fmt=None, chunksize=DEFAULT_EXPORT_CHUNK_ROWS):
+    """Write result to path in fmt (by default implied by the extension); returns the rows written."""
+    fmt = format_for(path) if fmt is None else fmt
+    with open(path, 'wb') as file:
+        return write_export(result, file, fmt, chunksize)
+
+
+def export_bytes(result, fmt='csv', chunksize=DEFAULT_EXPORT_CHUNK_ROWS):
+    """The whole export as bytes, e.g. for a Streamlit download button.
+
+    Streamlit holds a download's payload in memory whatever it is given, so
+    only the encoding is batched here; use export_to_path or iter_export to
+    keep large exports out of memory.
+    """
+    buffer = io.BytesIO()
+    write_export(result, buffer, fmt, chunksize)
+    return buffer.getvalue()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only buffer that iter_export drains after every batch."""
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def iter_export(result, fmt='csv', chunksize=DEFAULT_EXPORT_CHUNK_ROWS):
+    """Yield the encoded export as byte strings, one per batch, e.g. for a streaming HTTP response.
+
+    Excel files are zip archives written when the workbook closes, so they
+    arrive in one piece at the end.
+    """
+    sink = _Sink()
+    for _ in _writer(result, sink, fmt, chunksize):
+        data = sink.drain()
+        if data:
+            yield data
+    data = sink.drain()
+    if data:
+        yield data
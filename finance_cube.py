@@ -0,0 +1,173 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from supply_chain_index import KeyIndex
+
+# Dimensions and measures held by the cube, in storage order
+FINANCE_DIMENSIONS = ('Segment', 'Country', 'Product', 'Discount Band', 'Year', 'Month Number')
+FINANCE_MEASURES = ('Units Sold', 'Sales', 'COGS', 'Profit')
+
+
+class FinanceCube:
+    """Pre-aggregated Sales, COGS, Profit and Units Sold over the finance dimensions.
+
+    The base cuboid (one cell per distinct Segment x Country x Product x
+    Discount Band x Year x Month Number) is built once per dataset from integer
+    codes. Every rollup to a subset of the dimensions is aggregated from the
+    base cells on first use and kept, so repeating it costs the size of its
+    result; slices probe a per-dimension index of the cuboid instead of masking
+    it. Cubes of several files merge by remapping their codes and re-adding the
+    cells, without touching the source rows again.
+    """
+
+    def __init__(self, data=None):
+        self.labels = {dim: pd.Index([]) for dim in FINANCE_DIMENSIONS}
+        columns = {dim: np.empty(0, dtype='int32') for dim in FINANCE_DIMENSIONS}
+        columns.update({measure: np.empty(0) for measure in FINANCE_MEASURES + ('Rows',)})
+        cells = pd.DataFrame(columns)
+        self.source_rows = 0
+        if data is not None:
+            missing = [col for col in FINANCE_DIMENSIONS + FINANCE_MEASURES if col not in data.columns]
+            if missing:
+                raise ValueError(f"The finance cube needs the columns: {', '.join(missing)}")
+            codes = {}
+            for dim in FINANCE_DIMENSIONS:
+                dim_codes, uniques = pd.factorize(data[dim], sort=True)
+                self.labels[dim] = pd.Index(np.asarray(uniques))
+                codes[dim] = dim_codes.astype('int32')
+            frame = pd.DataFrame({**codes, **{measure: data[measure].to_numpy(dtype='float64', na_value=np.nan)
+                                              for measure in FINANCE_MEASURES}, 'Rows': 1})
+            # Rows with a missing dimension are left out, as groupby does
+            frame = frame[(frame[list(FINANCE_DIMENSIONS)] >= 0).all(axis=1)]
+            cells = frame.groupby(list(FINANCE_DIMENSIONS), sort=True).sum().reset_index()
+            self.source_rows = len(data)
+        self._set_cells(cells)
+
+    def _set_cells(self, cells):
+        self._cuboids = {FINANCE_DIMENSIONS: cells}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Build a cube from DataFrame batches (e.g. iter_chunks or partitions), merging one batch at a time."""
+        cube = cls()
+        for chunk in chunks:
+            cube = cube.merge(cls(chunk))
+        return cube
+
+    def __len__(self):
+        return len(self._cuboids[FINANCE_DIMENSIONS])
+
+    def nbytes(self):
+        """Bytes held by the cuboids and their slice indexes."""
+        with self._lock:
+            cuboids, indexes = list(self._cuboids.values()), list(self._indexes.values())
+        return int(sum(cuboid.memory_usage(deep=False).sum() for cuboid in cuboids)
+                   + sum(index.nbytes() for index in indexes))
+
+    def merge(self, other):
+        """A new cube holding the cells of both cubes; cells with equal coordinates are added."""
+        merged = FinanceCube()
+        parts = [self._cuboids[FINANCE_DIMENSIONS].copy(), other._cuboids[FINANCE_DIMENSIONS].copy()]
+        for dim in FINANCE_DIMENSIONS:
+            # One side empty (e.g. the fresh cube from_chunks starts with): keep the other's labels and their
+            # dtype, since a union with the empty object Index would turn them into objects
+            if not len(other.labels[dim]):
+                labels = self.labels[dim]
+            elif not len(self.labels[dim]):
+                labels = other.labels[dim]
+            else:
+                labels = self.labels[dim].union(other.labels[dim])
+            merged.labels[dim] = labels
+            # Recode both sides onto the union of their labels
+            for part, cube in zip(parts, (self, other)):
+                part[dim] = labels.get_indexer(cube.labels[dim])[part[dim].to_numpy()].astype('int32')
+        cells = pd.concat(parts, ignore_index=True).groupby(list(FINANCE_DIMENSIONS), sort=True).sum()
+        merged._set_cells(cells.reset_index())
+        merged.source_rows = self.source_rows + other.source_rows
+        return merged
+
+    def _check(self, dims):
+        unknown = [dim for dim in dims if dim not in FINANCE_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {', '.join(unknown)}; expected {', '.join(FINANCE_DIMENSIONS)}")
+
+    def _cuboid(self, dims):
+        """Cells aggregated to dims (a tuple in FINANCE_DIMENSIONS order), computed once."""
+        with self._lock:
+            if dims in self._cuboids:
+                return self._cuboids[dims]
+        base = self._cuboids[FINANCE_DIMENSIONS]
+        if dims:
+            cuboid = base.groupby(list(dims), sort=True)[list(FINANCE_MEASURES) + ['Rows']].sum().reset_index()
+        else:
+            cuboid = base[list(FINANCE_MEASURES) + ['Rows']].sum().to_frame().T
+        with self._lock:
+            self._cuboids[dims] = cuboid
+        return cuboid
+
+    def _index(self, dims, dim):
+        with self._lock:
+            if (dims, dim) in self._indexes:
+                return self._indexes[(dims, dim)]
+        index = KeyIndex(self._cuboid(dims)[dim].to_numpy())
+        with self._lock:
+            self._indexes[(dims, dim)] = index
+        return index
+
+    def _codes(self, dim, values):
+        if not isinstance(values, (list, tuple, set, np.ndarray, pd.Index)):
+            values = [values]
+        codes = self.labels[dim].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def query(self, by=('Year',), filters=None):
+        """Roll up to the dimensions in by, sliced to filters ({dimension: label or list of labels}).
+
+        Returns one row per combination of by with the summed measures and the
+        number of source rows (Rows) behind it.
+        """
+        requested = list(dict.fromkeys(by))
+        filters = dict(filters or {})
+        self._check(requested + list(filters))
+        by = [dim for dim in FINANCE_DIMENSIONS if dim in requested]
+        dims = tuple(dim for dim in FINANCE_DIMENSIONS if dim in by or dim in filters)
+        cuboid = self._cuboid(dims)
+        if filters:
+            positions = None
+            # Probe the most selective filter first, then narrow by the others
+            for dim in sorted(filters, key=lambda dim: len(self._codes(dim, filters[dim]))):
+                wanted = self._codes(dim, filters[dim])
+                if positions is None:
+                    index = self._index(dims, dim)
+                    positions = np.sort(np.concatenate([index.positions(code) for code in wanted]
+                                                       or [np.empty(0, dtype='int64')]))
+                else:
+                    positions = positions[np.isin(cuboid[dim].to_numpy()[positions], wanted)]
+            cuboid = cuboid.take(positions)
+            if tuple(by) != dims:
+                if by:
+                    cuboid = cuboid.groupby(by, sort=True)[list(FINANCE_MEASURES) + ['Rows']].sum().reset_index()
+                else:
+                    cuboid = cuboid[list(FINANCE_MEASURES) + ['Rows']].sum().to_frame().T
+        result = cuboid[requested + list(FINANCE_MEASURES) + ['Rows']]
+        if requested != by:
+            # Cells are stored in dimension order; sort them in the order asked for
+            result = result.sort_values(requested, kind='stable')
+        result = result.reset_index(drop=True)
+        # Labels are decoded for the (small) result only
+        for dim in by:
+            result[dim] = self.labels[dim].take(result[dim].to_numpy())
+        return result.astype({'Rows': 'int64'})
+
+    def drill_down(self, by, dimension, filters=None):
+        """Split every row of query(by, filters) by one more dimension."""
+        return self.query(list(by) + [dimension], filters)
+
+    def values(self, dim):
+        """Labels of a dimension, sorted."""
+        self._check([dim])
+        return self.labels[dim].tolist()
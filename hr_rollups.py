@@ -0,0 +1,163 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Columns of an HR dataset the rollups are built from
+ROLLUP_COLUMNS = ('Department', 'ManagerID', 'ManagerName', 'Salary', 'Absences', 'DaysLateLast30',
+                  'EmploymentStatus', 'DateofTermination')
+# Salary percentiles reported per department unless others are asked for
+DEFAULT_PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def _take(values, positions):
+    return values if positions is None else values[positions]
+
+
+class HRRollups:
+    """Department and manager group indexes over an HR dataset, with memoized workforce rollups.
+
+    Built once per dataset: Department, ManagerID and EmploymentStatus are
+    factorized into integer codes and the row positions of every department and
+    manager are kept. Each rollup is one groupby over the codes, computed on
+    first use and cached per arguments; a drill-down to one department or
+    manager takes its rows by position instead of rescanning the data.
+    """
+
+    def __init__(self, data):
+        missing = [col for col in ROLLUP_COLUMNS if col not in data.columns]
+        if missing:
+            raise ValueError(f"HR rollups need the columns: {', '.join(missing)}")
+        department_codes, departments = pd.factorize(data['Department'], sort=True)
+        manager_codes, managers = pd.factorize(data['ManagerID'], sort=True)
+        status_codes, statuses = pd.factorize(data['EmploymentStatus'], sort=True)
+        self.departments = pd.Index(departments)
+        self.managers = pd.Index(managers)
+        self.statuses = pd.Index(statuses)
+        termination = pd.to_datetime(data['DateofTermination'])
+        # Codes and measures only; missing keys are coded -1
+        self._columns = {
+            'department': department_codes.astype('int32'),
+            'manager': manager_codes.astype('int32'),
+            'status': status_codes.astype('int32'),
+            'year': termination.dt.year.to_numpy(dtype='int32', na_value=-1),
+            'Salary': data['Salary'].to_numpy(dtype='float64', na_value=np.nan),
+            'Absences': data['Absences'].to_numpy(dtype='float64', na_value=np.nan),
+            'DaysLateLast30': data['DaysLateLast30'].to_numpy(dtype='float64', na_value=np.nan),
+        }
+        codes = pd.DataFrame({'department': self._columns['department'], 'manager': self._columns['manager']})
+        self._department_rows = {code: rows for code, rows in codes.groupby('department').indices.items()
+                                 if code >= 0}
+        self._manager_rows = {code: rows for code, rows in codes.groupby('manager').indices.items() if code >= 0}
+        # One name per manager ID, taken from the manager's first employee
+        names = data['ManagerName'].to_numpy()
+        self.manager_names = pd.Series([names[rows[0]] for _, rows in sorted(self._manager_rows.items())],
+                                       index=self.managers, dtype=object)
+        self._data = data
+        self._results = {}
+        self._lock = threading.Lock()
+        self.source_rows = len(data)
+
+    def __len__(self):
+        return self.source_rows
+
+    def nbytes(self):
+        """Bytes held by the scanned columns, codes, row positions and cached rollups."""
+        arrays = [*self._columns.values(), *self._department_rows.values(), *self._manager_rows.values()]
+        frames = [self._data, *self._results.values()]
+        return int(sum(array.nbytes for array in arrays)
+                   + sum(frame.memory_usage(deep=False).sum() for frame in frames))
+
+    def _code(self, index, value):
+        code = index.get_indexer([value])[0]
+        return None if code < 0 else code
+
+    def positions(self, department=None, manager=None):
+        """Row positions of one department and/or manager; None selects every row."""
+        selected = None
+        empty = np.empty(0, dtype='int64')
+        if department is not None:
+            selected = self._department_rows.get(self._code(self.departments, department), empty)
+        if manager is not None:
+            rows = self._manager_rows.get(self._code(self.managers, manager), empty)
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+        return selected
+
+    def drill_down(self, department=None, manager=None):
+        """Source rows of one department and/or manager."""
+        positions = self.positions(department, manager)
+        return self._data if positions is None else self._data.take(positions)
+
+    def _frame(self, department, manager, columns):
+        positions = self.positions(department, manager)
+        return pd.DataFrame({col: _take(self._columns[col], positions) for col in columns})
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def salary_percentiles(self, percentiles=DEFAULT_PERCENTILES, department=None, manager=None):
+        """Employee count and salary percentiles per department."""
+        percentiles = tuple(float(p) for p in percentiles)
+
+        def compute():
+            frame = self._frame(department, manager, ['department', 'Salary'])
+            groups = frame[frame['department'] >= 0].groupby('department')['Salary']
+            # reindex keeps one column per percentile when the selection has no employees
+            result = groups.quantile(list(percentiles)).unstack().reindex(columns=list(percentiles))
+            result.columns = [f'p{p * 100:g}' for p in percentiles]
+            result.insert(0, 'Employees', groups.size())
+            return self._decode(result.reset_index(), 'department')
+
+        return self._cached(('salary_percentiles', percentiles, department, manager), compute)
+
+    def absences(self, department=None, manager=None):
+        """Employees, total and mean absences and late days per manager."""
+        def compute():
+            frame = self._frame(department, manager, ['manager', 'Absences', 'DaysLateLast30'])
+            groups = frame[frame['manager'] >= 0].groupby('manager')
+            result = groups.agg(Employees=('Absences', 'size'), Absences=('Absences', 'sum'),
+                                MeanAbsences=('Absences', 'mean'), DaysLateLast30=('DaysLateLast30', 'sum'))
+            result = result.astype({'Absences': 'int64', 'DaysLateLast30': 'int64'})
+            return self._decode(result.reset_index(), 'manager')
+
+        return self._cached(('absences', department, manager), compute)
+
+    def terminations(self, department=None, manager=None):
+        """Terminated employees per EmploymentStatus and year of DateofTermination."""
+        def compute():
+            frame = self._frame(department, manager, ['status', 'year'])
+            frame = frame[(frame['status'] >= 0) & (frame['year'] >= 0)]
+            result = frame.groupby(['status', 'year']).size().rename('Terminations').reset_index()
+            return self._decode(result.rename(columns={'year': 'Year'}), 'status')
+
+        return self._cached(('terminations', department, manager), compute)
+
+    def _decode(self, result, key):
+        # Labels are decoded for the (small) result only
+        codes = result.pop(key).to_numpy()
+        if key == 'department':
+            result.insert(0, 'Department', self.departments.take(codes))
+        elif key == 'manager':
+            result.insert(0, 'ManagerName', self.manager_names.to_numpy()[codes])
+            result.insert(0, 'ManagerID', self.managers.take(codes))
+        else:
+            result.insert(0, 'EmploymentStatus', self.statuses.take(codes))
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+# Rollups served by HRStrategy.process_rollups
+ROLLUPS = {
+    'salary_percentiles': HRRollups.salary_percentiles,
+    'absences': HRRollups.absences,
+    'terminations': HRRollups.terminations,
+}
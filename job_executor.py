@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from session_cache import _sizeof
+
+# Jobs run at the same time by one executor
+DEFAULT_WORKERS = 4
+# Finished jobs whose results are kept for later submissions of the same key
+DEFAULT_MAX_FINISHED = 64
+# Bytes of finished results kept; the oldest are dropped beyond it
+DEFAULT_MAX_RESULT_BYTES = 256 * 1024 ** 2
+# Rows per batch when a job walks an in-memory frame in chunks
+DEFAULT_JOB_CHUNK_ROWS = 50_000
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it was cancelled while running."""
+
+
+def current_job():
+    """The Job running on this thread, or None outside an executor."""
+    return getattr(_local, 'job', None)
+
+
+def report_progress(done, total=None, message=None):
+    """Report progress of the current job; does nothing outside an executor."""
+    job = current_job()
+    if job is not None:
+        job.report(done, total, message)
+
+
+def check_cancelled():
+    """Stop the current job with JobCancelled if it was cancelled; does nothing outside an executor."""
+    job = current_job()
+    if job is not None and job.cancel_requested:
+        raise JobCancelled(job.key)
+
+
+def frame_chunks(data, chunksize=DEFAULT_JOB_CHUNK_ROWS):
+    """Slices of an in-memory frame, for strategies' process_chunks."""
+    for start in range(0, len(data), chunksize):
+        yield data.iloc[start:start + chunksize]
+
+
+def tracked(chunks, total_rows=None):
+    """Pass batches through, reporting rows done after each and stopping at a cancellation."""
+    done = 0
+    for chunk in chunks:
+        check_cancelled()
+        yield chunk
+        done += len(chunk)
+        report_progress(done, total_rows, f'{done:,} rows processed')
+
+
+class Job:
+    """Handle of a submitted job: its state, progress and result."""
+
+    def __init__(self, key, owner=None):
+        self.key = key
+        # Sessions waiting for the result; the job is cancelled when the last one lets go
+        self.owners = set() if owner is None else {owner}
+        self.progress = 0.0
+        self.message = ''
+        self.submitted = time.time()
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def state(self):
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            if isinstance(self.future.exception(), JobCancelled):
+                return 'cancelled'
+            return 'failed' if self.future.exception() is not None else 'done'
+        if self.cancel_requested:
+            return 'cancelling'
+        return 'running' if self.future.running() else 'queued'
+
+    def report(self, done, total=None, message=None):
+        if total:
+            self.progress = min(max(done / total, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        """Drop the job if it has not started, else ask it to stop at its next check_cancelled()."""
+        self._cancel.set()
+        self.future.cancel()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class JobExecutor:
+    """Thread pool shared by every session, running analyses off the script thread.
+
+    Jobs are keyed by their parameters (e.g. session_cache.make_key of the
+    dataset digest and the selections): submitting a key that is queued,
+    running or finished returns the existing job, so identical requests from
+    several sessions run once. Finished jobs, failed ones included, are kept,
+    oldest dropped first, up to max_finished, and results are kept up to
+    max_bytes (sized as session_cache does). A failed job keeps only its error,
+    not its traceback; its key only runs again when submitted with retry=True,
+    so reruns do not repeat a failing analysis. Work running in a job reports
+    progress and honours cancellation through report_progress, check_cancelled
+    and tracked.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_finished=DEFAULT_MAX_FINISHED,
+                 max_bytes=DEFAULT_MAX_RESULT_BYTES):
+        self.max_finished = max_finished
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, owner=None, retry=False, **kwargs):
+        """Run fn(*args, **kwargs) as the job for key, or join the job already submitted for it.
+
+        Cancelled jobs are replaced; failed ones are returned as they are unless retry is set.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            replace = ('cancelled', 'cancelling', 'failed') if retry else ('cancelled', 'cancelling')
+            if job is not None and job.state not in replace:
+                if owner is not None:
+                    job.owners.add(owner)
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key, owner)
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+            self._jobs[key] = job
+            self._trim()
+        return job
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        _local.job = job
+        try:
+            check_cancelled()
+            result = fn(*args, **kwargs)
+            job.progress = 1.0
+            return result
+        except Exception as error:
+            # A failed job is kept for its error; the traceback would also keep the frames it ran in, and their data
+            fn = args = kwargs = None
+            raise error.with_traceback(None)
+        finally:
+            _local.job = None
+
+    def _trim(self):
+        finished = [key for key, job in self._jobs.items() if job.done()]
+        for key in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[key]
+        # Sized when trimming, as a result may have finished since the last submission
+        sizes = {key: _sizeof(job.result()) for key, job in self._jobs.items() if job.state == 'done'}
+        total = sum(sizes.values())
+        for key, size in sizes.items():
+            if total <= self.max_bytes:
+                break
+            del self._jobs[key]
+            total -= size
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def release(self, key, owner):
+        """owner no longer needs the job; cancel it if nobody else does. Returns True if it was cancelled."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return False
+            job.owners.discard(owner)
+            if job.owners or job.done():
+                return False
+            job.cancel()
+            return True
+
+    def cancel(self, key):
+        """Cancel the job for key regardless of who is waiting for it."""
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None and not job.done():
+            job.cancel()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.done():
+                    job.cancel()
+        self._executor.shutdown(wait=wait)
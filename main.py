@@ -1,93 +1,426 @@
+import uuid
 import streamlit as st
-from data_processor import HRStrategy, FinanceStrategy, SalesStrategy, SupplyChainStrategy, CRMStrategy
-from DataIngection import CSVDataIngestion
+from data_processor import SortIndex, DEFAULT_PAGE_SIZE
+from DataIngection import DataIngestionContext, JSON_EXTENSIONS
+from schemas import SCHEMAS
+from dataset_cache import DatasetCache
+from dataset_registry import DatasetRegistry
+from session_cache import SessionCache, make_key
+from crm_cube import CRMCube
+from finance_cube import FINANCE_DIMENSIONS, FinanceCube
+from hr_rollups import HRRollups, ROLLUP_COLUMNS, ROLLUPS
+from supply_chain_index import JOIN_KEYS, SupplyChainIndex
+from metrics import RECORDER
+from derived_columns import DERIVED
+from query_plan import QueryPlan
+from job_executor import JobExecutor, frame_chunks, tracked
+from strategy_registry import STRATEGIES
+from export import EXPORT_FORMATS, available_formats, export_bytes
+
+# Seconds between progress refreshes while a background analysis runs
+JOB_POLL_SECONDS = 0.5
+
+@st.cache_resource
+def get_dataset_cache():
+    """ Shared on-disk cache of parsed uploads, created once per server process. """
+    return DatasetCache()
+
+@st.cache_resource
+def get_dataset_registry():
+    """ Ingested datasets shared by every session, each kept once per server process. """
+    return DatasetRegistry()
+
+def get_session_cache():
+    """ Per-session memo of ingested data, widget options and results, kept across reruns. """
+    if 'session_cache' not in st.session_state:
+        st.session_state['session_cache'] = SessionCache()
+    return st.session_state['session_cache']
 
 def load_strategy(module):
-    """ Load the appropriate strategy based on the selected module. """
-    strategy_map = {
-        'HR': HRStrategy(),
-        'Finance': FinanceStrategy(),
-        'Sales': SalesStrategy(),
-        'Supply Chain': SupplyChainStrategy(),
-        'CRM': CRMStrategy(),
-    }
-    return strategy_map[module]
+    """ The selected module's strategy, imported and built on first use and shared across sessions. """
+    return STRATEGIES.get(module)
+
+def page_controls(total_rows):
+    """ Page size and 0-based page number for sorted tables. """
+    page_size = int(st.sidebar.number_input('Rows per page', min_value=10, max_value=10_000,
+                                            value=DEFAULT_PAGE_SIZE, step=10))
+    pages = max(1, -(-total_rows // page_size))
+    page = int(st.sidebar.number_input('Page', min_value=1, max_value=pages, value=1))
+    st.sidebar.caption(f'{pages} pages, {total_rows} rows')
+    return page - 1, page_size
+
+@st.cache_resource
+def get_job_executor():
+    """ Pool shared by every session; identical analyses of the same upload run once. """
+    return JobExecutor()
+
+def session_id():
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+def run_in_background(module, key, compute):
+    """ Run compute on the shared job pool; returns its result once finished, else None and shows progress.
+
+    Changing the selection (a new key) releases the module's previous job, which is
+    cancelled unless another session is waiting for the same result.
+    """
+    executor = get_job_executor()
+    active = st.session_state.setdefault('active_jobs', {})
+    if active.get(module) not in (None, key):
+        executor.release(active[module], session_id())
+    active[module] = key
+    session = session_id()
+
+    def recorded():
+        # Stages the job runs on the pool are attributed to the session that submitted it
+        with RECORDER.session(session):
+            return compute()
+
+    job = executor.submit(key, recorded, owner=session)
+    if job.state == 'failed':
+        st.error(f"Analysis failed: {job.future.exception()}")
+        # The failed job is kept, so reruns show this error rather than running the analysis again
+        if not st.button('Retry', key=f'retry_{module}'):
+            return None
+        job = executor.submit(key, recorded, owner=session, retry=True)
+    if not job.done():
+        job_progress(module, job)
+        return None
+    if job.state == 'cancelled':
+        st.warning("Analysis cancelled.")
+        return None
+    return job.result()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(module, job):
+    """ Progress of a running job, refreshed on its own; the page reruns once the job finishes. """
+    if job.done():
+        st.rerun()
+    st.progress(job.progress, text=job.message or f'Analysis {job.state}...')
+    if st.button('Cancel', key=f'cancel_{module}'):
+        get_job_executor().release(job.key, session_id())
+        st.session_state.pop('analyzed_module', None)
+        st.rerun()
+
+def analyze_button(label, module):
+    """ Button whose pressed state survives reruns, so paging keeps the results on screen. """
+    if st.button(label):
+        st.session_state['analyzed_module'] = module
+    return st.session_state.get('analyzed_module') == module
+
+def download_result(result, module, name='report'):
+    """ Download button for a result; the file is encoded only when the button is clicked. """
+    fmt = st.selectbox('Download format', available_formats(), key=f'export_format_{module}_{name}')
+    extension, mime = EXPORT_FORMATS[fmt]
+    st.download_button('Download', data=lambda: export_bytes(result, fmt),
+                       file_name=f"{module.lower().replace(' ', '_')}_{name}{extension}", mime=mime,
+                       key=f'download_{module}_{name}')
+
+def diagnostics_enabled():
+    """ Sidebar switch for per-stage timing; memory tracing is opt-in because it slows processing.
+
+    The recorder is shared by every session; each one only adds or withdraws its own request.
+    """
+    if not st.sidebar.checkbox('Diagnostics'):
+        RECORDER.disable(owner=session_id())
+        return False
+    trace_memory = st.sidebar.checkbox('Trace peak memory')
+    RECORDER.enable(trace_memory=trace_memory, owner=session_id())
+    return True
+
+def diagnostics_panel():
+    """ This session's stage timings, with JSON export; the Prometheus export covers the whole process. """
+    with st.sidebar.expander('Stage metrics', expanded=True):
+        metrics = RECORDER.to_frame(session=session_id())
+        if metrics.empty:
+            st.caption('No stages recorded yet.')
+            return
+        st.dataframe(metrics.drop(columns=['session', 'timestamp']))
+        st.caption(f'Derived columns held for {len(DERIVED)} datasets: {DERIVED.nbytes() / 2**20:.1f} MiB')
+        registry = get_dataset_registry().stats()
+        st.caption(f"Shared datasets: {registry['datasets']} ({registry['in_use']} in use), "
+                   f"{registry['bytes'] / 2**20:.1f} MiB, {registry['evictions']} evicted")
+        st.caption('Strategies loaded: ' + ', '.join(f'{name} ({seconds * 1000:.0f} ms)'
+                                                      for name, seconds in STRATEGIES.load_seconds.items()))
+        st.download_button('Export JSON', RECORDER.to_json(session=session_id()), file_name='erp_metrics.json',
+                           mime='application/json')
+        st.download_button('Export Prometheus', RECORDER.to_prometheus(), file_name='erp_metrics.prom',
+                           mime='text/plain')
+        if st.button('Clear metrics'):
+            RECORDER.clear(session=session_id())
+
+def projected_view(module, data_file, cache, digest):
+    """ Analysis that parses only the selected columns of the upload, through a QueryPlan. """
+    plan = QueryPlan(data_file, load_strategy(module), schema=SCHEMAS.get(module))
+    header = cache.get_or_compute(make_key(digest, module, 'header'), plan.header)
+    columns = st.multiselect('Select Columns', header, default=header)
+    if not columns:
+        return
+    plan = plan.select(columns)
+    # Projected scan, shared by every page and rerun with the same column selection
+    df = cache.get_or_compute(make_key(digest, module, 'scan', columns), plan.scan)
+    if df is None:
+        return
+    page, page_size = page_controls(len(df))
+    if analyze_button('Process Data', module):
+        sort_index = cache.get_or_compute(make_key(digest, module, 'sort_index', columns), lambda: SortIndex(df))
+        processed_data = run_in_background(
+            module, make_key(digest, module, 'process', columns, page, page_size),
+            lambda: plan.sort(columns[0], page=page, page_size=page_size).collect(df, sort_index=sort_index))
+        if processed_data is None:
+            return
+        if not processed_data.empty:
+            st.table(processed_data)
+            download_result(processed_data, module)
+        else:
+            st.error("No data available after processing.")
+
+def _build_rollups(plan):
+    data = plan.scan()
+    return None if data is None else HRRollups(data)
+
+def hr_rollups_view(data_file, cache, digest):
+    """ Workforce rollups over department and manager indexes built once per upload. """
+    strategy = load_strategy('HR')
+    plan = QueryPlan(data_file, strategy, schema=SCHEMAS['HR']).select(ROLLUP_COLUMNS)
+    try:
+        # Only the rollup columns are parsed; the indexes and every computed rollup are kept per upload
+        rollups = cache.get_or_compute(make_key(digest, 'HR', 'rollups'), lambda: _build_rollups(plan))
+    except ValueError as e:
+        st.error(f"Workforce rollups are not available for this file: {e}")
+        return
+    if rollups is None:
+        return
+    rollup = st.selectbox('Rollup', list(ROLLUPS), format_func=lambda name: name.replace('_', ' ').capitalize())
+    department = st.selectbox('Department', ['All'] + rollups.departments.tolist())
+    manager = st.selectbox('Manager', ['All'] + rollups.managers.tolist(),
+                           format_func=lambda id: id if id == 'All' else f'{id} - {rollups.manager_names[id]}')
+    filters = {'department': None if department == 'All' else department,
+               'manager': None if manager == 'All' else manager}
+    if analyze_button('Compute Rollup', 'HR'):
+        processed_data = strategy.process_rollups(rollups, rollup=rollup, **filters)
+        if not processed_data.empty:
+            st.dataframe(processed_data)
+            download_result(processed_data, 'HR', rollup)
+        else:
+            st.error("No employees match this department and manager.")
+        if (filters['department'] or filters['manager']) and st.checkbox('Show employees'):
+            # Drill-down rows are taken by position from the scanned columns
+            st.dataframe(rollups.drill_down(**filters))
+
+def supply_chain_analytics(df, cache, digest):
+    """ Item margins, vendor rollups and joins against a second file, served from indexes built once per upload. """
+    strategy = load_strategy('Supply Chain')
+    try:
+        index = cache.get_or_compute(make_key(digest, 'Supply Chain', 'index'), lambda: SupplyChainIndex(df))
+    except ValueError as e:
+        st.error(f"Vendor analytics are not available for this file: {e}")
+        return
+    analysis = st.selectbox('Analysis', ['items', 'vendors', 'join'],
+                            format_func={'items': 'Item margins', 'vendors': 'Vendor rollup',
+                                         'join': 'Join a purchases file'}.get)
+    params = {'analysis': analysis}
+    if analysis == 'items':
+        brand = st.text_input('Brand (optional)')
+        vendor = st.selectbox('Vendor', ['All'] + index.vendors.keys.tolist())
+        params['brand'] = int(brand) if brand.strip().isdigit() else None
+        params['vendor'] = None if vendor == 'All' else vendor
+    elif analysis == 'join':
+        other_file = st.file_uploader("Upload the file to join", type=["csv"], key='join_file')
+        if other_file is None:
+            return
+        other = cache.get_or_compute(make_key(digest, 'Supply Chain', 'join_file', other_file.file_id),
+                                     lambda: DataIngestionContext.for_file(other_file).ingest_data(other_file))
+        if other is None:
+            return
+        params['on'] = st.selectbox('Join on', [key for key in JOIN_KEYS if key in other.columns] or list(JOIN_KEYS))
+        params['other'] = other
+    if analyze_button('Analyze Supply Chain Data', 'Supply Chain'):
+        try:
+            processed_data = strategy.process_index(index, **params)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.dataframe(processed_data)
+        download_result(processed_data, 'Supply Chain', analysis)
+
+def finance_cube_view(df, cache, digest):
+    """ Rollups, slices and drill-downs of Sales, COGS and Profit from a cube built once per upload. """
+    try:
+        cube = cache.get_or_compute(make_key(digest, 'Finance', 'cube'), lambda: FinanceCube(df))
+    except ValueError as e:
+        st.error(f"The finance cube is not available for this file: {e}")
+        return
+    by = st.multiselect('Group by', list(FINANCE_DIMENSIONS), default=['Year'])
+    filters = {}
+    with st.expander('Slice'):
+        for dim in FINANCE_DIMENSIONS:
+            values = st.multiselect(dim, cube.values(dim))
+            if values:
+                filters[dim] = values
+    drill = st.selectbox('Drill down by', ['None'] + [dim for dim in FINANCE_DIMENSIONS if dim not in by])
+    if analyze_button('Analyze Finance Data', 'Finance'):
+        processed_data = load_strategy('Finance').process_cube(
+            cube, by=by, filters=filters, drill_down=None if drill == 'None' else drill)
+        if not processed_data.empty:
+            st.dataframe(processed_data)
+            download_result(processed_data, 'Finance', 'cube')
+        else:
+            st.error("No data in this slice.")
 
 def main():
+    # Stages run by this script run are attributed to its session
+    with RECORDER.session(session_id()):
+        app()
+
+def app():
     st.title('Data Processing Application')
-    module = st.sidebar.selectbox('Select a Module', ['HR', 'Finance', 'Sales', 'Supply Chain', 'CRM'])
-    data_file = st.sidebar.file_uploader("Upload your CSV file", type=["csv"])
+    module = st.sidebar.selectbox('Select a Module', STRATEGIES.names())
+    data_file = st.sidebar.file_uploader("Upload your CSV or JSON file",
+                                         type=["csv"] + [extension[1:] for extension in JSON_EXTENSIONS])
+    diagnostics = diagnostics_enabled()
 
     if data_file is not None:
-        ingestion_context = CSVDataIngestion()
-        # Ingest data using the strategy
-        df = ingestion_context.ingest_data(data_file)
+        cache = get_session_cache()
+        digest = cache.digest_for(data_file)
+        # A new upload invalidates everything memoized for the previous one
+        cache.bind_dataset(digest)
+
+        if module == 'HR':
+            # HR files are wide and most views need a few columns; parse only the selected ones
+            if st.sidebar.radio('HR view', ['Columns', 'Workforce rollups']) == 'Columns':
+                projected_view(module, data_file, cache, digest)
+            else:
+                hr_rollups_view(data_file, cache, digest)
+            df = None
+        else:
+            # CSV or JSON / NDJSON strategy, chosen from the upload's name
+            ingestion_context = DataIngestionContext.for_file(data_file, schema=SCHEMAS.get(module),
+                                                              cache=get_dataset_cache())
+            # Ingest data using the strategy; sessions with the same upload share one copy through the registry
+            # The view is pinned, so later results keyed on the dataset keep seeing the same frame
+            df = cache.get_or_compute(make_key(digest, module, 'ingest'),
+                                      lambda: get_dataset_registry().acquire(
+                                          (digest, module), lambda: ingestion_context.ingest_data(data_file)),
+                                      shared=True)
 
         if df is not None:
             strategy = load_strategy(module)
-            if module == 'Supply Chain':
+            # Per-column sort permutations, reused when switching 'Sort by' or paging
+            sort_index = cache.get_or_compute(make_key(digest, module, 'sort_index'), lambda: SortIndex(df))
+            if module == 'Supply Chain' and st.sidebar.radio('Supply chain view', ['Columns', 'Vendor analytics']) \
+                    == 'Vendor analytics':
+                supply_chain_analytics(df, cache, digest)
+
+            elif module == 'Supply Chain':
                 # Specific handling for Supply Chain data
                 selected_columns = st.multiselect('Select Columns', df.columns.tolist(), default=df.columns.tolist())
                 sort_by = st.selectbox('Sort by', selected_columns)
-                if st.button('Analyze Supply Chain Data'):
-                    processed_data = strategy.process_data(df, columns=selected_columns, sort_by=sort_by)
-                    st.dataframe(processed_data)
+                page, page_size = page_controls(len(df))
+                if analyze_button('Analyze Supply Chain Data', module):
+                    processed_data = run_in_background(
+                        module, make_key(digest, module, 'process', selected_columns, sort_by, page, page_size),
+                        lambda: strategy.process_data(df, columns=selected_columns, sort_by=sort_by, page=page,
+                                                      page_size=page_size, sort_index=sort_index))
+                    if processed_data is not None:
+                        st.dataframe(processed_data)
+                        download_result(processed_data, module)
 
             elif module == 'Sales':
-                period = st.sidebar.selectbox('Choose the analysis period', ['weekly', 'monthly'])
-                if st.button('Analyze Sales'):
-                    fig, processed_data = strategy.process_data(df, period=period)
-                    if fig:
-                        st.pyplot(fig)
-                    if not processed_data.empty:
-                        st.write(f'{period.capitalize()} Sales Data:', processed_data)
-                    else:
-                        st.error("No data available for this period.")
+                period = st.sidebar.selectbox('Choose the analysis period',
+                                              ['daily', 'weekly', 'monthly', 'quarterly', 'yearly'], index=1)
+                if analyze_button('Analyze Sales', module):
+                    # The chart renders on the chart cache's thread while the job prepares the table;
+                    # strategies leave the memoized frame untouched, derived columns live in a side cache
+                    def analyze_sales():
+                        chart = strategy.chart_png(df, period)
+                        return chart.result(), strategy.prepare_data(df)
+
+                    result = run_in_background(module, make_key(digest, module, 'analyze', period), analyze_sales)
+                    if result is not None:
+                        png, processed_data = result
+                        st.image(png)
+                        if not processed_data.empty:
+                            st.write(f'{period.capitalize()} Sales Data:', processed_data)
+                            download_result(processed_data, module, period)
+                        else:
+                            st.error("No data available for this period.")
 
 
             elif module == 'CRM':
 
                 # Handling for CRM with specific column selections
 
-                columns = st.multiselect('Select Columns', df.columns.tolist(),
+                # The cube is built once per upload and answers country/year lookups without rescanning
+                cube = cache.get_or_compute(make_key(digest, module, 'cube'), lambda: CRMCube(df))
+                options = df.columns.tolist() + (['year'] if 'year' not in df.columns else [])
+                columns = st.multiselect('Select Columns', options,
                                          default=['invoiceID', 'invoice_date', 'customerID', 'country', 'quantity',
                                                   'amount'])
 
-                country = st.selectbox('Filter by Country (Optional):',
-                                       ['All'] + sorted(df['country'].dropna().unique().tolist()))
+                countries = cube.countries.tolist()
+                country = st.selectbox('Filter by Country (Optional):', ['All'] + countries)
 
-                if country != 'All':
-                    df = df[df['country'] == country]  # Apply country filter before passing to strategy
+                if country != 'All' and not CRMCube.supports(columns):
+                    # Apply country filter before passing to strategy
+                    df = cache.get_or_compute(make_key(digest, module, 'filter', country),
+                                              lambda: df.take(cube.rows_for(country)))
 
-                if st.button('Analyze CRM Data'):
+                if analyze_button('Analyze CRM Data', module):
 
-                    processed_data = strategy.process_data(df, columns=columns)
+                    if CRMCube.supports(columns):
+                        processed_data = strategy.process_cube(
+                            cube, columns=columns, country=None if country == 'All' else country)
+                    elif 'year' in columns:
+                        # Yearly totals merge batch by batch, so the job reports progress and can stop early
+                        processed_data = run_in_background(
+                            module, make_key(digest, module, 'process', columns, country),
+                            lambda: strategy.process_chunks(tracked(frame_chunks(df), len(df)), columns=columns))
+                    else:
+                        processed_data = run_in_background(
+                            module, make_key(digest, module, 'process', columns, country),
+                            lambda: strategy.process_data(df, columns=columns))
 
-                    if not processed_data.empty:
+                    if processed_data is not None and not processed_data.empty:
 
                         st.write("Aggregated CRM Data:", processed_data)
+                        download_result(processed_data, module)
 
-                    else:
+                    elif processed_data is not None:
 
                         st.error("No data available after filtering. Please adjust your selections.")
 
+            elif module == 'Finance' and st.sidebar.radio('Finance view', ['Columns', 'Cube']) == 'Cube':
+                finance_cube_view(df, cache, digest)
+
             elif module == 'Finance':
                 selected_columns = st.multiselect('Select Columns', df.columns.tolist(), default=df.columns.tolist())
                 sort_by = st.selectbox('Sort by', selected_columns)
-                if st.button('Analyze Finance Data'):
-                    # Process and display finance data
-                    processed_data = strategy.process_data(df, columns=selected_columns, sort_by=sort_by)
-                    st.dataframe(processed_data)
+                page, page_size = page_controls(len(df))
+                if analyze_button('Analyze Finance Data', module):
+                    # Process and display one page of finance data
+                    processed_data = run_in_background(
+                        module, make_key(digest, module, 'process', selected_columns, sort_by, page, page_size),
+                        lambda: strategy.process_data(df, columns=selected_columns, sort_by=sort_by, page=page,
+                                                      page_size=page_size, sort_index=sort_index))
+                    if processed_data is not None:
+                        st.dataframe(processed_data)
+                        download_result(processed_data, module)
 
             else:
-                # General handling for other modules
-                columns = st.multiselect('Select Columns', df.columns.tolist(), default=df.columns.tolist())
-                if st.button('Process Data'):
-                    processed_data = strategy.process_data(df, columns=columns)
-                    if not processed_data.empty:
-                        st.table(processed_data)
-                    else:
-                        st.error("No data available after processing.")
+                # Modules added through strategy_registry entry points get a plain column view
+                selected_columns = st.multiselect('Select Columns', df.columns.tolist(), default=df.columns.tolist())
+                if analyze_button('Process Data', module):
+                    processed_data = run_in_background(
+                        module, make_key(digest, module, 'process', selected_columns),
+                        lambda: strategy.process_data(df[selected_columns]))
+                    if processed_data is not None:
+                        st.dataframe(processed_data)
+                        download_result(processed_data, module)
+
+    if diagnostics:
+        diagnostics_panel()
 
 
 if __name__ == "__main__":
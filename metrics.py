@@ -0,0 +1,261 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Most recent stage records kept in memory
+DEFAULT_MAX_RECORDS = 10_000
+# Seconds after which an owner that stopped renewing its enable() no longer keeps recording on
+DEFAULT_OWNER_TIMEOUT = 3600
+
+
+def _frame_of(value):
+    if isinstance(value, tuple):
+        value = next((item for item in value if isinstance(item, (pd.DataFrame, pd.Series))), None)
+    return value if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+def count_rows(value):
+    """Row count of a DataFrame result, or of the frame in a (figure, DataFrame) tuple."""
+    frame = _frame_of(value)
+    return None if frame is None else len(frame)
+
+
+def result_bytes(value):
+    """Shallow memory footprint of a DataFrame result; columns shared with the input are counted too."""
+    frame = _frame_of(value)
+    if frame is None:
+        return None
+    usage = frame.memory_usage(index=True)
+    return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+
+
+class StageMetrics:
+    """Mutable handle for the stage being timed; callers may set rows_in and rows_out."""
+
+    def __init__(self, component, stage, rows_in=None):
+        self.component = component
+        self.stage = stage
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.result_bytes = None
+
+
+class MetricsRecorder:
+    """Records wall time, rows in/out and peak memory per processing stage.
+
+    Stages nest: a sub-stage opened inside process_data is recorded as
+    'process_data/groupby'. Recording is off until enable() is called; peak
+    memory is measured with tracemalloc only when trace_memory is requested,
+    since tracing slows allocation-heavy code down.
+
+    One recorder serves the whole process, so each owner (e.g. a Streamlit
+    session) enables it for itself: it records while any owner wants it and
+    traces memory while any owner asks for tracing. Owners that stop renewing
+    their request are dropped after owner_timeout seconds. Stages run inside
+    session(name) are tagged with that name, so each owner can read its own.
+    """
+
+    def __init__(self, max_records=DEFAULT_MAX_RECORDS, owner_timeout=DEFAULT_OWNER_TIMEOUT):
+        self.enabled = False
+        self.trace_memory = False
+        self.owner_timeout = owner_timeout
+        self.records = deque(maxlen=max_records)
+        # Owner -> (trace_memory, time of its last enable())
+        self._owners = {}
+        # When the least recently renewed owner expires
+        self._expires = float('inf')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _update(self):
+        # Called with the lock held; also drops owners that expired, e.g. sessions closed with diagnostics on
+        now = time.monotonic()
+        for owner, (_, seen) in list(self._owners.items()):
+            if now - seen > self.owner_timeout:
+                del self._owners[owner]
+        self._expires = min((seen + self.owner_timeout for _, seen in self._owners.values()), default=float('inf'))
+        trace_memory = any(trace for trace, _ in self._owners.values())
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not trace_memory and self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = bool(self._owners)
+        self.trace_memory = trace_memory
+
+    def enable(self, trace_memory=False, owner=None):
+        """Record stages for owner until it calls disable(); call again to renew or change trace_memory."""
+        with self._lock:
+            self._owners[owner] = (trace_memory, time.monotonic())
+            self._update()
+
+    def disable(self, owner=None):
+        """Withdraw owner's request; recording stops once no owner wants it."""
+        with self._lock:
+            self._owners.pop(owner, None)
+            # Sessions that never enabled call this on every rerun, which is when expired owners are purged
+            self._update()
+
+    @contextmanager
+    def session(self, name):
+        """Tag the stages this thread runs in the block with name."""
+        previous = getattr(self._local, 'session', None)
+        self._local.session = name
+        try:
+            yield
+        finally:
+            self._local.session = previous
+
+    def _records(self, session):
+        # Called with the lock held
+        return [record for record in self.records if session is None or record['session'] == session]
+
+    def clear(self, session=None):
+        """Drop the records of session, or all records."""
+        with self._lock:
+            kept = [] if session is None else [record for record in self.records if record['session'] != session]
+            self.records.clear()
+            self.records.extend(kept)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, component, stage, rows_in=None):
+        """Time the enclosed block as one stage of component (a name, an object or None)."""
+        if self.enabled and time.monotonic() > self._expires:
+            with self._lock:
+                self._update()
+        if not self.enabled:
+            yield StageMetrics(component, stage, rows_in)
+            return
+        stack = self._stack()
+        if component is None:
+            # Helpers without an owner report under the enclosing stage's component
+            component = stack[-1]['component'] if stack else 'unknown'
+        elif not isinstance(component, str):
+            component = type(component).__name__
+        metrics = StageMetrics(component, stage, rows_in)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        frame = {'name': stage, 'component': component, 'peak': 0, 'start': 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Keep the parent's peak before resetting it for this stage
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start'] = current
+        stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            seconds = time.perf_counter() - started
+            stack.pop()
+            peak_bytes = None
+            if tracing:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+                peak_bytes = max(peak - frame['start'], 0)
+            record = {
+                'component': metrics.component,
+                'stage': '/'.join([item['name'] for item in stack] + [stage]),
+                'seconds': seconds,
+                'rows_in': metrics.rows_in,
+                'rows_out': metrics.rows_out,
+                'peak_memory_bytes': peak_bytes,
+                'result_bytes': metrics.result_bytes,
+                'session': getattr(self._local, 'session', None),
+                'timestamp': time.time(),
+            }
+            with self._lock:
+                self.records.append(record)
+
+    def to_frame(self, session=None):
+        """Records of session, or all records, as a DataFrame."""
+        with self._lock:
+            return pd.DataFrame(self._records(session),
+                                columns=['component', 'stage', 'seconds', 'rows_in', 'rows_out', 'peak_memory_bytes',
+                                         'result_bytes', 'session', 'timestamp'])
+
+    def to_json(self, session=None):
+        with self._lock:
+            return json.dumps(self._records(session), indent=2)
+
+    def to_prometheus(self):
+        """Aggregate the records into Prometheus text exposition format."""
+        totals = {}
+        with self._lock:
+            for record in self.records:
+                key = (record['component'], record['stage'])
+                entry = totals.setdefault(key, {'calls': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0, 'peak': 0,
+                                                'result': 0})
+                entry['calls'] += 1
+                entry['seconds'] += record['seconds']
+                entry['rows_in'] += record['rows_in'] or 0
+                entry['rows_out'] += record['rows_out'] or 0
+                entry['peak'] = max(entry['peak'], record['peak_memory_bytes'] or 0)
+                entry['result'] = max(entry['result'], record['result_bytes'] or 0)
+
+        metrics = [
+            ('erp_stage_calls_total', 'counter', 'Number of times the stage ran.', 'calls'),
+            ('erp_stage_seconds_total', 'counter', 'Wall time spent in the stage.', 'seconds'),
+            ('erp_stage_rows_in_total', 'counter', 'Rows passed into the stage.', 'rows_in'),
+            ('erp_stage_rows_out_total', 'counter', 'Rows produced by the stage.', 'rows_out'),
+            ('erp_stage_peak_memory_bytes', 'gauge', 'Largest traced memory growth during the stage.', 'peak'),
+            ('erp_stage_result_bytes', 'gauge', 'Largest result returned by the stage.', 'result'),
+        ]
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (component, stage), entry in sorted(totals.items()):
+                labels = f'component="{_escape(component)}",stage="{_escape(stage)}"'
+                lines.append(f'{name}{{{labels}}} {entry[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def export_json(self, path):
+        with open(path, 'w') as file:
+            file.write(self.to_json())
+
+    def export_prometheus(self, path):
+        with open(path, 'w') as file:
+            file.write(self.to_prometheus())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide recorder used by DataProcessor and DataIngestionStrategy
+RECORDER = MetricsRecorder()
+
+
+def stage(component, name, rows_in=None):
+    """Shortcut for RECORDER.stage."""
+    return RECORDER.stage(component, name, rows_in)
+
+
+def instrumented(method):
+    """Wrap a process_data/ingest_data style method in a stage named after it."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not RECORDER.enabled:
+            return method(self, *args, **kwargs)
+        rows_in = count_rows(args[0]) if args else None
+        with RECORDER.stage(self, method.__name__, rows_in) as metrics:
+            result = method(self, *args, **kwargs)
+            if not hasattr(result, '__next__'):
+                metrics.rows_out = count_rows(result)
+                metrics.result_bytes = result_bytes(result)
+            return result
+    wrapper.__instrumented__ = True
+    return wrapper
@@ -0,0 +1,133 @@
+import operator
+
+from DataIngection import CSVDataIngestion, DEFAULT_CHUNK_SIZE, JSONDataIngestion, _concat, is_json
+from schemas import normalize_header
+
+# Comparison operators accepted by QueryPlan.where
+FILTER_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda series, values: series.isin(values),
+}
+
+
+class QueryPlan:
+    """Lazily composed scan + strategy call over one CSV or JSON / NDJSON source.
+
+    select, where, sort and params each return a new plan; nothing is read
+    until scan() or collect(). Execution pushes the plan into the reader: only
+    the columns needed by the selection, the filters, the sort key and the
+    strategy's required_columns are parsed (with the schema's dtypes), and
+    filters are applied batch by batch so rejected rows are never accumulated.
+    """
+
+    def __init__(self, source, strategy, schema=None, chunksize=DEFAULT_CHUNK_SIZE):
+        self.source = source
+        self.strategy = strategy
+        self.schema = schema
+        self.chunksize = chunksize
+        self.columns = None
+        self.filters = ()
+        self.sort_by = None
+        self.sort_options = {}
+        self.strategy_params = {}
+
+    def _derive(self, **changes):
+        plan = object.__new__(QueryPlan)
+        plan.__dict__.update(self.__dict__, **changes)
+        return plan
+
+    def select(self, columns):
+        return self._derive(columns=list(columns))
+
+    def where(self, column, value, op='=='):
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator '{op}', expected one of: {', '.join(FILTER_OPERATORS)}")
+        return self._derive(filters=self.filters + ((column, op, value),))
+
+    def sort(self, by, top_n=None, page=None, page_size=None):
+        options = {key: value for key, value in (('top_n', top_n), ('page', page), ('page_size', page_size))
+                   if value is not None}
+        return self._derive(sort_by=by, sort_options=options)
+
+    def params(self, **params):
+        """Extra strategy keyword arguments, such as period for SalesStrategy."""
+        return self._derive(strategy_params={**self.strategy_params, **params})
+
+    def _reader(self):
+        if is_json(self.source):
+            return JSONDataIngestion(schema=self.schema)
+        return CSVDataIngestion(schema=self.schema)
+
+    def header(self):
+        """Normalized column names of the source."""
+        return [normalize_header(raw) for raw in self._reader().read_header(self.source)]
+
+    def scan_columns(self, header=None):
+        """The source columns the plan needs, in file order; None means every column."""
+        if self.columns is None:
+            return None
+        header = self.header() if header is None else header
+        derived = getattr(self.strategy, 'derived_columns', set())
+        unknown = [col for col in self.columns if col not in header and col not in derived]
+        unknown += [col for col, _, _ in self.filters if col not in header]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        needed = set(self.columns) | {col for col, _, _ in self.filters}
+        needed |= getattr(self.strategy, 'required_columns', set())
+        if self.sort_by is not None:
+            needed.add(self.sort_by)
+        return [col for col in header if col in needed]
+
+    def _filtered(self, data):
+        mask = None
+        for column, op, value in self.filters:
+            matches = FILTER_OPERATORS[op](data[column], value)
+            mask = matches if mask is None else mask & matches
+        return data if mask is None else data[mask.fillna(False).to_numpy(dtype=bool)]
+
+    def scan(self):
+        """Read the projected, filtered source into a DataFrame."""
+        columns = self.scan_columns()
+        reader = self._reader()
+        if not self.filters:
+            return reader.ingest_data(self.source, columns=columns)
+        # Concatenated as ingest_data does, so categorical columns keep their dtype across batches
+        return _concat(self._filtered(chunk) for chunk in reader.iter_chunks(self.source, self.chunksize, columns))
+
+    def strategy_kwargs(self):
+        kwargs = dict(self.strategy_params)
+        if self.columns is not None:
+            kwargs['columns'] = list(self.columns)
+        if self.sort_by is not None:
+            kwargs['sort_by'] = self.sort_by
+        kwargs.update(self.sort_options)
+        return kwargs
+
+    def collect(self, data=None, **kwargs):
+        """Execute the plan; data reuses an earlier scan() result, kwargs are passed to the strategy."""
+        if data is None:
+            data = self.scan()
+        if data is None:
+            return None
+        return self.strategy.process_data(data, **{**self.strategy_kwargs(), **kwargs})
+
+    def explain(self):
+        """Human-readable description of what collect() will read and run."""
+        header = self.header()
+        columns = self.scan_columns(header)
+        source_format = 'JSON' if is_json(self.source) else 'CSV'
+        lines = [f"Scan {source_format}: {getattr(self.source, 'name', self.source)}"]
+        if columns is None:
+            lines.append(f"  columns: all {len(header)}")
+        else:
+            lines.append(f"  columns: {', '.join(columns)} ({len(columns)} of {len(header)})")
+        for column, op, value in self.filters:
+            lines.append(f"  filter: {column} {op} {value!r}")
+        arguments = ', '.join(f'{key}={value!r}' for key, value in self.strategy_kwargs().items())
+        lines.append(f"Process: {type(self.strategy).__name__}({arguments})")
+        return '\n'.join(lines)
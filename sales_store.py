@@ -0,0 +1,75 @@
+import sqlite3
+
+import pandas as pd
+
+from data_processor import aggregate_sales
+from derived_columns import with_columns
+
+# Periods materialized by the store and their bucket column
+STORE_PERIODS = {'weekly': 'week', 'monthly': 'month'}
+
+
+class SalesAggregateStore:
+    """Persistent weekly and monthly sales totals that grow with appended order batches.
+
+    Each append aggregates only the new batch and adds its totals into the
+    affected (year, period) buckets with an upsert, so refresh cost depends on
+    the batch size, not on the total history. Queries read the stored buckets.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            for period, column in STORE_PERIODS.items():
+                self.connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS sales_{period} ('
+                    f'year INTEGER NOT NULL, {column} INTEGER NOT NULL, '
+                    f'quantity NUMERIC NOT NULL, revenue REAL NOT NULL, '
+                    f'PRIMARY KEY (year, {column}))')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS applied_batches (batch_id TEXT PRIMARY KEY)')
+
+    def append(self, orders, batch_id=None):
+        """Merge a batch of order lines into the stored buckets.
+
+        If batch_id is given and was already applied, the batch is skipped and
+        False is returned, so re-running a daily load cannot double count.
+        """
+        with self.connection:
+            if batch_id is not None:
+                try:
+                    self.connection.execute('INSERT INTO applied_batches VALUES (?)', (str(batch_id),))
+                except sqlite3.IntegrityError:
+                    return False
+            # Parse dates once for both periods
+            orders = with_columns(orders, {'Order Date': pd.to_datetime(orders['Order Date'])})
+            for period, column in STORE_PERIODS.items():
+                totals = aggregate_sales(orders, period)
+                rows = zip(totals['year'].astype(int).tolist(), totals[column].astype(int).tolist(),
+                           totals['Quantity Ordered'].tolist(), totals['Revenue'].astype(float).tolist())
+                self.connection.executemany(
+                    f'INSERT INTO sales_{period} (year, {column}, quantity, revenue) VALUES (?, ?, ?, ?) '
+                    f'ON CONFLICT (year, {column}) DO UPDATE SET '
+                    f'quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue',
+                    rows)
+        return True
+
+    def query(self, period='monthly', start_year=None, end_year=None):
+        """Return stored totals for period as year, bucket, 'Quantity Ordered' and 'Revenue' columns."""
+        if period not in STORE_PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of: {', '.join(STORE_PERIODS)}")
+        column = STORE_PERIODS[period]
+        sql = f'SELECT year, {column}, quantity, revenue FROM sales_{period} WHERE 1 = 1'
+        params = []
+        if start_year is not None:
+            sql += ' AND year >= ?'
+            params.append(start_year)
+        if end_year is not None:
+            sql += ' AND year <= ?'
+            params.append(end_year)
+        sql += f' ORDER BY year, {column}'
+        result = pd.read_sql_query(sql, self.connection, params=params)
+        return result.rename(columns={'quantity': 'Quantity Ordered', 'revenue': 'Revenue'})
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,169 @@
+import pandas as pd
+
+
+def normalize_header(name):
+    """Strip padding and collapse inner whitespace in a column name (' Units Sold ' -> 'Units Sold')."""
+    return ' '.join(str(name).split())
+
+
+def _is_number(series):
+    # Columns a JSON reader already parsed as numbers; a round trip through str would mangle them
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+def parse_currency(series):
+    """Vectorized conversion of accounting strings such as '$1,618.50 ', '-$4,533.75' or ' $-   ' to floats.
+
+    Numeric series are returned unchanged.
+    """
+    if _is_number(series):
+        return series
+    text = series.astype(str).str.replace(r'[\s$,]', '', regex=True)
+    values = pd.to_numeric(text, errors='coerce')
+    # Accounting style: a lone dash means zero and parentheses mean negative.
+    # Only the cells that failed to parse are revisited for these.
+    failed = values.isna() & series.notna()
+    if failed.any():
+        fixed = text[failed].str.replace(r'^-$', '0', regex=True).str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+        values[failed] = pd.to_numeric(fixed, errors='coerce')
+    return values
+
+
+def parse_decimal_comma(series):
+    """Vectorized conversion of decimal-comma strings such as '229,33' to floats.
+
+    Numeric series are returned unchanged.
+    """
+    if _is_number(series):
+        return series
+    text = series.astype(str).str.strip().str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(text, errors='coerce')
+
+
+class DataSchema:
+    """Column types and cleaning rules applied by CSVDataIngestion while parsing a module's file.
+
+    All column names refer to normalized headers. Plain dtypes and categories are
+    pushed into read_csv; currency, decimal-comma, padded-string and date columns
+    are converted with vectorized string operations right after parsing.
+    """
+
+    def __init__(self, dtypes=None, categories=(), currency=(), decimal_comma=(), numeric=(), strip=(),
+                 dates=None):
+        self.dtypes = dtypes or {}
+        self.categories = tuple(categories)
+        self.currency = tuple(currency)
+        self.decimal_comma = tuple(decimal_comma)
+        self.numeric = tuple(numeric)
+        self.strip = tuple(strip)
+        # Mapping of date column -> strptime format (None lets pandas infer it)
+        self.dates = dates or {}
+
+    def cache_token(self):
+        """Stable description of the schema, used to key cached parses."""
+        return repr((sorted((k, str(v)) for k, v in self.dtypes.items()), self.categories, self.currency,
+                     self.decimal_comma, self.numeric, self.strip, sorted(self.dates.items(), key=str)))
+
+    def read_options(self, raw_columns):
+        """Build the read_csv dtype mapping for a file whose header is raw_columns."""
+        dtype = {}
+        for raw in raw_columns:
+            name = normalize_header(raw)
+            if name in self.currency or name in self.decimal_comma or name in self.numeric:
+                # Read as text; converted in one vectorized pass by apply()
+                dtype[raw] = str
+            elif name in self.categories:
+                dtype[raw] = 'category'
+            elif name in self.dtypes:
+                dtype[raw] = self.dtypes[name]
+        return {'dtype': dtype}
+
+    def apply(self, df):
+        """Normalize headers and convert the parsed frame to the schema's types."""
+        df = df.rename(columns=normalize_header)
+        for col in self.currency:
+            if col in df.columns:
+                df[col] = parse_currency(df[col])
+        for col in self.decimal_comma:
+            if col in df.columns:
+                df[col] = parse_decimal_comma(df[col])
+        for col in self.numeric:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        for col in self.strip:
+            if col in df.columns:
+                df[col] = _strip(df[col])
+        for col, fmt in self.dates.items():
+            if col in df.columns:
+                parsed = pd.to_datetime(df[col], format=fmt, errors='coerce')
+                if fmt is not None and parsed.isna().all() and df[col].notna().any():
+                    # Export written in another layout; let pandas infer it instead
+                    parsed = pd.to_datetime(df[col], errors='coerce')
+                df[col] = parsed
+        return df
+
+
+def _strip(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        stripped = series.cat.categories.str.strip()
+        # Renaming the categories touches each distinct value once instead of every row
+        if stripped.is_unique:
+            return series.cat.rename_categories(stripped)
+        return series.astype(str).str.strip().astype('category')
+    return series.str.strip()
+
+
+HR_SCHEMA = DataSchema(
+    dtypes={
+        'EmpID': 'int32', 'MarriedID': 'int8', 'MaritalStatusID': 'int8', 'GenderID': 'int8',
+        'EmpStatusID': 'int8', 'DeptID': 'int8', 'PerfScoreID': 'int8', 'FromDiversityJobFairID': 'int8',
+        'Salary': 'int32', 'Termd': 'int8', 'PositionID': 'int16', 'Zip': 'int32', 'Age': 'int16',
+        'ManagerID': 'Int16', 'EngagementSurvey': 'float32', 'EmpSatisfaction': 'int8',
+        'SpecialProjectsCount': 'int16', 'DaysLateLast30': 'int16', 'Absences': 'int16',
+    },
+    categories=('Position', 'State', 'Sex', 'MaritalDesc', 'CitizenDesc', 'HispanicLatino', 'RaceDesc',
+                'TermReason', 'EmploymentStatus', 'Department', 'ManagerName', 'RecruitmentSource',
+                'PerformanceScore'),
+    strip=('Employee_Name', 'Position', 'Sex', 'Department', 'ManagerName'),
+    dates={'DOB': '%Y-%m-%d', 'DateofHire': '%Y-%m-%d', 'DateofTermination': '%Y-%m-%d',
+           'LastPerformanceReview_Date': '%Y-%m-%d'},
+)
+
+FINANCE_SCHEMA = DataSchema(
+    dtypes={'Month Number': 'int8', 'Year': 'int16'},
+    categories=('Segment', 'Country', 'Product', 'Discount Band', 'Month Name'),
+    currency=('Units Sold', 'Manufacturing Price', 'Sale Price', 'Gross Sales', 'Discounts', 'Sales', 'COGS',
+              'Profit'),
+    strip=('Product', 'Discount Band', 'Month Name'),
+    dates={'Date': '%d/%m/%Y'},
+)
+
+SALES_SCHEMA = DataSchema(
+    categories=('Product',),
+    # Monthly exports repeat their header row, so numeric fields are coerced
+    numeric=('Quantity Ordered', 'Price Each'),
+    dates={'Order Date': '%m/%d/%y %H:%M'},
+)
+
+SUPPLY_CHAIN_SCHEMA = DataSchema(
+    dtypes={'Brand': 'int32', 'Price': 'float64', 'Classification': 'int8', 'PurchasePrice': 'float64',
+            'VendorNumber': 'int32'},
+    categories=('Size', 'Volume', 'VendorName'),
+    strip=('VendorName',),
+)
+
+CRM_SCHEMA = DataSchema(
+    dtypes={'invoiceID': str, 'customerID': 'Int32', 'quantity': 'int32'},
+    categories=('country',),
+    decimal_comma=('amount',),
+    dates={'invoice_date': '%m/%d/%Y %H:%M'},
+)
+
+# Schemas keyed by the module names used in main.py
+SCHEMAS = {
+    'HR': HR_SCHEMA,
+    'Finance': FINANCE_SCHEMA,
+    'Sales': SALES_SCHEMA,
+    'Supply Chain': SUPPLY_CHAIN_SCHEMA,
+    'CRM': CRM_SCHEMA,
+}
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import file_digest
+
+# Bounds for one session's memoized results
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+
+def make_key(*parts):
+    """Build a hashable cache key, freezing lists, sets and dicts passed as parameters."""
+    def freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(v) for v in value)
+        if isinstance(value, set):
+            return tuple(sorted(freeze(v) for v in value))
+        return value
+    return freeze(parts)
+
+
+def _sizeof(value):
+    """Approximate in-memory size of a cached value.
+
+    DataFrames and arrays are counted, as are indexes and cubes through their
+    nbytes() method (which leaves out the dataset they were built from). Other
+    values, such as figures and widget options, count as 0 bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=False).sum())
+    if isinstance(value, tuple):
+        return sum(_sizeof(item) for item in value)
+    nbytes = getattr(value, 'nbytes', None)
+    if callable(nbytes):
+        return int(nbytes())
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    return 0
+
+
+class SessionCache:
+    """Memoizes ingestion, widget options and strategy outputs across Streamlit reruns.
+
+    Entries are keyed by (file digest, module, name, parameters) and evicted in
+    LRU order beyond max_entries or max_bytes. Shared entries, views of datasets
+    held by the process-wide registry, are neither counted nor evicted: the
+    registry owns their memory, and keeping them keeps the dataset (and every
+    result keyed on it) stable across reruns. Binding a new dataset digest drops
+    every entry computed for the previous upload.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.dataset = None
+        self._entries = OrderedDict()
+        self._shared = set()
+        self._digests = {}
+        self.hits = 0
+        self.misses = 0
+
+    def digest_for(self, data_file):
+        """Content digest of an upload, hashed once per uploaded file."""
+        upload_id = getattr(data_file, 'file_id', None) or (getattr(data_file, 'name', None),
+                                                            getattr(data_file, 'size', None))
+        if upload_id not in self._digests:
+            self._digests = {upload_id: file_digest(data_file)}
+        return self._digests[upload_id]
+
+    def bind_dataset(self, digest):
+        """Make digest the current dataset, invalidating results for any other upload."""
+        if digest != self.dataset:
+            self.invalidate()
+            self.dataset = digest
+
+    def invalidate(self):
+        self._entries.clear()
+        self._shared.clear()
+
+    def get_or_compute(self, key, compute, shared=False):
+        """Return the memoized value for key, calling compute() on a miss.
+
+        Pass shared=True for values owned by the dataset registry; they stay
+        until the dataset is invalidated.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        value = compute()
+        if value is not None:
+            self._entries[key] = value
+            if shared:
+                self._shared.add(key)
+            self._evict()
+        return value
+
+    def nbytes(self):
+        """Approximate size of the entries counted against max_bytes."""
+        return sum(_sizeof(value) for key, value in self._entries.items() if key not in self._shared)
+
+    def _evict(self):
+        # Sized now rather than when stored, as indexes and cubes grow on use;
+        # the newest entry is always kept, even if it alone exceeds max_bytes
+        newest = next(reversed(self._entries))
+        sizes = {key: _sizeof(value) for key, value in self._entries.items() if key not in self._shared}
+        total = sum(sizes.values())
+        for key, size in sizes.items():
+            if key == newest or (len(self._entries) <= self.max_entries and total <= self.max_bytes):
+                break
+            del self._entries[key]
+            total -= size
+
+    def __len__(self):
+        return len(self._entries)
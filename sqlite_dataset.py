@@ -0,0 +1,175 @@
+import datetime
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Columns indexed per module: the keys its strategy filters, groups or sorts by
+SQL_INDEXES = {
+    'HR': ('Department',),
+    'Finance': (),
+    'Sales': ('Order Date',),
+    'Supply Chain': ('Brand', 'VendorNumber'),
+    'CRM': ('country', 'invoice_date', 'customerID'),
+}
+
+# Filter operators accepted in (column, op, value) filters, as in query_plan.QueryPlan.where
+SQL_OPERATORS = {'==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', 'in': 'IN'}
+SQL_AGGREGATES = {'sum': 'SUM', 'mean': 'AVG', 'min': 'MIN', 'max': 'MAX', 'count': 'COUNT'}
+
+
+def quote(name):
+    """Quote a column name as an SQL identifier."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_year(column):
+    """SQL expression for the calendar year of a date column."""
+    return f"CAST(strftime('%Y', {quote(column)}) AS INTEGER)"
+
+
+def _param(value):
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return value.isoformat(sep=' ')
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class SQLiteDataset:
+    """A module's dataset stored in one SQLite table, queried without loading it.
+
+    Filters, sorts, paging and aggregations run as SQL, and only their results
+    are read into pandas. Date columns are stored as ISO text, so they sort and
+    compare correctly and are parsed back to datetimes when read.
+    """
+
+    def __init__(self, path, table='data', temporary=False):
+        self.path = path
+        self.table = table
+        # Remove the file on close(); set for stores created in the temp directory
+        self.temporary = temporary
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS dataset_dates (name TEXT PRIMARY KEY)')
+
+    @property
+    def columns(self):
+        rows = self.connection.execute(f'PRAGMA table_info({quote(self.table)})').fetchall()
+        return [row[1] for row in rows]
+
+    @property
+    def date_columns(self):
+        return {row[0] for row in self.connection.execute('SELECT name FROM dataset_dates')}
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return self.connection.execute(f'SELECT COUNT(*) FROM {quote(self.table)}').fetchone()[0]
+
+    def drop(self):
+        with self.connection:
+            self.connection.execute(f'DROP TABLE IF EXISTS {quote(self.table)}')
+            self.connection.execute('DELETE FROM dataset_dates')
+
+    def append(self, chunk):
+        """Bulk insert a batch of rows; the table is created from the first batch."""
+        dates = [col for col in chunk.columns if pd.api.types.is_datetime64_any_dtype(chunk[col])]
+        with self.connection:
+            # Bulk loads don't need durability until the load finishes
+            self.connection.execute('PRAGMA synchronous = OFF')
+            chunk.to_sql(self.table, self.connection, if_exists='append', index=False)
+            self.connection.executemany('INSERT OR IGNORE INTO dataset_dates VALUES (?)', [(col,) for col in dates])
+
+    def create_indexes(self, columns):
+        """Index the given columns; columns missing from the table are skipped."""
+        existing = set(self.columns)
+        with self.connection:
+            for col in columns:
+                if col in existing:
+                    name = quote(f'idx_{self.table}_{col}')
+                    self.connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {quote(self.table)} ({quote(col)})')
+            self.connection.execute('ANALYZE')
+
+    def _check(self, columns):
+        existing = set(self.columns)
+        unknown = [col for col in dict.fromkeys(columns) if col not in existing]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(map(str, unknown))}")
+
+    def _where(self, filters, expressions=None):
+        expressions = expressions or {}
+        clauses, params = [], []
+        for column, op, value in filters:
+            if op not in SQL_OPERATORS:
+                raise ValueError(f"Unknown filter operator '{op}', expected one of: {', '.join(SQL_OPERATORS)}")
+            if column not in expressions:
+                self._check([column])
+            target = expressions.get(column, quote(column))
+            if op == 'in':
+                values = [_param(item) for item in value]
+                clauses.append(f"{target} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f'{target} {SQL_OPERATORS[op]} ?')
+                params.append(_param(value))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def _read(self, sql, params):
+        result = pd.read_sql_query(sql, self.connection, params=params)
+        for col in self.date_columns & set(result.columns):
+            result[col] = pd.to_datetime(result[col])
+        return result
+
+    def query(self, columns=None, filters=(), order_by=None, limit=None, offset=None):
+        """Select rows, sorted ascending by order_by (missing values last), optionally one page of them."""
+        columns = list(columns) if columns is not None else self.columns
+        self._check(columns + ([order_by] if order_by is not None else []))
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(map(quote, columns))} FROM {quote(self.table)}{where}"
+        if order_by is not None:
+            # rowid keeps equal keys in file order, like a stable sort
+            sql += f' ORDER BY {quote(order_by)} IS NULL, {quote(order_by)}, rowid'
+        if limit is not None or offset is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else int(limit), int(offset or 0)]
+        return self._read(sql, params)
+
+    def aggregate(self, group_by, measures, filters=(), expressions=None):
+        """Group by the given names and aggregate measures ({name: 'sum' | 'mean' | ...}).
+
+        Names are columns or keys of expressions ({name: SQL expression}), so
+        derived keys such as the year of a date are computed inside SQLite.
+        Rows with a missing group key are dropped, as pandas groupby does.
+        """
+        expressions = expressions or {}
+        self._check([name for name in list(group_by) + list(measures) if name not in expressions])
+        keys = [f'{expressions.get(name, quote(name))} AS {quote(name)}' for name in group_by]
+        values = [f'{SQL_AGGREGATES[func]}({expressions.get(name, quote(name))}) AS {quote(name)}'
+                  for name, func in measures.items()]
+        where, params = self._where(filters, expressions)
+        not_null = ' AND '.join(f'{expressions.get(name, quote(name))} IS NOT NULL' for name in group_by)
+        if not_null:
+            where = (where + ' AND ' if where else ' WHERE ') + not_null
+        sql = f"SELECT {', '.join(keys + values)} FROM {quote(self.table)}{where}"
+        if group_by:
+            positions = ', '.join(str(number) for number in range(1, len(group_by) + 1))
+            sql += f' GROUP BY {positions} ORDER BY {positions}'
+        return self._read(sql, params)
+
+    def iter_chunks(self, chunksize, columns=None):
+        """Stream the stored rows back as DataFrame batches."""
+        columns = list(columns) if columns is not None else self.columns
+        self._check(columns)
+        sql = f"SELECT {', '.join(map(quote, columns))} FROM {quote(self.table)} ORDER BY rowid"
+        dates = list(self.date_columns & set(columns))
+        for chunk in pd.read_sql_query(sql, self.connection, chunksize=chunksize):
+            for col in dates:
+                chunk[col] = pd.to_datetime(chunk[col])
+            yield chunk
+
+    def close(self):
+        self.connection.close()
+        if self.temporary and os.path.exists(self.path):
+            os.remove(self.path)
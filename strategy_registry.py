@@ -0,0 +1,103 @@
+import importlib
+import threading
+import time
+from importlib.metadata import entry_points
+
+# Entry point group through which installed packages add modules, e.g. in their pyproject.toml:
+#     [project.entry-points."erp_data_app.strategies"]
+#     Inventory = "inventory_plugin:InventoryStrategy"
+ENTRY_POINT_GROUP = 'erp_data_app.strategies'
+
+# Built-in modules -> 'module:attribute' of their strategy class, in sidebar order
+BUILTIN_STRATEGIES = {
+    'HR': 'data_processor:HRStrategy',
+    'Finance': 'data_processor:FinanceStrategy',
+    'Sales': 'data_processor:SalesStrategy',
+    'Supply Chain': 'data_processor:SupplyChainStrategy',
+    'CRM': 'data_processor:CRMStrategy',
+}
+
+
+def load_target(target):
+    """The object named by a 'package.module:attribute' string."""
+    module_name, _, attribute = target.partition(':')
+    obj = importlib.import_module(module_name)
+    for name in filter(None, attribute.split('.')):
+        obj = getattr(obj, name)
+    return obj
+
+
+class StrategyRegistry:
+    """Strategies by module name, imported when a module is first used and built once per process.
+
+    Targets are 'module:attribute' strings, entry points or strategy factories
+    (usually the class). Nothing is imported until get() asks for a module, so
+    the dependencies of modules a session never opens are never loaded; the
+    instance is then shared by every later call, session and rerun. Modules
+    published under the entry point group are discovered on first use; a
+    plugin cannot shadow a built-in module, use register() to replace one.
+    """
+
+    def __init__(self, builtins=BUILTIN_STRATEGIES, group=ENTRY_POINT_GROUP):
+        self.group = group
+        self._targets = dict(builtins)
+        self._discovered = group is None
+        self._instances = {}
+        # Seconds spent importing and constructing each module's strategy
+        self.load_seconds = {}
+        # Reentrant: a strategy's constructor may look up another module
+        self._lock = threading.RLock()
+
+    def _discover(self):
+        # Called with the lock held; package metadata is scanned once
+        if self._discovered:
+            return
+        self._discovered = True
+        for entry_point in entry_points(group=self.group):
+            self._targets.setdefault(entry_point.name, entry_point)
+
+    def register(self, name, target):
+        """Add or replace the module name; its strategy is built on the next get()."""
+        with self._lock:
+            self._targets[name] = target
+            self._instances.pop(name, None)
+            self.load_seconds.pop(name, None)
+
+    def names(self):
+        """Every available module, built-ins first."""
+        with self._lock:
+            self._discover()
+            return list(self._targets)
+
+    def __contains__(self, name):
+        with self._lock:
+            self._discover()
+            return name in self._targets
+
+    def loaded(self):
+        """Modules whose strategy has been built."""
+        with self._lock:
+            return list(self._instances)
+
+    def get(self, name):
+        """The shared strategy of module name, importing and building it on first use."""
+        with self._lock:
+            strategy = self._instances.get(name)
+            if strategy is not None:
+                return strategy
+            self._discover()
+            if name not in self._targets:
+                raise KeyError(f"Unknown module '{name}', expected one of: {', '.join(self._targets)}")
+            started = time.perf_counter()
+            target = self._targets[name]
+            if isinstance(target, str):
+                target = load_target(target)
+            elif hasattr(target, 'load') and hasattr(target, 'group'):
+                # An importlib.metadata entry point
+                target = target.load()
+            strategy = self._instances[name] = target()
+            self.load_seconds[name] = time.perf_counter() - started
+            return strategy
+
+
+STRATEGIES = StrategyRegistry()
@@ -0,0 +1,183 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Columns an index is built from
+INDEX_COLUMNS = ('Brand', 'VendorNumber', 'Price', 'PurchasePrice')
+# Keys a second file can be joined on
+JOIN_KEYS = ('Brand', 'VendorNumber')
+
+
+def item_margins(data):
+    """Per-item Margin (Price - PurchasePrice), MarginPct (of Price) and Markup (over PurchasePrice).
+
+    Percentages are NaN where the price they divide by is zero.
+    """
+    price = data['Price'].to_numpy(dtype='float64', na_value=np.nan)
+    cost = data['PurchasePrice'].to_numpy(dtype='float64', na_value=np.nan)
+    margin = price - cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin_pct = np.where(price != 0, margin / price, np.nan)
+        markup = np.where(cost != 0, margin / cost, np.nan)
+    return pd.DataFrame({'Margin': margin, 'MarginPct': margin_pct, 'Markup': markup}, index=data.index)
+
+
+class KeyIndex:
+    """Hash index from the values of one column to the positions of their rows.
+
+    The distinct values are held in a hashed pandas Index, so finding a key's
+    code is O(1); the row positions of all keys are stored in one array grouped
+    by code (offsets mark where each key's rows start), so a lookup is a slice
+    rather than a scan, and no per-key Python objects are created for millions
+    of keys.
+    """
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values, sort=True)
+        self.keys = pd.Index(uniques)
+        self.codes = codes
+        # Stable, so each key's rows stay in file order
+        self.order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.keys))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))) + int((codes < 0).sum())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def nbytes(self):
+        return int(self.keys.nbytes + self.codes.nbytes + self.order.nbytes + self.offsets.nbytes)
+
+    def lookup(self, values):
+        """Codes of values (-1 for values not in the index), vectorized."""
+        return self.keys.get_indexer(values)
+
+    def positions(self, value):
+        """Row positions holding value; empty if the value is unknown."""
+        code = self.lookup([value])[0]
+        if code < 0:
+            return np.empty(0, dtype='int64')
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def first_positions(self):
+        """Position of the first row of every key, in code order."""
+        return self.order[self.offsets[:-1]]
+
+
+class SupplyChainIndex:
+    """Brand and VendorNumber hash indexes over a supply chain dataset, with item margins and vendor rollups.
+
+    Built once per dataset. Item and vendor lookups are O(1) index probes, the
+    vendor rollup is computed with bincount over the vendor codes and memoized,
+    and joins against another file probe the indexes instead of merging.
+    """
+
+    def __init__(self, data):
+        missing = [col for col in INDEX_COLUMNS if col not in data.columns]
+        if missing:
+            raise ValueError(f"Supply chain analytics need the columns: {', '.join(missing)}")
+        self._data = data
+        self.margins = item_margins(data)
+        self.brands = KeyIndex(data['Brand'])
+        self.vendors = KeyIndex(data['VendorNumber'])
+        self._vendor_rollup = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def nbytes(self):
+        """Bytes held by the margins, indexes and vendor rollup, not counting the dataset."""
+        rollup = self._vendor_rollup
+        return int(self.margins.memory_usage(deep=False).sum() + self.brands.nbytes() + self.vendors.nbytes()
+                   + (0 if rollup is None else rollup.memory_usage(deep=False).sum()))
+
+    def _rows(self, positions):
+        rows = self._data.take(positions)
+        return pd.concat([rows, self.margins.take(positions)], axis=1)
+
+    def items(self, brand=None, vendor=None):
+        """Items with their margins: one brand, all items of one vendor, or every item."""
+        if brand is not None:
+            positions = self.brands.positions(brand)
+            if vendor is not None:
+                positions = positions[self.vendors.codes[positions] == self.vendors.lookup([vendor])[0]]
+        elif vendor is not None:
+            positions = self.vendors.positions(vendor)
+        else:
+            return pd.concat([self._data, self.margins], axis=1)
+        return self._rows(positions)
+
+    def vendor_rollup(self):
+        """Per vendor: item count, total price, cost and margin, margin % of the total price and mean markup."""
+        with self._lock:
+            if self._vendor_rollup is not None:
+                return self._vendor_rollup
+        codes, n = self.vendors.codes, len(self.vendors)
+        known = codes >= 0
+        codes = codes[known]
+        price = self._data['Price'].to_numpy(dtype='float64', na_value=np.nan)[known]
+        cost = self._data['PurchasePrice'].to_numpy(dtype='float64', na_value=np.nan)[known]
+        markup = self.margins['Markup'].to_numpy()[known]
+
+        def total(values):
+            values = np.nan_to_num(values)
+            return np.bincount(codes, weights=values, minlength=n)
+
+        items = np.bincount(codes, minlength=n)
+        priced = np.bincount(codes, weights=~np.isnan(markup), minlength=n)
+        sales, costs = total(price), total(cost)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rollup = pd.DataFrame({
+                'VendorNumber': self.vendors.keys,
+                'Items': items,
+                'Price': sales,
+                'PurchasePrice': costs,
+                'Margin': sales - costs,
+                'MarginPct': np.where(sales != 0, (sales - costs) / sales, np.nan),
+                'MeanMarkup': np.where(priced > 0, total(markup) / priced, np.nan),
+            })
+        if 'VendorName' in self._data.columns:
+            names = self._data['VendorName'].to_numpy()[self.vendors.first_positions()]
+            rollup.insert(1, 'VendorName', names)
+        with self._lock:
+            self._vendor_rollup = rollup
+        return rollup
+
+    def join(self, other, on='Brand', columns=None):
+        """Attach item (on='Brand') or vendor rollup (on='VendorNumber') columns to every row of other.
+
+        Each key of other is probed in the hash index, so the cost is one lookup
+        per row of other and a gather, without sorting or merging either side.
+        Keys missing from this dataset get missing values. When a brand occurs
+        more than once, its first item is used.
+        """
+        if on not in JOIN_KEYS:
+            raise ValueError(f"Unknown join key '{on}', expected one of: {', '.join(JOIN_KEYS)}")
+        if on not in other.columns:
+            raise ValueError(f"Column '{on}' is not in the joined data")
+        if on == 'Brand':
+            source = pd.concat([self._data, self.margins], axis=1).drop(columns=on)
+            codes = self.brands.lookup(other[on])
+            positions = np.full(len(codes), -1)
+            positions[codes >= 0] = self.brands.first_positions()[codes[codes >= 0]]
+        else:
+            source = self.vendor_rollup().drop(columns=on)
+            positions = self.vendors.lookup(other[on])
+        if columns is not None:
+            source = source[list(columns)]
+        # Columns both sides have keep other's values
+        source = source.drop(columns=[col for col in source.columns if col in other.columns])
+        if len(source) == 0:
+            attached = source.reindex(range(len(positions)))
+        else:
+            attached = source.take(np.maximum(positions, 0)).reset_index(drop=True)
+            if (positions < 0).any():
+                attached = attached.where(pd.Series(positions >= 0), axis=0)
+        attached.index = other.index
+        return pd.concat([other, attached], axis=1)
+
+    def join_chunks(self, chunks, on='Brand', columns=None):
+        """Join batches of a file too large for memory, e.g. from CSVDataIngestion.iter_chunks."""
+        for chunk in chunks:
+            yield self.join(chunk, on, columns)
@@ -1,9 +1,46 @@
+import gc
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 import unittest
-from data_processor import FinanceStrategy, HRStrategy, SalesStrategy, SupplyChainStrategy
+import weakref
+import data_processor
+from data_processor import CRMStrategy, FinanceStrategy, HRStrategy, SalesStrategy, SupplyChainStrategy, SortIndex, \
+    aggregate_sales
 import pytest
+import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from io import StringIO
-from DataIngection import CSVDataIngestion
+from DataIngection import CSVDataIngestion, DataIngestionContext, JSONDataIngestion, PartitionedDataIngestion, \
+    SQLiteDataIngestion
+from benchmark import generate_crm, generate_finance, generate_hr, generate_supply_chain
+import batch_runner
+from batch_runner import run_batch
+from chart_cache import ChartCache, lttb
+from crm_cube import CRMCube
+from finance_cube import FinanceCube
+from hr_rollups import HRRollups
+from job_executor import JobCancelled, JobExecutor, frame_chunks, tracked
+from metrics import MetricsRecorder, RECORDER
+from query_plan import QueryPlan
+from dataset_cache import DatasetCache
+from dataset_registry import DatasetRegistry
+from derived_columns import DERIVED
+from export import available_formats, export_bytes, export_to_path, iter_export
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+from sales_store import SalesAggregateStore
+from session_cache import SessionCache, make_key
+from sqlite_dataset import SQL_INDEXES
+from supply_chain_index import SupplyChainIndex
+import strategy_registry
+from strategy_registry import StrategyRegistry
+from schemas import CRM_SCHEMA, FINANCE_SCHEMA, HR_SCHEMA, SUPPLY_CHAIN_SCHEMA, parse_currency, parse_decimal_comma
 
 # Mock data for testing
 CSV_DATA = """name,age
@@ -25,6 +62,498 @@ def test_csv_data_ingestion(csv_file):
     assert not data.empty
     assert data.equals(pd.read_csv(StringIO(CSV_DATA)))
 
+def test_csv_chunked_ingestion(csv_file):
+    chunks = list(CSVDataIngestion().ingest_data(csv_file, chunksize=1))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert pd.concat(chunks, ignore_index=True).equals(pd.read_csv(StringIO(CSV_DATA)))
+
+
+@pytest.mark.parametrize('name, orient_lines', [('crm.json', False), ('crm.ndjson', True)])
+def test_json_ingestion_matches_csv(tmpdir, name, orient_lines):
+    raw = generate_crm(25)
+    path = tmpdir.join(name).strpath
+    raw.to_json(path, orient='records', lines=orient_lines)
+    context = DataIngestionContext.for_file(path, schema=CRM_SCHEMA)
+    assert isinstance(context.strategy, JSONDataIngestion)
+    expected = CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(StringIO(raw.to_csv(index=False)))
+    pd.testing.assert_frame_equal(context.ingest_data(path), expected)
+    chunks = list(context.iter_chunks(path, chunksize=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert context.strategy.read_header(path) == raw.columns.tolist()
+    # Strategies can be swapped on a live context
+    context.set_strategy(CSVDataIngestion())
+    with pytest.raises(TypeError):
+        context.set_strategy(object())
+
+def test_json_ingestion_keeps_json_numbers(tmpdir):
+    path = tmpdir.join('crm.ndjson').strpath
+    records = [{'invoiceID': 1, 'invoice_date': '01/02/2021 10:00', 'customerID': 7, 'country': 'UK',
+                'quantity': 3, 'amount': 229.33},
+               {'invoiceID': 2, 'invoice_date': '03/04/2021 11:30', 'customerID': 8, 'country': 'USA',
+                'quantity': 1, 'amount': 12}]
+    pd.DataFrame(records).to_json(path, orient='records', lines=True)
+    data = JSONDataIngestion(schema=CRM_SCHEMA).ingest_data(path)
+    assert data['amount'].tolist() == [229.33, 12]
+
+def test_partitioned_ingestion(tmpdir):
+    raw = generate_crm(60)
+    months = pd.to_datetime(raw['invoice_date'], format='%m/%d/%Y %H:%M').dt.strftime('%Y-%m')
+    for month, part in raw.groupby(months):
+        part.to_csv(tmpdir.join(f'crm_{month}.csv').strpath, index=False)
+    ordered = pd.concat([part for _, part in raw.groupby(months)], ignore_index=True)
+    expected = CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(StringIO(ordered.to_csv(index=False)))
+    for source in (tmpdir.strpath, tmpdir.join('crm_*.csv').strpath, sorted(map(str, tmpdir.listdir()))):
+        context = DataIngestionContext.for_file(source, schema=CRM_SCHEMA, workers=2)
+        assert isinstance(context.strategy, PartitionedDataIngestion)
+        pd.testing.assert_frame_equal(context.ingest_data(source), expected)
+    # Partitions of other years are never read
+    pruned = PartitionedDataIngestion(schema=CRM_SCHEMA, years=[2021]).ingest_data(tmpdir.strpath)
+    assert set(pruned['invoice_date'].dt.year) == {2021}
+    assert len(pruned) == (months.str[:4] == '2021').sum()
+    # A partition with a different layout is rejected
+    raw.drop(columns='amount').to_csv(tmpdir.join('crm_2021-13.csv').strpath, index=False)
+    with pytest.raises(ValueError, match='crm_2021-13.csv'):
+        PartitionedDataIngestion(schema=CRM_SCHEMA)._check_partitions(
+            *zip(*[(path, CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(path))
+                   for path in sorted(map(str, tmpdir.listdir()))]))
+    assert PartitionedDataIngestion(schema=CRM_SCHEMA).ingest_data(tmpdir.strpath) is None
+
+def test_parse_currency_and_decimal_comma():
+    values = parse_currency(pd.Series(['$1,618.50 ', ' $-   ', '-$4,533.75', ' $4,53,375.00 ']))
+    assert values.tolist() == [1618.5, 0.0, -4533.75, 453375.0]
+    assert parse_decimal_comma(pd.Series(['229,33', '-1,45'])).tolist() == [229.33, -1.45]
+    # Already numeric (e.g. parsed from JSON): returned as is
+    assert parse_decimal_comma(pd.Series([229.33, 1])).tolist() == [229.33, 1]
+    assert parse_currency(pd.Series([1618.5, -4533.75])).tolist() == [1618.5, -4533.75]
+
+def test_csv_ingestion_with_schema(tmpdir):
+    file = tmpdir.join("finance.csv")
+    file.write('Segment,Country, Product , Units Sold ,  Sales ,Year\n'
+               'Government,Canada, Carretera ,"$1,618.50 ", $-   ,2014\n'
+               'Midmarket,France, Paseo ,$921.00 ,"$13,815.00",2014\n')
+    data = CSVDataIngestion(schema=FINANCE_SCHEMA).ingest_data(file.strpath)
+    assert data.columns.tolist() == ['Segment', 'Country', 'Product', 'Units Sold', 'Sales', 'Year']
+    assert data['Units Sold'].tolist() == [1618.5, 921.0]
+    assert data['Sales'].tolist() == [0.0, 13815.0]
+    assert data['Product'].tolist() == ['Carretera', 'Paseo']
+    assert isinstance(data['Segment'].dtype, pd.CategoricalDtype)
+
+def test_crm_schema_chunks(tmpdir):
+    file = tmpdir.join("crm.csv")
+    file.write('invoiceID,invoice_date,customerID,country,quantity,amount\n'
+               '548370,3/30/2021 16:14,15528,United Kingdom,123,"229,33"\n'
+               'C570727,10/12/2021 11:32,,Germany,-1,"-1,45"\n')
+    chunks = list(CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(file.strpath, chunksize=1))
+    assert chunks[0]['amount'].tolist() == [229.33]
+    assert chunks[1]['invoice_date'].dt.year.tolist() == [2021]
+    assert chunks[1]['customerID'].isna().all()
+
+
+def test_csv_ingestion_cache_hit(csv_file, tmpdir):
+    cache = DatasetCache(cache_dir=tmpdir.mkdir("cache").strpath)
+    ingestor = CSVDataIngestion(cache=cache)
+    first = ingestor.ingest_data(csv_file)
+    second = ingestor.ingest_data(csv_file)
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+    assert second.equals(first)
+
+def test_csv_ingestion_survives_uncacheable_data(tmpdir):
+    # read_csv infers this column per internal block: ints first, then strings, which Arrow cannot write
+    path = tmpdir.join('orders.csv')
+    path.write('Order ID,Quantity\n' + ''.join(f'{i},1\n' for i in range(300_000)) + 'C1,1\n')
+    cache = DatasetCache(cache_dir=tmpdir.mkdir('cache').strpath)
+    with pytest.warns(pd.errors.DtypeWarning):
+        data = CSVDataIngestion(cache=cache).ingest_data(path.strpath)
+    assert data is not None and len(data) == 300_001
+    assert os.listdir(cache.cache_dir) == []
+
+def test_dataset_cache_lru_eviction(tmpdir):
+    cache = DatasetCache(cache_dir=tmpdir.strpath, max_bytes=0)
+    cache.put('a', pd.DataFrame({'x': range(10)}))
+    assert cache.get('a') is None
+
+
+def test_dataset_registry_shares_one_copy(tmpdir):
+    registry = DatasetRegistry(max_bytes=0, directory=tmpdir.strpath)
+    loads = []
+    load = lambda: loads.append(1) or CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(
+        StringIO(generate_crm(50).to_csv(index=False)))
+    first, second = registry.acquire('crm', load), registry.acquire('crm', load)
+    assert len(loads) == 1 and registry.refcount('crm') == 2
+    # Views share the column buffers but not each other's writes
+    assert np.shares_memory(first['quantity'].to_numpy(), second['quantity'].to_numpy())
+    first['quantity'] = 0
+    assert (second['quantity'] != 0).any()
+    registry.release(first)
+    assert registry.refcount('crm') == 1
+    registry.evict()
+    assert 'crm' in registry
+    del first, second
+    gc.collect()
+    assert registry.refcount('crm') == 0
+    # Idle datasets beyond the budget are evicted
+    registry.evict()
+    assert 'crm' not in registry and registry.stats()['evictions'] == 1
+    assert registry.acquire('missing', lambda: None) is None
+
+def test_strategy_registry_is_lazy_and_reuses_instances(monkeypatch):
+    class EntryPoint:
+        name, group = 'Inventory', strategy_registry.ENTRY_POINT_GROUP
+        load = staticmethod(lambda: FinanceStrategy)
+
+    monkeypatch.setattr(strategy_registry, 'entry_points', lambda group: [EntryPoint()])
+    registry = StrategyRegistry()
+    assert registry.loaded() == []
+    assert registry.names() == ['HR', 'Finance', 'Sales', 'Supply Chain', 'CRM', 'Inventory']
+    assert isinstance(registry.get('HR'), HRStrategy)
+    assert registry.get('HR') is registry.get('HR')
+    assert isinstance(registry.get('Inventory'), FinanceStrategy)
+    assert registry.loaded() == ['HR', 'Inventory']
+    registry.register('HR', 'data_processor:CRMStrategy')
+    assert isinstance(registry.get('HR'), CRMStrategy)
+    with pytest.raises(KeyError):
+        registry.get('Payroll')
+    # Charts import matplotlib on first use, so the app starts without it
+    script = "import sys, main; assert 'matplotlib' not in sys.modules"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', script], cwd=root, check=True)
+
+def test_export_round_trips_in_batches(tmpdir):
+    data = pd.DataFrame({'id': range(25), 'country': ['UK', 'US', 'DE', 'FR', 'IT'] * 5, 'amount': np.arange(25) / 4})
+    readers = {'csv': pd.read_csv, 'csv.gz': lambda file: pd.read_csv(file, compression='gzip'),
+               'parquet': pd.read_parquet}
+    for fmt, read in readers.items():
+        path = os.path.join(tmpdir.strpath, 'report.' + fmt)
+        assert export_to_path(data, path, chunksize=10) == 25
+        pd.testing.assert_frame_equal(read(path), data)
+        # Download payloads must be a type Streamlit accepts
+        payload, _ = convert_data_to_bytes_and_infer_mime(export_bytes(data, fmt, chunksize=7), ValueError())
+        pd.testing.assert_frame_equal(read(io.BytesIO(payload)), data)
+        # Streamed output arrives batch by batch and decodes to the same table
+        parts = list(iter_export(data, fmt, chunksize=10))
+        assert len(parts) > 1
+        streamed = os.path.join(tmpdir.strpath, 'streamed.' + fmt)
+        with open(streamed, 'wb') as file:
+            file.writelines(parts)
+        pd.testing.assert_frame_equal(read(streamed), data)
+        # An empty result keeps its header / schema
+        empty = os.path.join(tmpdir.strpath, 'empty.' + fmt)
+        assert export_to_path(data.head(0), empty) == 0
+        assert read(empty).columns.tolist() == data.columns.tolist()
+    # Parquet batches whose dtype drifts from int to float with NaN are cast to the first batch's schema
+    drifting = [pd.DataFrame({'id': [1, 2]}), pd.DataFrame({'id': [3.0, np.nan]})]
+    path = os.path.join(tmpdir.strpath, 'drift.parquet')
+    assert export_to_path(drifting, path) == 4
+    assert pd.read_parquet(path)['id'].tolist()[:3] == [1, 2, 3]
+    assert set(available_formats()) >= {'csv', 'csv.gz', 'parquet'}
+
+def test_session_cache_memoizes_and_invalidates():
+    cache = SessionCache(max_entries=2)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    cache.bind_dataset('digest-a')
+    key = make_key('digest-a', 'HR', 'process', ['name'])
+    assert cache.get_or_compute(key, compute) == 1
+    assert cache.get_or_compute(key, compute) == 1
+    cache.bind_dataset('digest-b')
+    assert cache.get_or_compute(key, compute) == 2
+    cache.get_or_compute(make_key('x'), compute)
+    cache.get_or_compute(make_key('y'), compute)
+    assert len(cache) == 2
+
+
+def test_session_cache_keeps_shared_dataset_over_byte_budget():
+    dataset = pd.DataFrame({'value': np.arange(1000, dtype='int64')})
+    cache = SessionCache(max_bytes=4096)
+    cache.bind_dataset('digest-a')
+    assert cache.get_or_compute(make_key('digest-a', 'ingest'), lambda: dataset, shared=True) is dataset
+    sort_index = cache.get_or_compute(make_key('digest-a', 'sort_index'), lambda: SortIndex(dataset))
+    sort_index.order('value')
+    # The shared view is not counted, the permutation built since it was stored is
+    assert cache.nbytes() == sort_index.nbytes() == 8000
+    cache.get_or_compute(make_key('digest-a', 'process'), lambda: dataset.head(10))
+    assert cache.get_or_compute(make_key('digest-a', 'ingest'), lambda: None) is dataset
+    assert len(cache) == 2
+
+
+def test_batch_runner_writes_reports(csv_file, tmpdir):
+    jobs = [{'name': 'people', 'module': 'HR', 'input': csv_file, 'params': {'columns': ['age', 'name']}}]
+    records = run_batch(jobs, output_dir=tmpdir.strpath, workers=1)
+    assert records[0]['error'] is None and records[0]['rows_out'] == 2
+    report = pd.read_csv(records[0]['outputs'][0])
+    assert report['name'].tolist() == ['Bob', 'Alice']
+    jobs[0]['backend'] = 'sqlite'
+    records = run_batch(jobs, output_dir=tmpdir.strpath, workers=1)
+    assert records[0]['error'] is None
+    assert pd.read_csv(records[0]['outputs'][0])['name'].tolist() == ['Bob', 'Alice']
+
+
+def test_batch_runner_aggregates_sales_once(tmpdir, monkeypatch):
+    path = tmpdir.join('sales.csv').strpath
+    pd.DataFrame({'Order ID': [1, 2, 3], 'Product': ['Cable', 'Phone', 'Cable'], 'Quantity Ordered': [1, 2, 3],
+                  'Price Each': [5.0, 100.0, 5.0], 'Order Date': ['01/05/19 10:00', '01/07/19 11:30', '02/03/19 09:15'],
+                  'Purchase Address': ['a', 'b', 'c']}).to_csv(path, index=False)
+    calls = []
+    counted = lambda *args, **kwargs: calls.append(args[1]) or aggregate_sales(*args, **kwargs)
+    monkeypatch.setattr(batch_runner, 'aggregate_sales', counted)
+    monkeypatch.setattr(data_processor, 'aggregate_sales', counted)
+    jobs = [{'name': 'sales', 'module': 'Sales', 'input': path, 'backend': 'memory',
+             'params': {'period': 'monthly', 'by_product': True}}]
+    records = run_batch(jobs, output_dir=tmpdir.strpath, workers=1)
+    assert records[0]['error'] is None and calls == ['monthly']
+    report = pd.read_csv(records[0]['outputs'][0])
+    assert report['Revenue'].tolist() == [5.0, 200.0, 15.0]
+    assert os.path.exists(records[0]['outputs'][1])
+
+
+def test_metrics_record_nested_stages(csv_file):
+    RECORDER.clear()
+    RECORDER.enable(trace_memory=True)
+    try:
+        data = CSVDataIngestion().ingest_data(csv_file)
+        SupplyChainStrategy().process_data(data, sort_by='age')
+    finally:
+        RECORDER.disable()
+    metrics = RECORDER.to_frame()
+    RECORDER.clear()
+    assert metrics['stage'].tolist() == ['ingest_data/read_csv', 'ingest_data', 'process_data/sort', 'process_data']
+    assert metrics['rows_out'].tolist() == [2, 2, 2, 2]
+    assert (metrics['peak_memory_bytes'] >= 0).all()
+
+def test_metrics_prometheus_export():
+    recorder = MetricsRecorder()
+    with recorder.stage('HRStrategy', 'process_data', rows_in=10) as metrics:
+        metrics.rows_out = 4
+    assert len(recorder.records) == 0  # disabled by default
+    recorder.enable()
+    for _ in range(2):
+        with recorder.stage('HRStrategy', 'process_data', rows_in=10) as metrics:
+            metrics.rows_out = 4
+    text = recorder.to_prometheus()
+    assert 'erp_stage_calls_total{component="HRStrategy",stage="process_data"} 2' in text
+    assert 'erp_stage_rows_out_total{component="HRStrategy",stage="process_data"} 8' in text
+
+def test_metrics_owners_and_sessions():
+    recorder = MetricsRecorder()
+    recorder.enable(owner='a')
+    recorder.enable(trace_memory=True, owner='b')
+    assert recorder.trace_memory
+    # One session switching diagnostics off leaves the other's recording alone
+    recorder.disable(owner='b')
+    assert recorder.enabled and not recorder.trace_memory
+    for session in ('a', 'b'):
+        with recorder.session(session), recorder.stage('HRStrategy', 'process_data'):
+            pass
+    assert recorder.to_frame(session='a')['session'].tolist() == ['a']
+    recorder.clear(session='a')
+    assert recorder.to_frame()['session'].tolist() == ['b']
+    recorder.disable(owner='a')
+    assert not recorder.enabled
+    # A tab closed with diagnostics on stops renewing; it expires when any other session reruns
+    recorder.owner_timeout = 0.05
+    recorder.enable(trace_memory=True, owner='closed-tab')
+    time.sleep(0.1)
+    recorder.disable(owner='other')
+    assert not recorder.enabled and not recorder.trace_memory
+    assert not tracemalloc.is_tracing()
+    # ... or when the next stage runs
+    recorder.enable(owner='closed-tab')
+    time.sleep(0.1)
+    with recorder.stage('HRStrategy', 'process_data'):
+        pass
+    assert not recorder.enabled and recorder.to_frame()['session'].tolist() == ['b']
+
+def test_query_plan_projects_and_filters(tmpdir):
+    file = tmpdir.join("crm.csv")
+    generate_crm(50).assign(note='unused').to_csv(file.strpath, index=False)
+    plan = QueryPlan(file.strpath, CRMStrategy(), schema=CRM_SCHEMA, chunksize=7)
+    plan = plan.select(['year', 'country', 'amount']).where('country', 'Germany')
+    scanned = plan.scan()
+    assert 'note' not in scanned.columns and set(CRMStrategy.required_columns) <= set(scanned.columns)
+    assert (scanned['country'] == 'Germany').all()
+    full = CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(file.strpath)
+    expected = CRMStrategy().process_data(full, columns=['year', 'country', 'amount'], country='Germany')
+    pd.testing.assert_frame_equal(plan.collect().reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+    assert 'filter: country == ' in plan.explain()
+    with pytest.raises(ValueError):
+        plan.select(['missing']).scan()
+
+def test_strategies_leave_input_unmodified():
+    crm = generate_crm(40)
+    sales = pd.DataFrame({'Order Date': ['2019-01-05 10:00', '2019-02-07 11:30'], 'Quantity Ordered': [1, 2],
+                          'Price Each': [3.0, 4.0]})
+    crm_before, sales_before = crm.copy(), sales.copy()
+    CRMStrategy().process_data(crm, columns=['year', 'country', 'amount'], country='Germany')
+    _, prepared = SalesStrategy().process_data(sales, period='monthly')
+    pd.testing.assert_frame_equal(crm, crm_before)
+    pd.testing.assert_frame_equal(sales, sales_before)
+    assert prepared['month'].tolist() == [1, 2]
+    # Derived columns are computed once per frame and reused by later calls
+    held = DERIVED.nbytes(crm)
+    assert held > 0
+    CRMStrategy().process_data(crm, columns=['year', 'amount'])
+    assert DERIVED.nbytes(crm) == held
+    # Views share the untouched columns without pandas' process-wide copy-on-write mode
+    assert not pd.get_option('mode.copy_on_write')
+    assert np.shares_memory(prepared['Quantity Ordered'].to_numpy(), sales['Quantity Ordered'].to_numpy())
+
+@pytest.mark.parametrize('generator, dataset', [
+    (generate_hr, 'HRData.csv'), (generate_finance, 'finance_data.csv'),
+    (generate_crm, 'CRM_data.csv'), (generate_supply_chain, 'supply_chain.csv'),
+])
+def test_benchmark_generators_match_dataset_headers(generator, dataset):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data Set', dataset)
+    assert generator(5).columns.tolist() == pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def test_hr_rollups_match_pandas():
+    data = CSVDataIngestion(schema=HR_SCHEMA).ingest_data(StringIO(generate_hr(300).to_csv(index=False)))
+    rollups = HRRollups(data)
+    hr = HRStrategy()
+    salary = hr.process_rollups(rollups, percentiles=(0.5, 0.9))
+    expected = data.groupby('Department', observed=True)['Salary'].quantile([0.5, 0.9]).unstack()
+    assert salary['Department'].tolist() == expected.index.tolist()
+    assert np.allclose(salary[['p50', 'p90']].to_numpy(), expected.to_numpy())
+    # Results are memoized per arguments
+    assert hr.process_rollups(rollups, percentiles=(0.5, 0.9)) is salary
+    absences = hr.process_rollups(rollups, rollup='absences')
+    expected = data.groupby('ManagerID')['Absences'].sum()
+    assert absences['Absences'].tolist() == expected.tolist()
+    terminated = data.dropna(subset=['DateofTermination'])
+    terminations = hr.process_rollups(rollups, rollup='terminations')
+    assert terminations['Terminations'].sum() == len(terminated)
+    # Drill-downs take one group's rows by position
+    department = salary['Department'].iloc[0]
+    rows = rollups.drill_down(department=department)
+    pd.testing.assert_frame_equal(rows, data[data['Department'] == department])
+    manager = absences['ManagerID'].iloc[0]
+    one = hr.process_rollups(rollups, rollup='absences', department=department, manager=manager)
+    assert len(one) <= 1 and one['Employees'].sum() == len(rollups.drill_down(department, manager))
+    # Department and manager are picked independently, so a pair may match nobody
+    for filters in ({'department': 'No such department'}, {'department': department, 'manager': -1}):
+        empty = hr.process_rollups(rollups, percentiles=(0.5, 0.9), **filters)
+        assert empty.empty and empty.columns.tolist() == ['Department', 'Employees', 'p50', 'p90']
+    with pytest.raises(ValueError):
+        hr.process_rollups(rollups, rollup='headcount')
+
+
+def test_supply_chain_index_margins_lookups_and_join():
+    data = CSVDataIngestion(schema=SUPPLY_CHAIN_SCHEMA).ingest_data(
+        StringIO(generate_supply_chain(500).to_csv(index=False)))
+    index = SupplyChainIndex(data)
+    strategy = SupplyChainStrategy()
+    items = strategy.process_index(index, vendor=1005, sort_by='Brand')
+    expected = data[data['VendorNumber'] == 1005]
+    assert items['Brand'].tolist() == expected['Brand'].tolist()
+    assert np.allclose(items['Margin'], expected['Price'] - expected['PurchasePrice'])
+    assert np.allclose(items['Markup'], (expected['Price'] - expected['PurchasePrice']) / expected['PurchasePrice'])
+    assert strategy.process_index(index, brand=60)['Brand'].tolist() == [60]
+    assert strategy.process_index(index, brand=1).empty
+    vendors = strategy.process_index(index, analysis='vendors')
+    totals = data.groupby('VendorNumber')[['Price', 'PurchasePrice']].sum()
+    assert vendors['VendorNumber'].tolist() == totals.index.tolist()
+    assert np.allclose(vendors['Margin'], totals['Price'] - totals['PurchasePrice'])
+    # Index joins match a left merge, with missing keys left empty
+    purchases = pd.DataFrame({'Brand': [60, 61, 60, 1], 'Quantity': [1, 2, 3, 4]})
+    joined = strategy.process_index(index, analysis='join', other=purchases,
+                                    columns=['Brand', 'Quantity', 'VendorNumber', 'Margin']).sort_index()
+    merged = purchases.merge(pd.concat([data, index.margins], axis=1), on='Brand', how='left')
+    assert np.allclose(joined['Margin'], merged['Margin'], equal_nan=True)
+    assert joined['VendorNumber'].tolist()[:3] == merged['VendorNumber'].tolist()[:3]
+    by_vendor = index.join(pd.DataFrame({'VendorNumber': [1005, 1]}), on='VendorNumber')
+    assert by_vendor['Items'].iloc[0] == len(expected) and np.isnan(by_vendor['Items'].iloc[1])
+
+
+def test_finance_cube_rollup_slice_and_merge():
+    data = CSVDataIngestion(schema=FINANCE_SCHEMA).ingest_data(StringIO(generate_finance(400).to_csv(index=False)))
+    cube = FinanceCube(data)
+    finance = FinanceStrategy()
+    measures = ['Sales', 'COGS', 'Profit']
+    rollup = finance.process_cube(cube, by=['Segment', 'Year'])
+    expected = data.groupby(['Segment', 'Year'], observed=True)[measures].sum().reset_index()
+    assert rollup[['Segment', 'Year']].astype(str).equals(expected[['Segment', 'Year']].astype(str))
+    assert np.allclose(rollup[measures], expected[measures])
+    country = data['Country'].iloc[0]
+    sliced = finance.process_cube(cube, by=['Year'], filters={'Country': country}, drill_down='Month Number')
+    expected = data[data['Country'] == country].groupby(['Year', 'Month Number'])[measures].sum().reset_index()
+    assert np.allclose(sliced[['Year', 'Month Number'] + measures], expected)
+    assert finance.process_cube(cube, by=['Year'], filters={'Country': 'Atlantis'}).empty
+    # Cubes of separate files merge into the cube of their union
+    merged = FinanceCube(data.iloc[:150]).merge(FinanceCube(data.iloc[150:]))
+    pd.testing.assert_frame_equal(merged.query(['Country', 'Product']), cube.query(['Country', 'Product']))
+    streamed = FinanceCube.from_chunks([data.iloc[:100], data.iloc[100:]])
+    assert streamed.query([])['Rows'].item() == len(data)
+    # Labels keep their dtypes, as in the cube built from the whole frame
+    assert all(streamed.labels[dim].dtype == cube.labels[dim].dtype for dim in cube.labels)
+    pd.testing.assert_frame_equal(streamed.query(['Segment', 'Year', 'Month Number']),
+                                  cube.query(['Segment', 'Year', 'Month Number']))
+    with pytest.raises(ValueError):
+        cube.query(['Region'])
+
+
+def test_job_executor_dedups_reports_progress_and_cancels():
+    executor = JobExecutor(workers=2)
+    data = CSVDataIngestion(schema=CRM_SCHEMA).ingest_data(StringIO(generate_crm(1000).to_csv(index=False)))
+    crm = CRMStrategy()
+    compute = lambda: crm.process_chunks(tracked(frame_chunks(data, 100), len(data)), columns=['year', 'country'])
+    job = executor.submit('crm', compute, owner='a')
+    assert executor.submit('crm', compute, owner='b') is job
+    result = job.result(timeout=30)
+    assert job.state == 'done' and job.progress == 1.0
+    expected = crm.process_data(data, columns=['year', 'country'])
+    assert np.allclose(result.sort_values(['year', 'country'])['amount'], expected['amount'])
+    # A running job stops at its next batch once the last session waiting for it lets go
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        for _ in tracked(iter([data] * 3)):
+            started.set()
+            release.wait(10)
+    job = executor.submit('slow', slow, owner='a')
+    executor.submit('slow', slow, owner='b')
+    started.wait(10)
+    assert not executor.release('slow', 'a')
+    assert executor.release('slow', 'b')
+    release.set()
+    with pytest.raises(JobCancelled):
+        job.result(timeout=10)
+    assert job.state == 'cancelled'
+    # A cancelled key runs again when submitted anew
+    assert executor.submit('slow', lambda: 1).result(timeout=10) == 1
+    # A failed key keeps its job until it is retried explicitly
+    failed = executor.submit('bad', lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failed.result(timeout=10)
+    assert failed.state == 'failed'
+    assert executor.submit('bad', lambda: 2) is failed
+    assert executor.submit('bad', lambda: 2, retry=True).result(timeout=10) == 2
+
+
+def test_job_executor_bounds_retained_results():
+    executor = JobExecutor(workers=1, max_bytes=20_000)
+    frame = lambda: pd.DataFrame({'value': np.arange(1000, dtype='int64')})
+    for key in ('a', 'b'):
+        executor.submit(key, frame).result(timeout=10)
+    # Both 8 kB results fit; the third pushes the oldest out
+    executor.submit('c', frame).result(timeout=10)
+    executor.submit('d', lambda: 1)
+    assert executor.get('a') is None and executor.get('b') is not None and executor.get('c') is not None
+
+    data = []
+
+    def fail():
+        rows = frame()
+        data.append(weakref.ref(rows))
+        raise ValueError(f'{len(rows)} rows')
+    failed = executor.submit('bad', fail)
+    # Only the error is kept for Retry, not the frames (and data) it was raised in
+    assert str(failed.future.exception(timeout=10)) == '1000 rows'
+    gc.collect()
+    assert data[0]() is None
+    executor.shutdown()
+    executor.shutdown()
+
 
 class TestHRStrategy(unittest.TestCase):
     def setUp(self):
@@ -76,6 +605,142 @@ class TestSalesStrategy(unittest.TestCase):
         self.assertTrue('month' in result.columns)
         self.assertEqual(result.iloc[0]['month'], 1)
 
+    def test_aggregate_sales_periods(self):
+        self.data['Product'] = ['Phone', 'Cable']
+        monthly = aggregate_sales(self.data, 'monthly')
+        self.assertEqual(monthly['Revenue'].tolist(), [5000])
+        weekly = aggregate_sales(self.data, 'weekly')
+        # 2023-01-01 is a Sunday and belongs to ISO week 52 of 2022
+        self.assertEqual(weekly[['year', 'week']].values.tolist(), [[2022, 52], [2023, 1]])
+        quarterly = aggregate_sales(self.data, 'quarterly', by_product=True)
+        self.assertEqual(quarterly['Product'].tolist(), ['Cable', 'Phone'])
+        self.assertEqual(len(aggregate_sales(self.data, 'daily')), 2)
+
+    def test_sales_periods_skip_rows_without_a_date(self):
+        # Repeated header rows of monthly exports are parsed as NaT
+        data = pd.DataFrame({'Order Date': pd.to_datetime(['2023-01-01', '2023-01-07', None]),
+                             'Quantity Ordered': [10, 20, 7], 'Price Each': [100, 200, 1]})
+        weekly = aggregate_sales(data, 'weekly')
+        self.assertEqual(weekly[['year', 'week']].values.tolist(), [[2022, 52], [2023, 1]])
+        self.assertEqual(weekly['Quantity Ordered'].sum(), 30)
+        self.assertTrue(self.sales.chart_png(data, 'weekly').result())
+        store = SalesAggregateStore()
+        self.assertTrue(store.append(data))
+        self.assertEqual(store.query('weekly')['Revenue'].tolist(), weekly['Revenue'].tolist())
+
+    def test_sales_store_incremental_append(self):
+        store = SalesAggregateStore()
+        full = aggregate_sales(self.data, 'weekly')
+        self.assertTrue(store.append(self.data.iloc[:1], batch_id='day-1'))
+        self.assertTrue(store.append(self.data.iloc[1:], batch_id='day-2'))
+        self.assertFalse(store.append(self.data.iloc[1:], batch_id='day-2'))
+        weekly = store.query('weekly')
+        self.assertEqual(weekly['Revenue'].tolist(), full['Revenue'].tolist())
+        _, monthly = self.sales.process_store(store, period='monthly')
+        self.assertEqual(monthly['Quantity Ordered'].tolist(), [30])
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        y = np.sin(np.linspace(0, 20, 5000))
+        y[2500] = 10
+        positions = lttb(np.arange(len(y)), y, 100)
+        self.assertEqual(len(positions), 100)
+        self.assertEqual((positions[0], positions[-1]), (0, 4999))
+        self.assertIn(2500, positions)
+        self.assertTrue((np.diff(positions) > 0).all())
+
+    def test_chart_png_is_cached_and_leaves_no_open_figures(self):
+        charts = ChartCache()
+        open_figures = plt.get_fignums()
+        first = self.sales.chart_png(self.data, 'weekly', cache=charts).result()
+        again = self.sales.chart_png(self.data.copy(), 'weekly', cache=charts).result()
+        self.sales.process_data(self.data, period='monthly')
+        self.assertTrue(first.startswith(b'\x89PNG'))
+        self.assertIs(first, again)
+        self.assertEqual((charts.hits, charts.misses), (1, 1))
+        self.assertEqual(plt.get_fignums(), open_figures)
+
+    def test_unknown_period(self):
+        with self.assertRaises(ValueError):
+            self.sales.process_data(self.data, period='hourly')
+
+class TestStreamingStrategies(unittest.TestCase):
+    def setUp(self):
+        self.crm = pd.DataFrame({
+            'invoiceID': [1, 2, 3, 4],
+            'invoice_date': ['2021-01-01', '2021-02-01', '2022-01-01', '2021-03-01'],
+            'customerID': [10, 10, 20, 10],
+            'country': ['USA', 'USA', 'USA', 'UK'],
+            'quantity': [1, 2, 3, 4],
+            'amount': [10.0, 20.0, 30.0, 40.0]
+        })
+
+    def chunks(self, df, size=2):
+        return [df.iloc[i:i + size] for i in range(0, len(df), size)]
+
+    def test_crm_chunks_match_full_aggregation(self):
+        columns = ['customerID', 'country', 'quantity', 'amount', 'year']
+        expected = CRMStrategy().process_data(self.crm.copy(), columns=columns)
+        result = CRMStrategy().process_chunks(self.chunks(self.crm.copy()), columns=columns)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+    def test_crm_cube_matches_strategy(self):
+        cube = CRMCube(self.crm)
+        columns = ['year', 'country', 'quantity', 'amount']
+        expected = CRMStrategy().process_data(self.crm.copy(), columns=columns, country='USA')
+        result = CRMStrategy().process_cube(cube, columns=columns, country='USA')
+        self.assertEqual(result['year'].tolist(), expected['year'].tolist())
+        self.assertEqual(result['amount'].tolist(), expected['amount'].tolist())
+        self.assertEqual(cube.query(('customerID',), year=2021)['quantity'].tolist(), [7])
+        self.assertEqual(cube.rows_for('UK').tolist(), [3])
+        with self.assertRaises(ValueError):
+            CRMStrategy().process_cube(cube, columns=['invoiceID', 'year'])
+
+    def test_crm_cube_skips_missing_customers_like_strategy(self):
+        crm = self.crm.copy()
+        crm.loc[[0, 2], 'customerID'] = None
+        columns = ['year', 'customerID', 'quantity', 'amount']
+        expected = CRMStrategy().process_data(crm, columns=columns)
+        result = CRMStrategy().process_cube(CRMCube(crm), columns=columns)
+        self.assertEqual(len(result), len(expected))
+        self.assertEqual(result['amount'].sum(), expected['amount'].sum())
+        self.assertFalse(result['customerID'].isna().any())
+
+    def test_sales_chunks_merge_monthly_totals(self):
+        data = pd.DataFrame({
+            'Order Date': ['2023-01-01', '2023-01-07', '2023-02-01'],
+            'Quantity Ordered': [10, 20, 5],
+            'Price Each': [100, 200, 10]
+        })
+        _, result = SalesStrategy().process_chunks(self.chunks(data), period='monthly')
+        self.assertEqual(result['Quantity Ordered'].tolist(), [30, 5])
+        self.assertEqual(result['Revenue'].tolist(), [5000, 50])
+
+    def test_sqlite_backend_matches_in_memory(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'crm.csv')
+            self.crm.to_csv(path, index=False)
+            context = DataIngestionContext.for_file(path, indexes=SQL_INDEXES['CRM'], backend='sqlite')
+            self.assertIsInstance(context.strategy, SQLiteDataIngestion)
+            dataset = context.ingest_data(path)
+            try:
+                indexes = {row[0] for row in dataset.connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'data'")}
+                self.assertEqual(indexes, {'idx_data_country', 'idx_data_invoice_date', 'idx_data_customerID'})
+                columns = ['year', 'country', 'quantity', 'amount']
+                expected = CRMStrategy().process_data(self.crm, columns=columns, country='USA')
+                result = CRMStrategy().process_sql(dataset, columns=columns, country='USA')
+                self.assertEqual(result.values.tolist(), expected.values.tolist())
+                page = SupplyChainStrategy().process_sql(dataset, columns=['invoiceID', 'amount'], sort_by='amount',
+                                                         page=1, page_size=3)
+                self.assertEqual(page['invoiceID'].tolist(), [4])
+            finally:
+                dataset.close()
+
+    def test_supply_chain_top_n_chunks(self):
+        data = pd.DataFrame({'Brand': ['B', 'A', 'D', 'C'], 'Stock': [4, 3, 1, 2]})
+        result = SupplyChainStrategy().process_chunks(self.chunks(data), sort_by='Stock', top_n=2)
+        self.assertEqual(result['Brand'].tolist(), ['D', 'C'])
+
 class TestSupplyChainStrategy(unittest.TestCase):
     def setUp(self):
         self.data = pd.DataFrame({
@@ -89,5 +754,27 @@ class TestSupplyChainStrategy(unittest.TestCase):
         result = self.supply_chain.process_data(self.data, sort_by='Stock')
         self.assertEqual(result.iloc[0]['Brand'], 'BrandA')  # Expect BrandA to be first after sorting by stock
 
+    def test_supply_chain_top_n_and_pages(self):
+        data = pd.DataFrame({'Brand': ['B', 'A', 'D', 'C', 'E'], 'Stock': [4, 3, 1, 3, None]})
+        top = self.supply_chain.process_data(data, sort_by='Stock', top_n=3)
+        self.assertEqual(top['Brand'].tolist(), ['D', 'A', 'C'])
+        sort_index = SortIndex(data)
+        pages = [self.supply_chain.process_data(data, sort_by='Stock', page=page, page_size=2,
+                                                sort_index=sort_index)['Brand'].tolist() for page in range(3)]
+        self.assertEqual(pages, [['D', 'A'], ['C', 'B'], ['E']])
+        with self.assertRaises(ValueError):
+            self.supply_chain.process_data(data.copy(), sort_by='Stock', page=0, sort_index=sort_index)
+
+    def test_top_n_and_pages_of_empty_data(self):
+        # A header-only file or a filter matching nothing gives an empty page, including for text columns
+        empty = self.data.head(0)
+        for sort_by in ('Brand', 'Stock'):
+            self.assertTrue(self.supply_chain.process_data(empty, sort_by=sort_by, top_n=10).empty)
+            self.assertTrue(self.supply_chain.process_data(empty, sort_by=sort_by, page=0).empty)
+            self.assertTrue(self.supply_chain.process_data(empty, sort_by=sort_by, page=1, page_size=5).empty)
+        result = HRStrategy().process_data(pd.DataFrame(columns=['Employee_Name', 'Salary']),
+                                           columns=['Employee_Name', 'Salary'], page=0)
+        self.assertEqual(result.columns.tolist(), ['Employee_Name', 'Salary'])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,321 @@
+# benchmark.py
+"""Scalability benchmarks for CSV ingestion and every strategy's process_data.
+
+Synthetic files follow the layouts in 'Data Set/' (padded headers, currency and
+decimal-comma strings included), so the module schemas are exercised too.
+
+    python testing/benchmark.py --sizes 10000 100000 1000000
+    python testing/benchmark.py --modules CRM Sales --save-baseline bench_baseline.json
+    python testing/benchmark.py --baseline bench_baseline.json --tolerance 0.25
+    python testing/benchmark.py --startup
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from data_processor import CRMStrategy, FinanceStrategy, HRStrategy, SalesStrategy, SupplyChainStrategy
+from DataIngection import CSVDataIngestion
+from schemas import SCHEMAS
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cold-start budget in seconds: importing the app's own modules once pandas and streamlit are loaded,
+# the first render of main.py with nothing uploaded, and a rerun of it
+STARTUP_BUDGET = {'import': 0.25, 'first_render': 1.0, 'rerun': 0.25}
+# Modules a bare first render must not load; they belong to the module that needs them
+LAZY_IMPORTS = ['matplotlib']
+
+_STARTUP_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+import pandas, streamlit
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+import main
+seconds = {{'import': time.perf_counter() - started}}
+app = AppTest.from_file({main!r}, default_timeout=60)
+for stage in ('first_render', 'rerun'):
+    started = time.perf_counter()
+    app.run()
+    seconds[stage] = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'loaded': [name for name in {lazy!r} if name in sys.modules]}}))
+'''
+
+
+def _choice(rng, values, n):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def _dates(rng, n, start, days, fmt):
+    stamps = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 24 * 60, n), unit='min')
+    return stamps.strftime(fmt)
+
+
+def generate_hr(n, seed=0):
+    """HRData.csv layout: 37 columns, padded Department and Sex values."""
+    rng = np.random.default_rng(seed)
+    departments = ['Production       ', 'IT/IS', 'Software Engineering', 'Admin Offices', 'Sales',
+                   'Executive Office']
+    managers = ['Michael Albert', 'Simon Roup', 'Kissy Sullivan', 'Elijiah Gray', 'Webster Butler', 'Amy Dunn',
+                'Alex Sweetwater', 'Ketsia Liebig', 'Brannon Miller', 'Peter Monroe', 'David Stanley']
+    status = rng.integers(0, 3, n)
+    manager = rng.integers(0, len(managers), n)
+    terminated = status > 0
+    termination = np.where(terminated, _dates(rng, n, '2010-01-01', 3000, '%Y-%m-%d'), '')
+    return pd.DataFrame({
+        'Employee_Name': pd.Series(np.arange(n)).map('Employee, Number {}'.format),
+        'EmpID': 10000 + np.arange(n), 'MarriedID': rng.integers(0, 2, n), 'MaritalStatusID': rng.integers(0, 5, n),
+        'GenderID': rng.integers(0, 2, n), 'EmpStatusID': rng.integers(1, 6, n), 'DeptID': rng.integers(1, 7, n),
+        'PerfScoreID': rng.integers(1, 5, n), 'FromDiversityJobFairID': rng.integers(0, 2, n),
+        'Salary': rng.integers(45_000, 250_000, n), 'Termd': terminated.astype(int),
+        'PositionID': rng.integers(1, 31, n),
+        'Position': _choice(rng, ['Production Technician I', 'Sr. DBA', 'Software Engineer', 'IT Support',
+                                  'Data Analyst', 'Area Sales Manager'], n),
+        'State': _choice(rng, ['MA', 'TX', 'CT', 'VA', 'CA', 'OH'], n), 'Zip': rng.integers(1000, 99999, n),
+        'DOB': _dates(rng, n, '1950-01-01', 15000, '%Y-%m-%d'), 'Age': rng.integers(20, 70, n),
+        'Sex': _choice(rng, ['M ', 'F'], n),
+        'MaritalDesc': _choice(rng, ['Single', 'Married', 'Divorced', 'Widowed', 'Separated'], n),
+        'CitizenDesc': _choice(rng, ['US Citizen', 'Eligible NonCitizen', 'Non-Citizen'], n),
+        'HispanicLatino': _choice(rng, ['No', 'Yes'], n),
+        'RaceDesc': _choice(rng, ['White', 'Black or African American', 'Asian', 'Two or more races'], n),
+        'DateofHire': _dates(rng, n, '2005-01-01', 5000, '%Y-%m-%d'), 'DateofTermination': termination,
+        'TermReason': np.where(terminated, _choice(rng, ['career change', 'hours', 'unhappy', 'more money'], n),
+                               'N/A-StillEmployed'),
+        'EmploymentStatus': np.array(['Active', 'Voluntarily Terminated', 'Terminated for Cause'])[status],
+        'Department': _choice(rng, departments, n), 'ManagerName': np.array(managers)[manager],
+        'ManagerID': manager + 1,
+        'RecruitmentSource': _choice(rng, ['LinkedIn', 'Indeed', 'Google Search', 'Employee Referral'], n),
+        'PerformanceScore': _choice(rng, ['Exceeds', 'Fully Meets', 'Needs Improvement', 'PIP'], n),
+        'EngagementSurvey': np.round(rng.uniform(1, 5, n), 2), 'EmpSatisfaction': rng.integers(1, 6, n),
+        'SpecialProjectsCount': rng.integers(0, 9, n),
+        'LastPerformanceReview_Date': _dates(rng, n, '2015-01-01', 1500, '%Y-%m-%d'),
+        'DaysLateLast30': rng.integers(0, 7, n), 'Absences': rng.integers(1, 21, n),
+    })
+
+
+MONTH_NAMES = np.array([f' {pd.Timestamp(2014, m, 1):%B} ' for m in range(1, 13)], dtype=object)
+
+
+def _currency(values):
+    return pd.Series(values).map(lambda v: ' $-   ' if v == 0 else f'${v:,.2f} ')
+
+
+def generate_finance(n, seed=0):
+    """finance_data.csv layout: padded headers and '$1,618.50 ' style amounts."""
+    rng = np.random.default_rng(seed)
+    units = np.round(rng.uniform(200, 4500, n) * 2) / 2
+    price = _choice(rng, [7.0, 12.0, 15.0, 20.0, 125.0, 300.0, 350.0], n).astype(float)
+    gross = units * price
+    discounts = gross * _choice(rng, [0.0, 0.01, 0.05, 0.1], n).astype(float)
+    sales = gross - discounts
+    cogs = sales * rng.uniform(0.5, 1.05, n)
+    month = rng.integers(1, 13, n)
+    year = rng.integers(2013, 2015, n)
+    return pd.DataFrame({
+        'Segment': _choice(rng, ['Government', 'Midmarket', 'Channel Partners', 'Enterprise', 'Small Business'], n),
+        'Country': _choice(rng, ['Canada', 'Germany', 'France', 'Mexico', 'United States of America'], n),
+        ' Product ': _choice(rng, [' Carretera ', ' Montana ', ' Paseo ', ' Velo ', ' VTT ', ' Amarilla '], n),
+        ' Discount Band ': _choice(rng, [' None ', ' Low ', ' Medium ', ' High '], n),
+        ' Units Sold ': _currency(units), ' Manufacturing Price ': _currency(rng.choice([3.0, 5.0, 10.0], n)),
+        ' Sale Price ': _currency(price), ' Gross Sales ': _currency(gross), ' Discounts ': _currency(discounts),
+        '  Sales ': _currency(sales), ' COGS ': _currency(cogs), ' Profit ': _currency(sales - cogs),
+        'Date': '01/' + pd.Series(month).astype(str).str.zfill(2) + '/' + pd.Series(year).astype(str),
+        'Month Number': month, ' Month Name ': MONTH_NAMES[month - 1], 'Year': year,
+    })
+
+
+def generate_crm(n, seed=0):
+    """CRM_data.csv layout: decimal-comma amounts and missing customer IDs."""
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(-20, 2000, n)
+    amount = np.round(quantity * rng.uniform(0.5, 5, n), 2)
+    customer = rng.integers(12346, 18288, n).astype(float)
+    customer[rng.random(n) < 0.15] = np.nan
+    return pd.DataFrame({
+        'invoiceID': 536365 + rng.integers(0, 40_000, n),
+        'invoice_date': _dates(rng, n, '2020-12-01', 365, '%m/%d/%Y %H:%M'),
+        'customerID': pd.array(customer).astype('Int64'),
+        'country': _choice(rng, ['United Kingdom'] * 20 + ['Germany', 'France', 'EIRE', 'Spain', 'USA'], n),
+        'quantity': quantity,
+        'amount': pd.Series(amount).map(lambda v: f'{v:.2f}'.replace('.', ',')),
+    })
+
+
+def generate_supply_chain(n, seed=0):
+    """supply_chain.csv layout: padded VendorName strings."""
+    rng = np.random.default_rng(seed)
+    vendors = rng.integers(0, 150, n)
+    price = np.round(rng.uniform(3, 200, n), 2)
+    return pd.DataFrame({
+        'Brand': np.arange(n) + 58,
+        'Description': pd.Series(rng.integers(0, max(n // 2, 1), n)).map('Product {}'.format),
+        'Price': price, 'Size': _choice(rng, ['750mL', '1.75L', '375mL', '50mL'], n),
+        'Volume': _choice(rng, ['750', '1750', '375', '50'], n), 'Classification': rng.integers(1, 3, n),
+        'PurchasePrice': np.round(price * rng.uniform(0.6, 0.9, n), 2), 'VendorNumber': 1000 + vendors,
+        'VendorName': pd.Series(vendors).map(lambda v: f'VENDOR {v:<20}'),
+    })
+
+
+def generate_sales(n, seed=0):
+    """Monthly sales export layout: one row per order line."""
+    rng = np.random.default_rng(seed)
+    products = {'USB-C Charging Cable': 11.95, 'Lightning Charging Cable': 14.95, 'AA Batteries (4-pack)': 3.84,
+                'Wired Headphones': 11.99, '27in FHD Monitor': 149.99, 'iPhone': 700.0, 'Macbook Pro Laptop': 1700.0}
+    names = np.array(list(products))
+    product = rng.integers(0, len(names), n)
+    return pd.DataFrame({
+        'Order ID': 176558 + np.arange(n), 'Product': names[product], 'Quantity Ordered': rng.integers(1, 5, n),
+        'Price Each': np.array(list(products.values()))[product],
+        'Order Date': _dates(rng, n, '2019-01-01', 365, '%m/%d/%y %H:%M'),
+        'Purchase Address': _choice(rng, ['917 1st St, Dallas, TX 75001', '682 Chestnut St, Boston, MA 02215'], n),
+    })
+
+
+def _process_sales(data):
+    fig, _ = SalesStrategy().process_data(data, period='monthly')
+    plt.close(fig)
+
+
+# module -> (generator, process_data call with representative parameters)
+MODULES = {
+    'HR': (generate_hr, lambda df: HRStrategy().process_data(df, columns=['Department', 'Employee_Name', 'Salary'])),
+    'Finance': (generate_finance, lambda df: FinanceStrategy().process_data(df, sort_by='Profit')),
+    'Sales': (generate_sales, _process_sales),
+    'Supply Chain': (generate_supply_chain, lambda df: SupplyChainStrategy().process_data(df, sort_by='Price')),
+    'CRM': (generate_crm, lambda df: CRMStrategy().process_data(
+        df, columns=['year', 'country', 'customerID', 'quantity', 'amount'])),
+}
+
+
+def _measure(func, trace_memory):
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_module(module, rows, workdir, memory=True):
+    """Time ingestion and process_data for one module and size; returns one record per stage."""
+    generator, process = MODULES[module]
+    path = os.path.join(workdir, f"{module.lower().replace(' ', '_')}_{rows}.csv")
+    generator(rows).to_csv(path, index=False)
+    ingestion = CSVDataIngestion(schema=SCHEMAS[module])
+
+    data, ingest_seconds, _ = _measure(lambda: ingestion.ingest_data(path), False)
+    _, process_seconds, _ = _measure(lambda: process(data), False)
+    ingest_peak = process_peak = 0
+    if memory:
+        # Separate traced pass, so tracing overhead does not distort the timings
+        data, _, ingest_peak = _measure(lambda: ingestion.ingest_data(path), True)
+        _, _, process_peak = _measure(lambda: process(data), True)
+    os.remove(path)
+
+    return [
+        {'module': module, 'stage': stage, 'rows': rows, 'seconds': round(seconds, 4),
+         'rows_per_sec': round(rows / seconds) if seconds else None, 'peak_mb': round(peak / 1024 ** 2, 2)}
+        for stage, seconds, peak in (('ingest', ingest_seconds, ingest_peak),
+                                     ('process', process_seconds, process_peak))
+    ]
+
+
+def benchmark_startup(repeat=3):
+    """Best of repeat fresh interpreters per startup stage; returns records and modules loaded too early."""
+    script = _STARTUP_SCRIPT.format(root=ROOT, main=os.path.join(ROOT, 'main.py'), lazy=LAZY_IMPORTS)
+    best, loaded = {}, set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                cwd=ROOT).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        loaded.update(run['loaded'])
+        for stage, seconds in run['seconds'].items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    records = [{'module': 'App', 'stage': stage, 'rows': 0, 'seconds': round(seconds, 4),
+                'budget': STARTUP_BUDGET[stage]} for stage, seconds in best.items()]
+    return records, sorted(loaded)
+
+
+def compare(results, baseline, tolerance):
+    """Return regression messages for results slower or larger than baseline by more than tolerance."""
+    previous = {(r['module'], r['stage'], r['rows']): r for r in baseline}
+    regressions = []
+    for record in results:
+        old = previous.get((record['module'], record['stage'], record['rows']))
+        if old is None:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            if old[metric] and record[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{record['module']} {record['stage']} @ {record['rows']} rows: "
+                                   f"{metric} {old[metric]} -> {record[metric]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ingestion and strategies on synthetic data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--modules', nargs='+', default=list(MODULES), choices=list(MODULES))
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced peak-memory pass')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown/growth')
+    parser.add_argument('--save-baseline', help='write the results as a new baseline JSON file')
+    parser.add_argument('--startup', action='store_true',
+                        help='only check import time and first render against STARTUP_BUDGET')
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        records, loaded = benchmark_startup()
+        print(f"{'stage':<14}{'seconds':>10}{'budget':>10}")
+        over = []
+        for record in records:
+            print(f"{record['stage']:<14}{record['seconds']:>10.3f}{record['budget']:>10.2f}")
+            if record['seconds'] > record['budget']:
+                over.append(f"{record['stage']}: {record['seconds']}s over the {record['budget']}s budget")
+        over += [f'{name} imported before any module needs it' for name in loaded]
+        for message in over:
+            print('OVER BUDGET', message)
+        return 1 if over else 0
+
+    results = []
+    print(f"{'module':<14}{'stage':<9}{'rows':>11}{'seconds':>10}{'rows/s':>13}{'peak MB':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            for module in args.modules:
+                for record in benchmark_module(module, rows, workdir, memory=not args.no_memory):
+                    results.append(record)
+                    print(f"{record['module']:<14}{record['stage']:<9}{record['rows']:>11}"
+                          f"{record['seconds']:>10.3f}{record['rows_per_sec'] or 0:>13}{record['peak_mb']:>10.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for message in regressions:
+            print('REGRESSION', message)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())